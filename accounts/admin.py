@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, StudentProfile, AdminProfile, TeacherProfile, OTP
+from .models import User, StudentProfile, AdminProfile, TeacherProfile, OTP, OTPAuditEvent, OutboundMessage
 
 class StudentProfileInline(admin.StackedInline):
     model = StudentProfile
@@ -80,3 +80,25 @@ class OTPAdmin(admin.ModelAdmin):
 
 # Register the custom user admin
 admin.site.register(User, CustomUserAdmin)
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'channel', 'provider', 'purpose', 'status', 'attempts', 'next_attempt_at', 'created_at')
+    list_filter = ('status', 'channel', 'provider', 'purpose')
+    search_fields = ('recipient', 'subject')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'updated_at', 'sent_at', 'locked_at')
+    actions = ['requeue']
+
+    @admin.action(description='Requeue selected dead-lettered messages')
+    def requeue(self, request, queryset):
+        from utils.outbox import requeue_dead
+        self.message_user(request, f"Requeued {requeue_dead(queryset)} messages.")
+
+@admin.register(OTPAuditEvent)
+class OTPAuditEventAdmin(admin.ModelAdmin):
+    list_display = ('identifier', 'purpose', 'event', 'ip_address', 'created_at')
+    list_filter = ('event', 'purpose', 'created_at')
+    search_fields = ('identifier', 'ip_address')
+    ordering = ('-created_at',)
+    readonly_fields = ('identifier', 'purpose', 'event', 'ip_address', 'created_at')
@@ -2,6 +2,7 @@
 Admin API views for real-time synchronization and AJAX functionality
 """
 
+from django.conf import settings
 from django.http import JsonResponse, Http404
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -18,6 +19,11 @@ from timetable.models import (
     TimetableEntry, Enrollment, Attendance, Announcement
 )
 from ai_features.models import PerformanceInsight, AlgorithmicTimetableSuggestion
+from utils.change_feed import build_updates_response, entry_scopes, publish, section_scope
+from utils.etags import etag_from_versions
+from utils.executor import executor_metrics
+from utils.student_import import ImportFileError, import_students, read_rows
+from utils.timetable_cache import ALL_TIMETABLES_SCOPE, REFERENCE_SCOPE, invalidate_timetables
 
 def admin_required_api(view_func):
     """Decorator to ensure user is an admin for API calls."""
@@ -25,13 +31,7 @@ def admin_required_api(view_func):
         if not request.user.is_authenticated:
             return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
         # Allow if user has an admin profile OR is superuser/staff OR user_type indicates admin
-        is_admin_user = (
-            hasattr(request.user, 'adminprofile') or
-            getattr(request.user, 'is_superuser', False) or
-            getattr(request.user, 'is_staff', False) or
-            getattr(request.user, 'user_type', '') == 'admin'
-        )
-        if not is_admin_user:
+        if not request.role_context.is_admin:
             return JsonResponse({'success': False, 'message': 'Admin access required'}, status=403)
         return view_func(request, *args, **kwargs)
     return wrapper
@@ -98,7 +98,7 @@ def update_teacher(request, teacher_id):
         teacher.save()
         
         # Broadcast change for real-time sync
-        cache.set(f'teacher_updated_{teacher.id}', True, timeout=300)
+        publish('teacher', [f'teacher:{teacher.id}'], {'teacher_id': teacher.id})
         
         return JsonResponse({'success': True, 'message': 'Teacher updated successfully'})
     
@@ -116,7 +116,9 @@ def delete_teacher_assignment(request, assignment_id):
         assignment.save()
         
         # Broadcast change for real-time sync
-        cache.set(f'assignment_deleted_{assignment_id}', True, timeout=300)
+        publish('teacher', [f'teacher:{assignment.teacher_id}', f'subject:{assignment.subject_id}'], {
+            'assignment_id': assignment.id, 'deleted': True
+        })
         
         return JsonResponse({'success': True, 'message': 'Assignment removed successfully'})
     
@@ -190,7 +192,7 @@ def toggle_student_status(request, student_id):
         student.user.save()
         
         # Broadcast change for real-time sync
-        cache.set(f'student_status_updated_{student.pk}', True, timeout=300)
+        publish('student', [f'student:{student.pk}'], {'student_id': student.pk, 'is_active': student.user.is_active})
         
         status = 'activated' if student.user.is_active else 'deactivated'
         return JsonResponse({'success': True, 'message': f'Student {status} successfully'})
@@ -273,7 +275,7 @@ def update_student(request, student_id):
         student.save()
 
         # Broadcast change for real-time sync
-        cache.set(f'student_status_updated_{student.pk}', True, timeout=300)
+        publish('student', [f'student:{student.pk}'], {'student_id': student.pk})
 
         return JsonResponse({'success': True, 'message': 'Student updated successfully'})
 
@@ -329,6 +331,7 @@ def update_timetable_entry(request, entry_id):
     """Update timetable entry."""
     try:
         entry = get_object_or_404(TimetableEntry, id=entry_id)
+        previous_scopes = entry_scopes(entry)
         
         with transaction.atomic():
             entry.subject_id = request.POST.get('subject_id')
@@ -344,7 +347,7 @@ def update_timetable_entry(request, entry_id):
             entry.save()
         
         # Broadcast change for real-time sync
-        cache.set(f'timetable_updated_{entry.id}', True, timeout=300)
+        publish('timetable', previous_scopes + entry_scopes(entry), {'entry_id': entry.id})
         
         return JsonResponse({'success': True, 'message': 'Timetable entry updated successfully'})
     
@@ -362,7 +365,7 @@ def delete_timetable_entry(request, entry_id):
         entry.save()
         
         # Broadcast change for real-time sync
-        cache.set(f'timetable_deleted_{entry_id}', True, timeout=300)
+        publish('timetable', entry_scopes(entry), {'entry_id': entry.id, 'deleted': True})
         
         return JsonResponse({'success': True, 'message': 'Timetable entry deleted successfully'})
     
@@ -434,6 +437,7 @@ def export_timetable(request):
 @login_required
 @admin_required_api
 @require_http_methods(["GET"])
+@etag_from_versions(lambda request: [ALL_TIMETABLES_SCOPE, REFERENCE_SCOPE])
 def get_filtered_timetable_entries(request):
     """Get filtered timetable entries for grid view."""
     try:
@@ -530,11 +534,13 @@ def apply_algorithmic_suggestion(request, suggestion_id):
             return rooms[0] if rooms else None
 
         # Remove existing entries for target class to replace with suggestion
-        TimetableEntry.objects.filter(
+        replaced_entries = TimetableEntry.objects.filter(
             course=course, year=year, section=section,
             academic_year=academic_year, semester=semester,
             is_active=True
-        ).update(is_active=False)
+        )
+        affected_teacher_ids = set(replaced_entries.values_list('teacher_id', flat=True))
+        replaced_entries.update(is_active=False)
 
         created = 0
         skipped_no_teacher = 0
@@ -593,13 +599,19 @@ def apply_algorithmic_suggestion(request, suggestion_id):
                         semester=semester,
                         is_active=True
                     )
+                    affected_teacher_ids.add(teacher.id)
                     created += 1
 
         suggestion.status = 'implemented'
         suggestion.save(update_fields=['status'])
 
+        # The bulk deactivation above bypasses the TimetableEntry signals
+        invalidate_timetables(sections=[(course, year, section)], teacher_ids=affected_teacher_ids)
+
         # Broadcast update
-        cache.set('timetable_applied', True, timeout=300)
+        publish('timetable', [section_scope(course, year, section)] + [
+            f'teacher:{teacher_id}' for teacher_id in sorted(affected_teacher_ids)
+        ], {'suggestion_id': suggestion.id})
 
         return JsonResponse({
             'success': True,
@@ -620,23 +632,9 @@ def apply_algorithmic_suggestion(request, suggestion_id):
 @admin_required_api
 @require_http_methods(["GET"])
 def check_updates(request):
-    """Check for real-time updates using cache."""
+    """Check for real-time updates across every scope (pass ?since=<cursor>)."""
     try:
-        updates = {}
-        
-        # Check for various update types
-        cache_keys = [
-            'teacher_updated_*', 'student_status_updated_*',
-            'timetable_updated_*', 'assignment_deleted_*'
-        ]
-        
-        # In a real implementation, you'd check specific cache keys
-        # For now, return a simple response
-        updates = {
-            'has_updates': False,
-            'timestamp': timezone.now().isoformat()
-        }
-        
+        updates = build_updates_response(request.GET.get('since'))
         return JsonResponse(updates)
     
     except Exception as e:
@@ -656,3 +654,29 @@ def dismiss_insight(request, insight_id):
         return JsonResponse({'success': True})
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+@login_required
+@admin_required_api
+@require_http_methods(["GET"])
+def outbound_metrics(request):
+    """Queue depth, in-flight calls and circuit state of the outbound executor in this process."""
+    return JsonResponse({'success': True, 'metrics': executor_metrics()})
+
+@login_required
+@admin_required_api
+@require_http_methods(["POST"])
+def import_students_file(request):
+    """Bulk-create students from an uploaded CSV/XLSX file ('file'); dry_run=1 only validates."""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'success': False, 'message': 'No file uploaded'}, status=400)
+    try:
+        result = import_students(
+            read_rows(upload, upload.name),
+            workers=settings.STUDENT_IMPORT_WORKERS,
+            enrol=request.POST.get('enrol', '1') != '0',
+            dry_run=request.POST.get('dry_run') == '1',
+        )
+    except ImportFileError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': True, **result})
@@ -26,29 +26,19 @@ try:
 except ImportError:
     ai_service = None
 
-def _get_current_academic_year():
-    """Get current academic year dynamically."""
-    current_year = timezone.now().year
-    current_month = timezone.now().month
-    # Academic year starts in June (month 6)
-    if current_month >= 6:
-        return f"{current_year}-{current_year + 1}"
-    else:
-        return f"{current_year-1}-{current_year}"
-
-def _get_current_semester():
-    """Get current semester dynamically."""
-    current_month = timezone.now().month
-    # Semester 1: June to December (months 6-12)
-    # Semester 2: January to May (months 1-5)
-    return 1 if current_month in [6, 7, 8, 9, 10, 11, 12] else 2
+from utils.academic_calendar import (
+    get_current_academic_year as _get_current_academic_year,
+    get_current_semester as _get_current_semester,
+)
+from utils.change_feed import announcement_scopes, entry_scopes, publish, section_scope
+from utils.enrolment import deactivate_section, enrol_section
 
 def admin_required(view_func):
     """Decorator to ensure user is an admin."""
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('accounts:login')
-        if not hasattr(request.user, 'adminprofile'):
+        if request.role_context.admin_profile is None:
             messages.error(request, 'Access denied. Admin account required.')
             return redirect('accounts:landing')
         return view_func(request, *args, **kwargs)
@@ -423,7 +413,7 @@ def manage_timetable(request):
 
                 # Create entry with validated data
                 with transaction.atomic():
-                    TimetableEntry.objects.create(
+                    entry = TimetableEntry.objects.create(
                         subject_id=subject_id,
                         teacher_id=teacher_id,
                         course=course_name,
@@ -435,6 +425,7 @@ def manage_timetable(request):
                         academic_year=academic_year_val,
                         semester=semester_val,
                     )
+                    publish('timetable', entry_scopes(entry), {'entry_id': entry.id})
                 messages.success(request, 'Timetable entry added successfully!')
             except ValueError as e:
                 messages.error(request, f'Invalid input: {str(e)}. Please ensure all fields are correctly filled.')
@@ -694,6 +685,30 @@ def manage_students(request):
             except Exception as e:
                 messages.error(request, 'Failed to enroll student.')
         
+        elif action in ('enroll_section', 'deactivate_section_enrollments'):
+            try:
+                course = request.POST.get('course', '').strip()
+                year = int(request.POST.get('year'))
+                section = request.POST.get('section', '').strip().upper()
+                academic_year = request.POST.get('academic_year', '').strip() or _get_current_academic_year()
+                semester = int(request.POST.get('semester') or 0)
+                label = f'{course} Y{year}{section}'
+                
+                if action == 'enroll_section':
+                    if not semester:
+                        raise ValueError('semester is required')
+                    students, subjects, enrolled = enrol_section(course, year, section, semester, academic_year)
+                    messages.success(request, f'{label}: {enrolled} enrollments added or reactivated '
+                                              f'({students} students x {subjects} subjects, semester {semester}).')
+                else:
+                    deactivated = deactivate_section(course, year, section, academic_year, semester or None)
+                    messages.success(request, f'{label}: {deactivated} enrollments deactivated for {academic_year}.')
+                publish('student', [section_scope(course, year, section)], {'enrollments': action})
+            except (TypeError, ValueError) as e:
+                messages.error(request, f'Invalid input: {str(e)}. Please select course, year, section and semester.')
+            except Exception as e:
+                messages.error(request, 'Failed to update section enrollments.')
+        
         elif action == 'reset_password':
             try:
                 user = get_object_or_404(User, id=request.POST.get('user_id'))
@@ -703,8 +718,7 @@ def manage_students(request):
                 user.save()
                 
                 # Broadcast change to all connected users (for real-time sync)
-                from django.core.cache import cache
-                cache.set(f'user_updated_{user.id}', True, timeout=300)
+                publish('user', [f'user:{user.id}'], {'user_id': user.id})
                 
                 messages.success(request, f'Password reset for {user.username} successfully!')
             except Exception as e:
@@ -717,8 +731,7 @@ def manage_students(request):
                 student.user.save()
                 
                 # Broadcast change for real-time sync
-                from django.core.cache import cache
-                cache.set(f'student_status_updated_{student.pk}', True, timeout=300)
+                publish('student', [f'student:{student.pk}'], {'student_id': student.pk, 'is_active': student.user.is_active})
                 
                 status = 'activated' if student.user.is_active else 'deactivated'
                 messages.success(request, f'Student {student.roll_number} {status} successfully!')
@@ -794,7 +807,7 @@ def manage_announcements(request):
                 messages.error(request, 'Content is too long. Maximum 2000 characters allowed.')
                 return redirect('accounts:manage_announcements')
             
-            Announcement.objects.create(
+            announcement = Announcement.objects.create(
                 title=title,
                 content=content,
                 posted_by=request.user,
@@ -804,6 +817,7 @@ def manage_announcements(request):
                 target_section=target_section,
                 is_urgent=bool(request.POST.get('is_urgent'))
             )
+            publish('announcement', announcement_scopes(announcement), {'announcement_id': announcement.id})
             messages.success(request, 'Announcement posted successfully!')
         except Exception as e:
             messages.error(request, 'Failed to post announcement.')
@@ -839,6 +853,7 @@ def edit_announcement(request, announcement_id):
             announcement.target_section = request.POST.get('target_section', announcement.target_section)
             announcement.is_urgent = bool(request.POST.get('is_urgent'))
             announcement.save()
+            publish('announcement', announcement_scopes(announcement), {'announcement_id': announcement.id})
             messages.success(request, 'Announcement updated successfully!')
             return redirect('accounts:manage_announcements')
         except Exception:
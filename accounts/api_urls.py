@@ -8,6 +8,7 @@ from . import api_views
 from . import admin_api_views
 from . import teacher_api_views
 from . import student_api_views
+from . import stream_views
 from . import api_views as core_api_views
 
 app_name = 'api'
@@ -39,6 +40,7 @@ urlpatterns = [
     path('admin/students/<int:student_id>/toggle-status/', admin_api_views.toggle_student_status, name='admin_toggle_student_status'),
     path('admin/students/<int:student_id>/update/', admin_api_views.update_student, name='admin_update_student'),
     path('admin/students/export/', admin_api_views.export_students, name='admin_export_students'),
+    path('admin/students/import/', admin_api_views.import_students_file, name='admin_import_students'),
     path('admin/timetable/<int:entry_id>/', admin_api_views.get_timetable_entry, name='admin_timetable_entry'),
     path('admin/timetable/<int:entry_id>/update/', admin_api_views.update_timetable_entry, name='admin_update_timetable_entry'),
     path('admin/timetable/<int:entry_id>/delete/', admin_api_views.delete_timetable_entry, name='admin_delete_timetable_entry'),
@@ -48,26 +50,33 @@ urlpatterns = [
     path('admin/suggestions/<int:suggestion_id>/apply/', admin_api_views.apply_algorithmic_suggestion, name='admin_apply_algorithmic_suggestion'),
     path('admin/insights/<int:insight_id>/dismiss/', admin_api_views.dismiss_insight, name='admin_dismiss_insight'),
     path('admin/updates/', admin_api_views.check_updates, name='admin_check_updates'),
+    path('admin/outbound/metrics/', admin_api_views.outbound_metrics, name='admin_outbound_metrics'),
     
     # Teacher API endpoints
     path('teacher/class/<int:class_id>/students/', teacher_api_views.get_class_students, name='teacher_get_students'),
     path('teacher/attendance/save/', teacher_api_views.save_attendance, name='teacher_save_attendance'),
+    path('teacher/attendance/sync/', teacher_api_views.sync_attendance, name='teacher_sync_attendance'),
     path('teacher/attendance/report/<int:subject_id>/', teacher_api_views.generate_attendance_report, name='teacher_generate_report'),
     path('teacher/attendance/summary/', teacher_api_views.get_attendance_summary, name='teacher_attendance_summary'),
+    path('teacher/attendance/records/', teacher_api_views.get_attendance_records, name='teacher_attendance_records'),
     path('teacher/material/upload/', teacher_api_views.upload_study_material, name='teacher_upload_material'),
     path('teacher/material/<int:material_id>/delete/', teacher_api_views.delete_study_material, name='teacher_delete_material'),
     path('teacher/announcement/send/', teacher_api_views.send_announcement, name='teacher_send_announcement'),
     path('teacher/class/<int:class_id>/details/', teacher_api_views.get_class_details, name='teacher_get_class_details'),
+    path('teacher/class/<int:class_id>/heatmap/', teacher_api_views.get_class_heatmap, name='teacher_class_heatmap'),
     path('teacher/updates/', teacher_api_views.check_teacher_updates, name='teacher_check_updates'),
     
     # Student API endpoints
     path('student/timetable/', student_api_views.get_my_timetable, name='student_get_timetable'),
     path('student/attendance/', student_api_views.get_my_attendance, name='student_get_attendance'),
+    path('student/attendance/records/', student_api_views.get_my_attendance_records, name='student_attendance_records'),
     path('student/materials/', student_api_views.get_my_study_materials, name='student_get_materials'),
     path('student/materials/<int:material_id>/', student_api_views.get_material_details, name='student_material_details'),
     path('student/announcements/', student_api_views.get_my_announcements, name='student_get_announcements'),
+    path('student/announcements/read/', student_api_views.mark_announcements_read, name='student_mark_announcements_read'),
     path('student/dashboard/stats/', student_api_views.get_dashboard_stats, name='student_dashboard_stats'),
     path('student/updates/', student_api_views.check_student_updates, name='student_check_updates'),
     # Health endpoint
     path('health/db/', core_api_views.db_health, name='db_health'),
+    path('events/', stream_views.event_stream, name='event_stream'),
 ]
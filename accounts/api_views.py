@@ -17,6 +17,8 @@ from django.db import connection
 from timetable.models import Announcement, Subject, TimetableEntry, Teacher, Course
 from ai_features.models import StudyRecommendation, SmartNotification
 from utils.ai_service import ai_service
+from utils.announcement_inbox import mark_read, visible_announcement_ids
+from utils.change_feed import announcement_scopes, publish
 from .models import StudentProfile, User
 
 
@@ -27,6 +29,10 @@ def get_announcement_details(request, announcement_id):
     try:
         announcement = get_object_or_404(Announcement, id=announcement_id)
         
+        # Opening an announcement counts as reading it
+        if request.role_context.student is not None:
+            mark_read(request.user, [announcement.id])
+        
         announcement_data = {
             'id': announcement.id,
             'title': announcement.title,
@@ -58,6 +64,9 @@ def delete_announcement(request, announcement_id):
         announcement = get_object_or_404(Announcement, id=announcement_id)
         announcement.is_active = False
         announcement.save()
+        publish('announcement', announcement_scopes(announcement), {
+            'announcement_id': announcement.id, 'deleted': True
+        })
         
         return JsonResponse({
             'success': True,
@@ -103,15 +112,9 @@ def search_content(request):
         
         # Search announcements (visible to current user)
         announcements_query = Q(title__icontains=query) | Q(content__icontains=query)
-        if hasattr(request.user, 'studentprofile'):
-            student = request.user.studentprofile
-            announcements_query &= (
-                Q(target_audience='all') |
-                Q(target_audience='course', target_course=student.course) |
-                Q(target_audience='year', target_year=student.year) |
-                Q(target_audience='section', target_course=student.course,
-                  target_year=student.year, target_section=student.section)
-            )
+        student = request.role_context.student
+        if student is not None:
+            announcements_query &= Q(id__in=visible_announcement_ids(student))
         
         announcements = Announcement.objects.filter(
             announcements_query, is_active=True
@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import authenticate
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+
+from accounts.models import User
+from utils.login import LoginThrottled, authenticate_login
+
+
+def legacy_authenticate(request, user_id, password, user_type):
+    """The login path before utils/login.py, kept here for comparison."""
+    if user_type == 'teacher':
+        user = authenticate(request, username=user_id, password=password)
+        if user is None and '@' in user_id:
+            try:
+                email_user = User.objects.get(email=user_id, user_type='teacher')
+                user = authenticate(request, username=email_user.username, password=password)
+            except User.DoesNotExist:
+                pass
+        return user
+    normalized_id = user_id.upper()
+    user = authenticate(request, username=normalized_id, password=password)
+    if user is None and user_id != normalized_id:
+        user = authenticate(request, username=user_id, password=password)
+    return user
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a login storm against the old and the current login path and report throughput. "
+        "Temporary benchmark accounts are created and deleted again afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--attempts', type=int, default=60, help='Login attempts per path (default: 60)')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent attempts (default: 4)')
+        parser.add_argument('--users', type=int, default=10, help='Benchmark accounts (default: 10)')
+        parser.add_argument('--failure-ratio', type=float, default=0.5,
+                            help='Share of attempts with a wrong password (default: 0.5)')
+
+    def handle(self, *args, **options):
+        users = self._create_users(options['users'])
+        try:
+            self._run(users, options)
+        finally:
+            User.objects.filter(username__in=[user.username for user in users]).delete()
+
+    def _attempts(self, users, count, failure_ratio):
+        # Students type their ID in lower case and teachers use their email:
+        # the cases where the old path hashed more than once
+        wrong_every = round(1 / failure_ratio) if failure_ratio else 0
+        for i in range(count):
+            user = users[i % len(users)]
+            typed = user.email if user.user_type == 'teacher' else user.username.lower()
+            password = 'wrong-password' if wrong_every and i % wrong_every == 0 else 'benchmark-pass'
+            yield typed, password, user.user_type
+
+    def _storm(self, func, attempts, threads):
+        factory = RequestFactory()
+        outcomes = {'ok': 0, 'failed': 0, 'throttled': 0}
+
+        def attempt(args):
+            request = factory.post('/login/', REMOTE_ADDR='203.0.113.7')
+            try:
+                return 'ok' if func(request, *args) else 'failed'
+            except LoginThrottled:
+                return 'throttled'
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            for outcome in pool.map(attempt, attempts):
+                outcomes[outcome] += 1
+        return time.perf_counter() - started, outcomes
+
+    def _create_users(self, count):
+        users = []
+        for i in range(count):
+            user_type = 'teacher' if i % 2 else 'student'
+            user = User(
+                username=f'BENCH{i:04d}' if user_type == 'student' else f'bench-teacher-{i}',
+                email=f'bench{i}@example.com',
+                user_type=user_type,
+            )
+            user.set_password('benchmark-pass')
+            users.append(user)
+        User.objects.filter(username__in=[user.username for user in users]).delete()
+        return User.objects.bulk_create(users)
+
+    def _run(self, users, options):
+        attempts = list(self._attempts(users, options['attempts'], options['failure_ratio']))
+        results = {}
+        for name, func in (('legacy', legacy_authenticate), ('current', authenticate_login)):
+            cache.delete_many(['throttle:login:ip:203.0.113.7'] + [
+                f'throttle:login:account:{user.username}' for user in users
+            ])
+            results[name] = self._storm(func, attempts, options['threads'])
+
+        for name, (elapsed, outcomes) in results.items():
+            self.stdout.write(
+                f"{name:8} {len(attempts) / elapsed:8.1f} attempts/s  ({elapsed:.2f}s; "
+                f"{outcomes['ok']} ok, {outcomes['failed']} failed, {outcomes['throttled']} throttled)"
+            )
+        speedup = results['legacy'][0] / results['current'][0]
+        self.stdout.write(self.style.SUCCESS(f"Current path is {speedup:.1f}x the legacy throughput"))
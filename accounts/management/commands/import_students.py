@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.student_import import DEFAULT_BATCH_SIZE, ImportFileError, import_students, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create student accounts in bulk from a CSV or XLSX file (columns: roll_number, first_name, "
+        "last_name, email, course, year, section, optional phone_number and password) and enrol them "
+        "in their section's subjects. No OTPs are sent."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows validated and inserted together (default: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Password hashing processes (default: CPU count; 1 hashes inline)')
+        parser.add_argument('--no-enrol', action='store_true', help="Do not enrol students in their section's subjects")
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; create nothing')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_students(
+                    read_rows(file, options['path']),
+                    batch_size=options['batch_size'],
+                    workers=options['workers'],
+                    enrol=not options['no_enrol'],
+                    dry_run=options['dry_run'],
+                )
+        except (ImportFileError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stdout.write(self.style.WARNING(
+                f"Row {error['row']} ({error['roll_number'] or 'no roll number'}): {'; '.join(error['errors'])}"
+            ))
+        verb = 'would be created' if options['dry_run'] else 'created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} students {verb}, {result['enrolled']} enrolments, {result['skipped']} rows skipped"
+        ))
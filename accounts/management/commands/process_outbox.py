@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from utils.outbox import process_due, requeue_dead
+
+
+class Command(BaseCommand):
+    help = "Send queued OTP emails and SMS from the outbox (run from cron, or with --loop as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.OUTBOX_WORKERS,
+                            help=f'Send threads (default: {settings.OUTBOX_WORKERS})')
+        parser.add_argument('--limit', type=int, default=100, help='Messages to claim per pass (default: 100)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls with --loop')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Give dead-lettered messages a fresh set of attempts first')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f"Requeued {requeue_dead()} dead-lettered messages")
+
+        while True:
+            counts = process_due(options['limit'], options['workers'])
+            processed = sum(counts.values())
+            if processed:
+                style = self.style.SUCCESS if not counts['dead'] else self.style.WARNING
+                self.stdout.write(style(
+                    f"{counts['sent']} sent, {counts['retry']} scheduled for retry, {counts['dead']} dead-lettered"
+                ))
+            if not options['loop']:
+                if not processed:
+                    self.stdout.write("No messages due")
+                return
+            # A full batch means more are probably waiting
+            if processed < options['limit']:
+                time.sleep(options['interval'])
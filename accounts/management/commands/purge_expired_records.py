@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from utils.housekeeping import DEFAULT_BATCH_SIZE, PURGE_TARGETS, purge_expired_records
+
+
+class Command(BaseCommand):
+    help = "Delete expired OTPs, recommendations, notifications, stale AI chats and old outbox/feed rows in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', choices=sorted(PURGE_TARGETS), dest='targets',
+                            help='Purge only this target (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows deleted per transaction (default: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches, to go easy on a busy database')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many rows are due without deleting')
+
+    def handle(self, *args, **options):
+        results = purge_expired_records(
+            targets=options['targets'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'due for deletion' if options['dry_run'] else 'removed'
+        for name, count in results.items():
+            self.stdout.write(f"{name}: {count} {verb}")
+        self.stdout.write(self.style.SUCCESS(f"Total: {sum(results.values())} rows {verb}"))
@@ -0,0 +1,132 @@
+"""
+Request middleware for the accounts app.
+
+RoleContextMiddleware works out once which Teacher, StudentProfile or
+AdminProfile the user acts as, caches it in the shared cache, and exposes
+it as request.role_context for the *_required decorators. Profile and
+Teacher changes drop the cached entry (see accounts/signals.py).
+
+SessionRefreshMiddleware keeps sliding session expiry without writing the
+session on every request.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from accounts.models import AdminProfile, StudentProfile, TeacherProfile
+from timetable.models import Teacher
+
+ROLE_CONTEXT_TIMEOUT = 15 * 60
+
+
+def role_context_key(user_id):
+    return f'role_context:{user_id}'
+
+
+def invalidate_role_context(user_ids):
+    keys = [role_context_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class RoleContext:
+    """What an authenticated user may act as."""
+
+    def __init__(self, user_type='', is_admin=False, admin_profile=None, student=None,
+                 teacher_profile=None, teacher=None):
+        self.user_type = user_type
+        self.is_admin = is_admin
+        self.admin_profile = admin_profile
+        self.student = student
+        self.teacher_profile = teacher_profile
+        # Linked Teacher, or the active Teacher with the user's email if the profile is unlinked
+        self.teacher = teacher
+
+    @property
+    def teacher_linked(self):
+        return self.teacher_profile is not None and self.teacher_profile.teacher_id is not None
+
+
+ANONYMOUS_CONTEXT = RoleContext()
+
+
+def resolve_role_context(user):
+    admin_profile = AdminProfile.objects.filter(user_id=user.pk).first()
+    student = StudentProfile.objects.filter(user_id=user.pk).first()
+    teacher_profile = TeacherProfile.objects.select_related('teacher').filter(user_id=user.pk).first()
+
+    teacher = teacher_profile.teacher if teacher_profile else None
+    if teacher is None and user.email:
+        teacher = Teacher.objects.filter(email=user.email, is_active=True).first()
+
+    return RoleContext(
+        user_type=user.user_type,
+        is_admin=bool(admin_profile or user.is_superuser or user.is_staff or user.user_type == 'admin'),
+        admin_profile=admin_profile,
+        student=student,
+        teacher_profile=teacher_profile,
+        teacher=teacher,
+    )
+
+
+def get_role_context(user):
+    """Cached role context for `user`; also primes user.studentprofile and friends."""
+    if not user.is_authenticated:
+        return ANONYMOUS_CONTEXT
+
+    key = role_context_key(user.pk)
+    context = cache.get(key)
+    if context is None:
+        context = resolve_role_context(user)
+        cache.set(key, context, timeout=ROLE_CONTEXT_TIMEOUT)
+
+    # Fill the reverse one-to-one caches so views reading
+    # request.user.studentprofile (etc.) do not query again
+    if context.student is not None:
+        user.studentprofile = context.student
+    if context.teacher_profile is not None:
+        user.teacherprofile = context.teacher_profile
+    if context.admin_profile is not None:
+        user.adminprofile = context.admin_profile
+    return context
+
+
+class RoleContextMiddleware:
+    """Attach a lazily resolved request.role_context. Must follow AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role_context = SimpleLazyObject(lambda: get_role_context(request.user))
+        return self.get_response(request)
+
+
+class SessionRefreshMiddleware:
+    """
+    Re-save an otherwise unchanged session at most once per
+    SESSION_REFRESH_WINDOW seconds. Saving renews the stored expiry and
+    the cookie, which SESSION_SAVE_EVERY_REQUEST used to do on every
+    request (including each realtime poll). Must follow SessionMiddleware.
+    """
+
+    REFRESHED_AT_KEY = '_refreshed_at'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.window = getattr(settings, 'SESSION_REFRESH_WINDOW', 300)
+
+    def __call__(self, request):
+        session = getattr(request, 'session', None)
+        # Only existing sessions; never create one for anonymous traffic
+        if session is not None and session.session_key:
+            now = int(time.time())
+            refreshed_at = session.get(self.REFRESHED_AT_KEY, 0)
+            # Loading clears session_key if the cookie pointed at an expired session
+            if session.session_key and now - refreshed_at >= self.window:
+                session[self.REFRESHED_AT_KEY] = now
+        return self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-19 07:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OTPAuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('identifier', models.CharField(max_length=254)),
+                ('purpose', models.CharField(max_length=20)),
+                ('event', models.CharField(choices=[('issued', 'Issued'), ('verified', 'Verified'), ('failed', 'Failed'), ('locked', 'Locked Out'), ('throttled', 'Throttled')], max_length=10)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['identifier', 'created_at'], name='otp_audit_identifier_idx')],
+            },
+        ),
+    ]
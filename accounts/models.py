@@ -20,6 +20,13 @@ class User(AbstractUser):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta(AbstractUser.Meta):
+        swappable = 'AUTH_USER_MODEL'
+        indexes = [
+            # Login and password reset by email
+            models.Index(fields=['email'], name='user_email_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.username} ({self.user_type})"
 
@@ -146,6 +153,11 @@ class OTP(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Matches verify_otp(); the (phone_number, purpose) prefix also serves generate_otp()
+            models.Index(fields=['phone_number', 'purpose', 'otp_code', 'is_used'], name='otp_lookup_idx'),
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
@@ -217,6 +229,11 @@ class EmailOTP(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Matches verify_otp(); the (email, purpose) prefix also serves generate_otp()
+            models.Index(fields=['email', 'purpose', 'otp_code', 'is_used'], name='email_otp_lookup_idx'),
+            models.Index(fields=['expires_at'], name='email_otp_expires_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.expires_at:
@@ -269,3 +286,68 @@ class EmailOTP(models.Model):
     
     def __str__(self):
         return f"Email OTP for {self.email} - {self.purpose}"
+
+class OutboundMessage(models.Model):
+    """Queued email or SMS. Request handlers only enqueue; utils/outbox.py sends."""
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead Letter'),
+    ]
+    
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES, default='email')
+    provider = models.CharField(max_length=20, help_text="Rate limit bucket, e.g. sendgrid, smtp, twilio")
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    purpose = models.CharField(max_length=50, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.recipient} ({self.status})"
+
+class OTPAuditEvent(models.Model):
+    """Audit trail for OTP codes, written off the request path by utils/otp_store.py. Never holds the code."""
+    EVENT_CHOICES = [
+        ('issued', 'Issued'),
+        ('verified', 'Verified'),
+        ('failed', 'Failed'),
+        ('locked', 'Locked Out'),
+        ('throttled', 'Throttled'),
+    ]
+    
+    identifier = models.CharField(max_length=254)
+    purpose = models.CharField(max_length=20)
+    event = models.CharField(max_length=10, choices=EVENT_CHOICES)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['identifier', 'created_at'], name='otp_audit_identifier_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_display()} {self.purpose} OTP for {self.identifier}"
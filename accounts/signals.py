@@ -0,0 +1,36 @@
+"""
+Signal handlers that drop cached role contexts when the underlying
+profiles change.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.middleware import invalidate_role_context
+from accounts.models import AdminProfile, StudentProfile, TeacherProfile, User
+from timetable.models import Teacher
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_role_context(sender, instance, **kwargs):
+    invalidate_role_context([instance.pk])
+
+
+@receiver(post_save, sender=AdminProfile)
+@receiver(post_delete, sender=AdminProfile)
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_save, sender=TeacherProfile)
+@receiver(post_delete, sender=TeacherProfile)
+def invalidate_profile_role_context(sender, instance, **kwargs):
+    invalidate_role_context([instance.user_id])
+
+
+@receiver(post_save, sender=Teacher)
+@receiver(post_delete, sender=Teacher)
+def invalidate_teacher_role_context(sender, instance, **kwargs):
+    # Linked users, plus users matched to this Teacher by email
+    user_ids = set(TeacherProfile.objects.filter(teacher_id=instance.pk).values_list('user_id', flat=True))
+    user_ids.update(User.objects.filter(email=instance.email).values_list('id', flat=True))
+    invalidate_role_context(user_ids)
@@ -0,0 +1,57 @@
+"""
+Streaming (Server-Sent Events) endpoint for real-time updates.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+
+from timetable.models import Teacher
+from utils.change_feed import parse_cursor, student_scopes, teacher_scopes
+from utils.event_stream import stream_changes
+
+ALL_SCOPES = object()
+
+
+def _resolve_scopes(request):
+    """Return the scopes the user may follow, ALL_SCOPES for admins, or None if not allowed."""
+    user = request.user
+    if not user.is_authenticated:
+        return None
+    if (hasattr(user, 'adminprofile') or user.is_superuser or user.is_staff
+            or getattr(user, 'user_type', '') == 'admin'):
+        return ALL_SCOPES
+    if user.user_type == 'teacher':
+        teacher = None
+        if hasattr(user, 'teacherprofile') and user.teacherprofile.teacher:
+            teacher = user.teacherprofile.teacher
+        else:
+            teacher = Teacher.objects.filter(email=user.email, is_active=True).first()
+        return teacher_scopes(teacher) if teacher else None
+    if hasattr(user, 'studentprofile'):
+        return student_scopes(user.studentprofile)
+    return None
+
+
+async def event_stream(request):
+    """
+    Push change-feed events as they are committed.
+    Resumes from the Last-Event-ID header (sent automatically by EventSource)
+    or ?since=<cursor>. Responds 204 when SSE is disabled, which tells
+    EventSource not to reconnect so the client falls back to polling.
+    """
+    if not getattr(settings, 'SSE_ENABLED', False):
+        return HttpResponse(status=204)
+
+    scopes = await sync_to_async(_resolve_scopes)(request)
+    if scopes is None:
+        return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
+
+    last_event_id = parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('since'))
+    response = StreamingHttpResponse(
+        stream_changes(None if scopes is ALL_SCOPES else scopes, last_event_id),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
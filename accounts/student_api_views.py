@@ -20,6 +20,17 @@ from timetable.models import (
     TimetableEntry, Enrollment, Attendance, Announcement
 )
 from ai_features.models import StudyMaterial, Assignment
+from utils.attendance_stats import get_student_stats
+from utils.change_feed import build_updates_response, student_scopes
+from utils.pagination import DEFAULT_PAGE_SIZE, InvalidCursor, keyset_paginate, parse_page_size
+from utils.announcement_inbox import get_inbox, mark_read, visible_announcement_ids
+from utils.cache import (
+    ANNOUNCEMENTS_SCOPE, announcement_reads_scope, enrollment_scope, materials_scope, section_namespace
+)
+from utils.etags import etag_from_versions
+from utils.timetable_cache import (
+    REFERENCE_SCOPE, entries_on, get_section_timetable, section_timetable_scope
+)
 
 def student_required_api(view_func):
     """Decorator to ensure user is a student for API calls."""
@@ -27,10 +38,8 @@ def student_required_api(view_func):
         if not request.user.is_authenticated:
             return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
         
-        # Check if user has student profile
-        student = None
-        if hasattr(request.user, 'studentprofile'):
-            student = request.user.studentprofile
+        # Check if user has student profile (cached per user)
+        student = request.role_context.student
         
         if not student:
             return JsonResponse({'success': False, 'message': 'Student access required'}, status=403)
@@ -40,40 +49,59 @@ def student_required_api(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+def _timetable_scopes(request):
+    student = request.student
+    return [
+        section_timetable_scope(student.course, student.year, student.section),
+        section_namespace(student.course, student.year, student.section),
+        REFERENCE_SCOPE,
+        enrollment_scope(student.pk),
+    ]
+
+def _materials_scopes(request):
+    student = request.student
+    return [
+        materials_scope(student.course, student.year, student.section),
+        section_namespace(student.course, student.year, student.section),
+    ]
+
+def _announcement_scopes(request):
+    student = request.student
+    # The section is part of the audience, so a student moved to another
+    # section must not revalidate against the old section's list
+    return [
+        ANNOUNCEMENTS_SCOPE,
+        announcement_reads_scope(request.user.pk),
+        section_namespace(student.course, student.year, student.section),
+    ]
+
 @login_required
 @student_required_api
 @require_http_methods(["GET"])
+@etag_from_versions(_timetable_scopes)
 def get_my_timetable(request):
     """Get student's personal timetable."""
     try:
-        # Get student's enrolled subjects
-        enrollments = Enrollment.objects.filter(
+        # Filter the cached section grid down to the student's enrolled subjects
+        enrolled_subject_ids = set(Enrollment.objects.filter(
             student=request.student,
             is_active=True
-        ).select_related('subject')
-        
-        enrolled_subjects = [enrollment.subject for enrollment in enrollments]
-        
-        # Get timetable entries for enrolled subjects
-        timetable_entries = TimetableEntry.objects.filter(
-            subject__in=enrolled_subjects,
-            course=request.student.course,
-            year=request.student.year,
-            section=request.student.section,
-            is_active=True
-        ).select_related('subject', 'teacher', 'room', 'time_slot').order_by('day_of_week', 'time_slot__start_time')
+        ).values_list('subject_id', flat=True))
+        timetable = get_section_timetable(request.student.course, request.student.year, request.student.section)
         
         timetable_data = []
-        for entry in timetable_entries:
+        for entry in timetable['entries']:
+            if entry['subject']['id'] not in enrolled_subject_ids:
+                continue
             timetable_data.append({
-                'id': entry.id,
-                'subject': entry.subject.name,
-                'subject_code': entry.subject.code,
-                'teacher': entry.teacher.full_name,
-                'room': entry.room.room_number,
-                'day': entry.get_day_of_week_display(),
-                'time': f"{entry.time_slot.start_time} - {entry.time_slot.end_time}",
-                'period': entry.time_slot.period_number
+                'id': entry['id'],
+                'subject': entry['subject']['name'],
+                'subject_code': entry['subject']['code'],
+                'teacher': entry['teacher']['name'],
+                'room': entry['room']['room_number'],
+                'day': entry['day'],
+                'time': f"{entry['time_slot']['start_time']} - {entry['time_slot']['end_time']}",
+                'period': entry['time_slot']['period_number']
             })
         
         return JsonResponse({
@@ -95,74 +123,24 @@ def get_my_timetable(request):
 @student_required_api
 @require_http_methods(["GET"])
 def get_my_attendance(request):
-    """Get student's attendance records."""
+    """Get student's attendance statistics (full history) and the first page of records."""
     try:
         # Get filters
         subject_id = request.GET.get('subject', '')
         start_date = request.GET.get('start_date', '')
         end_date = request.GET.get('end_date', '')
         
-        # Base attendance query
-        attendance_query = Attendance.objects.filter(
-            student=request.student
-        ).select_related('timetable_entry__subject', 'timetable_entry__teacher')
-        
-        # Apply filters
-        if subject_id:
-            attendance_query = attendance_query.filter(timetable_entry__subject_id=subject_id)
-        if start_date:
-            attendance_query = attendance_query.filter(date__gte=start_date)
-        if end_date:
-            attendance_query = attendance_query.filter(date__lte=end_date)
-        
-        # Get attendance records
-        attendance_records = attendance_query.order_by('-date')[:50]  # Limit to recent 50 records
-        
-        attendance_data = []
-        total_classes = 0
-        present_count = 0
-        
-        for record in attendance_records:
-            attendance_data.append({
-                'date': record.date.strftime('%Y-%m-%d'),
-                'subject': record.timetable_entry.subject.name,
-                'teacher': record.timetable_entry.teacher.full_name,
-                'status': record.status,
-                'marked_at': record.marked_at.strftime('%Y-%m-%d %H:%M') if record.marked_at else 'Not marked'
-            })
-            
-            total_classes += 1
-            if record.status == 'present':
-                present_count += 1
-        
-        # Calculate overall statistics
-        attendance_percentage = (present_count / total_classes * 100) if total_classes > 0 else 0
-        
-        # Get subject-wise statistics
-        subject_stats = {}
-        for record in attendance_records:
-            subject_name = record.timetable_entry.subject.name
-            if subject_name not in subject_stats:
-                subject_stats[subject_name] = {'total': 0, 'present': 0}
-            
-            subject_stats[subject_name]['total'] += 1
-            if record.status == 'present':
-                subject_stats[subject_name]['present'] += 1
-        
-        for subject_name in subject_stats:
-            stats = subject_stats[subject_name]
-            stats['percentage'] = (stats['present'] / stats['total'] * 100) if stats['total'] > 0 else 0
+        statistics = get_student_stats(request.student.pk, subject_id, start_date, end_date)
+        attendance_data, next_cursor = _attendance_page(
+            request.student, subject_id, start_date, end_date,
+            page_size=parse_page_size(request.GET.get('page_size'))
+        )
         
         return JsonResponse({
             'success': True,
             'attendance_records': attendance_data,
-            'statistics': {
-                'total_classes': total_classes,
-                'present_count': present_count,
-                'absent_count': total_classes - present_count,
-                'attendance_percentage': round(attendance_percentage, 1),
-                'subject_wise': subject_stats
-            }
+            'next_cursor': next_cursor,
+            'statistics': statistics
         })
     
     except Exception as e:
@@ -171,6 +149,61 @@ def get_my_attendance(request):
 @login_required
 @student_required_api
 @require_http_methods(["GET"])
+def get_my_attendance_records(request):
+    """Page through the student's attendance records, newest first (keyset pagination)."""
+    try:
+        attendance_data, next_cursor = _attendance_page(
+            request.student,
+            request.GET.get('subject', ''),
+            request.GET.get('start_date', ''),
+            request.GET.get('end_date', ''),
+            cursor=request.GET.get('cursor'),
+            page_size=parse_page_size(request.GET.get('page_size'))
+        )
+        return JsonResponse({
+            'success': True,
+            'attendance_records': attendance_data,
+            'next_cursor': next_cursor
+        })
+    
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+def _attendance_page(student, subject_id, start_date, end_date, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """One page of attendance records plus the cursor for the next page."""
+    attendance_query = Attendance.objects.filter(student=student)
+    if subject_id:
+        attendance_query = attendance_query.filter(timetable_entry__subject_id=subject_id)
+    if start_date:
+        attendance_query = attendance_query.filter(date__gte=start_date)
+    if end_date:
+        attendance_query = attendance_query.filter(date__lte=end_date)
+    
+    records, next_cursor = keyset_paginate(
+        attendance_query.values(
+            'id', 'date', 'status', 'marked_at',
+            'timetable_entry__subject__name', 'timetable_entry__teacher__name'
+        ),
+        ('date', 'marked_at', 'id'),
+        cursor=cursor,
+        page_size=page_size
+    )
+    
+    attendance_data = [{
+        'date': record['date'].strftime('%Y-%m-%d'),
+        'subject': record['timetable_entry__subject__name'],
+        'teacher': record['timetable_entry__teacher__name'],
+        'status': record['status'],
+        'marked_at': record['marked_at'].strftime('%Y-%m-%d %H:%M') if record['marked_at'] else 'Not marked'
+    } for record in records]
+    return attendance_data, next_cursor
+
+@login_required
+@student_required_api
+@require_http_methods(["GET"])
+@etag_from_versions(_materials_scopes)
 def get_my_study_materials(request):
     """Get study materials for student's courses."""
     try:
@@ -184,7 +217,7 @@ def get_my_study_materials(request):
             year=request.student.year,
             section=request.student.section,
             is_published=True
-        ).select_related('subject', 'uploaded_by').order_by('-uploaded_at')
+        ).select_related('subject', 'uploaded_by').order_by('-created_at')
         
         # Apply filters
         if subject_id:
@@ -203,7 +236,7 @@ def get_my_study_materials(request):
                 'subject': material.subject.name,
                 'type': material.get_material_type_display(),
                 'uploaded_by': material.uploaded_by.get_full_name(),
-                'uploaded_at': material.uploaded_at.strftime('%Y-%m-%d %H:%M'),
+                'uploaded_at': material.created_at.strftime('%Y-%m-%d %H:%M'),
                 'file_url': material.file_url,
                 'content_preview': material.content[:200] + '...' if len(material.content) > 200 else material.content
             })
@@ -220,45 +253,59 @@ def get_my_study_materials(request):
 @login_required
 @student_required_api
 @require_http_methods(["GET"])
+@etag_from_versions(_announcement_scopes)
 def get_my_announcements(request):
-    """Get announcements for the student."""
+    """Get announcements for the student, with read state and unread count."""
     try:
-        # Get announcements targeted to this student's class or general announcements
-        announcements_query = Announcement.objects.filter(
-            Q(target_audience='all') |
-            Q(target_audience='section',
-              target_course=request.student.course,
-              target_year=request.student.year,
-              target_section=request.student.section)
-        ).select_related('posted_by').order_by('-is_urgent', '-posted_at')
-        
-        recent_announcements = announcements_query[:20]  # Recent 20 announcements
+        announcements, counts = get_inbox(request.student, request.user, limit=20)
         
         announcements_data = []
-        for announcement in recent_announcements:
+        for announcement in announcements:
             announcements_data.append({
                 'id': announcement.id,
                 'title': announcement.title,
                 'content': announcement.content,
                 'posted_by': announcement.posted_by.get_full_name(),
-                'posted_at': announcement.posted_at.strftime('%Y-%m-%d %H:%M'),
+                'posted_at': announcement.created_at.strftime('%Y-%m-%d %H:%M'),
                 'is_urgent': announcement.is_urgent,
+                'is_read': announcement.is_read,
                 'target_audience': announcement.get_target_audience_display()
             })
         
-        # Count urgent announcements
-        urgent_count = announcements_query.filter(is_urgent=True).count()
-        
         return JsonResponse({
             'success': True,
             'announcements': announcements_data,
-            'urgent_count': urgent_count,
-            'total_count': announcements_query.count()
+            'urgent_count': counts['urgent'],
+            'unread_count': counts['unread'],
+            'total_count': counts['total']
         })
     
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=400)
 
+@login_required
+@student_required_api
+@require_http_methods(["POST"])
+def mark_announcements_read(request):
+    """Mark announcements as read. Body: {"ids": [...]} (ids the student cannot see are ignored)."""
+    try:
+        data = json.loads(request.body)
+        ids = data.get('ids') or []
+        if not isinstance(ids, list):
+            return JsonResponse({'success': False, 'message': 'ids must be a list'}, status=400)
+        
+        visible_ids = list(Announcement.objects.filter(
+            id__in=ids
+        ).filter(id__in=visible_announcement_ids(request.student)).values_list('id', flat=True))
+        mark_read(request.user, visible_ids)
+        
+        return JsonResponse({'success': True, 'marked': len(visible_ids)})
+    
+    except (json.JSONDecodeError, TypeError, ValueError):
+        return JsonResponse({'success': False, 'message': 'Invalid request body'}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
 @login_required
 @student_required_api
 @require_http_methods(["GET"])
@@ -299,25 +346,24 @@ def get_dashboard_stats(request):
         today = timezone.now().date()
         today_weekday = today.weekday()  # 0=Monday, 6=Sunday
         
-        today_classes = TimetableEntry.objects.filter(
-            subject__in=Enrollment.objects.filter(
-                student=request.student,
-                is_active=True
-            ).values('subject'),
-            course=request.student.course,
-            year=request.student.year,
-            section=request.student.section,
-            day_of_week=today_weekday,
+        enrolled_subject_ids = set(Enrollment.objects.filter(
+            student=request.student,
             is_active=True
-        ).select_related('subject', 'teacher', 'time_slot').order_by('time_slot__start_time')
+        ).values_list('subject_id', flat=True))
+        timetable = get_section_timetable(request.student.course, request.student.year, request.student.section)
+        today_classes = sorted(
+            (entry for entry in entries_on(timetable, today_weekday)
+             if entry['subject']['id'] in enrolled_subject_ids),
+            key=lambda entry: entry['time_slot']['start_time']
+        )
         
         today_schedule = []
         for class_entry in today_classes:
             today_schedule.append({
-                'subject': class_entry.subject.name,
-                'teacher': class_entry.teacher.full_name,
-                'time': f"{class_entry.time_slot.start_time} - {class_entry.time_slot.end_time}",
-                'room': class_entry.room.room_number
+                'subject': class_entry['subject']['name'],
+                'teacher': class_entry['teacher']['name'],
+                'time': f"{class_entry['time_slot']['start_time']} - {class_entry['time_slot']['end_time']}",
+                'room': class_entry['room']['room_number']
             })
         
         stats = {
@@ -338,31 +384,9 @@ def get_dashboard_stats(request):
 @student_required_api
 @require_http_methods(["GET"])
 def check_student_updates(request):
-    """Check for real-time updates for student interface."""
+    """Check for real-time updates for student interface (pass ?since=<cursor>)."""
     try:
-        student_id = request.student.pk
-        course_section = f"{request.student.course}_{request.student.year}_{request.student.section}"
-        
-        updates = {
-            'has_updates': False,
-            'timestamp': timezone.now().isoformat()
-        }
-        
-        # Check for various update types
-        update_keys = [
-            f'attendance_updated_{student_id}',
-            f'materials_updated_{course_section}',
-            f'announcements_updated_{course_section}',
-            f'timetable_updated_{course_section}'
-        ]
-        
-        for key in update_keys:
-            if cache.get(key):
-                updates['has_updates'] = True
-                # Clear the cache key after reading
-                cache.delete(key)
-                break
-        
+        updates = build_updates_response(request.GET.get('since'), student_scopes(request.student))
         return JsonResponse(updates)
     
     except Exception as e:
@@ -19,13 +19,15 @@ try:
     from utils.ai_service import ai_service
 except ImportError:
     ai_service = None
+from utils.announcement_inbox import get_inbox
+from utils.timetable_cache import entries_on, get_section_timetable
 
 def student_required(view_func):
     """Decorator to ensure user is a student."""
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('accounts:login')
-        if not hasattr(request.user, 'studentprofile'):
+        if request.role_context.student is None:
             messages.error(request, 'Access denied. Student account required.')
             return redirect('accounts:landing')
         return view_func(request, *args, **kwargs)
@@ -38,38 +40,20 @@ def student_dashboard(request):
     student = request.user.studentprofile
     today = timezone.now().date()
     
-    # Get today's classes
-    today_classes = TimetableEntry.objects.filter(
-        course=student.course,
-        year=student.year,
-        section=student.section,
-        day_of_week=today.weekday(),
-        is_active=True
-    ).select_related('subject', 'teacher', 'time_slot', 'room').order_by('time_slot__period_number')
+    # Today's and upcoming classes come from the cached section timetable
+    timetable = get_section_timetable(student.course, student.year, student.section)
+    today_classes = entries_on(timetable, today.weekday())
     
     # Get upcoming classes (next 3 days)
     upcoming_classes = []
     for i in range(1, 4):
         future_date = today + timedelta(days=i)
-        classes = TimetableEntry.objects.filter(
-            course=student.course,
-            year=student.year,
-            section=student.section,
-            day_of_week=future_date.weekday(),
-            is_active=True
-        ).select_related('subject', 'teacher', 'time_slot')[:3]
+        classes = entries_on(timetable, future_date.weekday())[:3]
         if classes:
             upcoming_classes.extend([(future_date, cls) for cls in classes])
     
     # Get recent announcements
-    announcements = Announcement.objects.filter(
-        Q(target_audience='all') |
-        Q(target_audience='course', target_course=student.course) |
-        Q(target_audience='year', target_year=student.year) |
-        Q(target_audience='section', target_course=student.course, 
-          target_year=student.year, target_section=student.section),
-        is_active=True
-    ).order_by('-is_urgent', '-created_at')[:5]
+    announcements, announcement_counts = get_inbox(student, request.user, limit=5)
     
     # Get study recommendations
     recommendations = StudyRecommendation.objects.filter(
@@ -85,10 +69,10 @@ def student_dashboard(request):
     ).order_by('-priority', '-created_at')[:5]
     
     # AI-powered timetable summary
-    if today_classes.exists() and ai_service:
+    if today_classes and ai_service:
         try:
             ai_summary = ai_service.chat_response(
-                f"Summarize today's schedule for a {student.course} Year {student.year} student with {today_classes.count()} classes",
+                f"Summarize today's schedule for a {student.course} Year {student.year} student with {len(today_classes)} classes",
                 context={'student_info': {
                     'name': student.user.get_full_name(),
                     'course': student.course,
@@ -97,9 +81,9 @@ def student_dashboard(request):
                 }}
             )
         except Exception:
-            ai_summary = f"You have {today_classes.count()} classes scheduled for today. Stay focused and make the most of your learning!"
-    elif today_classes.exists():
-        ai_summary = f"You have {today_classes.count()} classes scheduled for today. Stay focused and make the most of your learning!"
+            ai_summary = f"You have {len(today_classes)} classes scheduled for today. Stay focused and make the most of your learning!"
+    elif today_classes:
+        ai_summary = f"You have {len(today_classes)} classes scheduled for today. Stay focused and make the most of your learning!"
     else:
         ai_summary = "No classes scheduled for today. Great time to catch up on assignments and review previous lessons!"
     
@@ -108,6 +92,7 @@ def student_dashboard(request):
         'today_classes': today_classes,
         'upcoming_classes': upcoming_classes[:6],  # Limit to 6 items
         'announcements': announcements,
+        'unread_announcements': announcement_counts['unread'],
         'recommendations': recommendations,
         'notifications': notifications,
         'ai_summary': ai_summary,
@@ -122,31 +107,12 @@ def student_timetable(request):
     """Full weekly timetable view for student."""
     student = request.user.studentprofile
     
-    # Get all timetable entries for the student's class
-    timetable_entries = TimetableEntry.objects.filter(
-        course=student.course,
-        year=student.year,
-        section=student.section,
-        is_active=True
-    ).select_related('subject', 'teacher', 'time_slot', 'room').order_by('day_of_week', 'time_slot__period_number')
-    
-    # Organize by day and period
+    # Shared, cached grid for the student's class section
+    cached = get_section_timetable(student.course, student.year, student.section)
+    timetable_entries = cached['entries']
     days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-    timetable = {}
-    periods = set()
-    
-    for entry in timetable_entries:
-        day_name = days[entry.day_of_week]
-        period = entry.time_slot.period_number
-        
-        if day_name not in timetable:
-            timetable[day_name] = {}
-        
-        timetable[day_name][period] = entry
-        periods.add(period)
-    
-    # Sort periods
-    sorted_periods = sorted(periods)
+    timetable = {day: periods for day, periods in cached['grid'].items() if periods}
+    sorted_periods = cached['periods']
     
     context = {
         'student': student,
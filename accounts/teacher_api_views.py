@@ -10,7 +10,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
 from django.core.cache import cache
 from django.utils import timezone
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, F, Count, Avg, Sum, Exists, OuterRef
 import json
 import csv
 from datetime import datetime, timedelta
@@ -18,9 +18,16 @@ from datetime import datetime, timedelta
 from .models import User, StudentProfile, TeacherProfile
 from timetable.models import (
     Course, Subject, Teacher, TeacherSubject, TimeSlot, Room,
-    TimetableEntry, Enrollment, Attendance, Announcement
+    TimetableEntry, Enrollment, Attendance, Announcement, AttendanceTermSummary, AttendanceBitmap
 )
 from ai_features.models import StudyMaterial, Assignment
+from utils.attendance_archive import ATTENDANCE_SOURCES, get_attendance_model
+from utils.attendance_bitmap import build_heatmap
+from utils.attendance_sync import MAX_SYNC_SESSIONS, record_attendance, sync_attendance_sessions
+from utils.change_feed import (
+    announcement_scopes, build_updates_response, publish, section_scope, teacher_scopes
+)
+from utils.pagination import InvalidCursor, keyset_paginate, parse_page_size
 
 def teacher_required_api(view_func):
     """Decorator to ensure user is a teacher for API calls."""
@@ -28,16 +35,8 @@ def teacher_required_api(view_func):
         if not request.user.is_authenticated:
             return JsonResponse({'success': False, 'message': 'Authentication required'}, status=401)
         
-        # Check if user has teacher profile or is linked to a teacher
-        teacher = None
-        if hasattr(request.user, 'teacherprofile') and request.user.teacherprofile.teacher:
-            teacher = request.user.teacherprofile.teacher
-        else:
-            # Check if user is linked to a Teacher model via email
-            try:
-                teacher = Teacher.objects.get(email=request.user.email, is_active=True)
-            except Teacher.DoesNotExist:
-                pass
+        # Linked teacher, or an active Teacher with the user's email (cached per user)
+        teacher = request.role_context.teacher
         
         if not teacher:
             return JsonResponse({'success': False, 'message': 'Teacher access required'}, status=403)
@@ -103,33 +102,45 @@ def save_attendance(request):
         timetable_entry = get_object_or_404(TimetableEntry, id=class_id, teacher=request.teacher)
         
         with transaction.atomic():
-            saved_count = 0
-            for student_id, status in attendance_data.items():
-                student = get_object_or_404(StudentProfile, pk=student_id)
-                
-                attendance, created = Attendance.objects.get_or_create(
-                    student=student,
-                    timetable_entry=timetable_entry,
-                    date=attendance_date,
-                    defaults={
-                        'status': status,
-                        'marked_by': request.user
-                    }
-                )
-                
-                if not created and attendance.status != status:
-                    attendance.status = status
-                    attendance.marked_by = request.user
-                    attendance.save()
-                
-                saved_count += 1
-        
-        # Broadcast change for real-time sync
-        cache.set(f'attendance_updated_{timetable_entry.id}', True, timeout=300)
+            outcome = record_attendance(timetable_entry, attendance_date, attendance_data, request.user)
         
         return JsonResponse({
             'success': True, 
-            'message': f'Attendance saved for {saved_count} students'
+            'message': f'Attendance saved for {outcome["saved"]} students',
+            'unknown_students': outcome['unknown_students'],
+            'invalid_status': outcome['invalid_status']
+        })
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+@login_required
+@teacher_required_api
+@require_http_methods(["POST"])
+def sync_attendance(request):
+    """
+    Apply several attendance sessions in one request.
+    Body: {"sessions": [{"idempotency_key", "class_id", "date", "attendance": {student_id: status}}]}.
+    Retried sessions with a known idempotency key return their original result.
+    """
+    try:
+        data = json.loads(request.body)
+        sessions = data.get('sessions')
+        if not isinstance(sessions, list) or not sessions:
+            return JsonResponse({'success': False, 'message': 'sessions must be a non-empty list'}, status=400)
+        if len(sessions) > MAX_SYNC_SESSIONS:
+            return JsonResponse({
+                'success': False,
+                'message': f'At most {MAX_SYNC_SESSIONS} sessions can be synced per request'
+            }, status=400)
+        if not all(isinstance(session, dict) for session in sessions):
+            return JsonResponse({'success': False, 'message': 'Each session must be an object'}, status=400)
+        
+        results = sync_attendance_sessions(request.teacher, request.user, sessions)
+        
+        return JsonResponse({
+            'success': all(result['success'] for result in results),
+            'results': results
         })
     
     except Exception as e:
@@ -221,7 +232,9 @@ def upload_study_material(request):
         )
         
         # Broadcast change for real-time sync
-        cache.set(f'materials_updated_{subject_id}', True, timeout=300)
+        publish('material', [
+            f'subject:{subject.id}', f'teacher:{request.teacher.id}', section_scope(course, year, section)
+        ], {'material_id': material.id, 'subject_id': subject.id})
         
         return JsonResponse({
             'success': True,
@@ -239,10 +252,14 @@ def delete_study_material(request, material_id):
     """Delete study material."""
     try:
         material = get_object_or_404(StudyMaterial, id=material_id, uploaded_by=request.user)
+        scopes = [
+            f'subject:{material.subject_id}', f'teacher:{request.teacher.id}',
+            section_scope(material.course, material.year, material.section)
+        ]
         material.delete()
         
         # Broadcast change for real-time sync
-        cache.set(f'materials_updated_{material.subject.id}', True, timeout=300)
+        publish('material', scopes, {'material_id': material_id, 'deleted': True})
         
         return JsonResponse({'success': True, 'message': 'Study material deleted successfully'})
     
@@ -288,7 +305,9 @@ def send_announcement(request):
         )
         
         # Broadcast change for real-time sync
-        cache.set(f'announcements_updated_{request.teacher.id}', True, timeout=300)
+        publish('announcement', announcement_scopes(announcement) + [f'teacher:{request.teacher.id}'], {
+            'announcement_id': announcement.id, 'is_urgent': is_urgent
+        })
         
         return JsonResponse({
             'success': True,
@@ -299,6 +318,23 @@ def send_announcement(request):
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=400)
 
+@login_required
+@teacher_required_api
+@require_http_methods(["GET"])
+def get_class_heatmap(request, class_id):
+    """
+    Term attendance grid for a class (students x weekly sessions).
+    The grid is a base64 string of 2-bit codes, `bytes_per_row` bytes per student.
+    """
+    try:
+        timetable_entry = get_object_or_404(TimetableEntry, id=class_id, teacher=request.teacher)
+        heatmap = build_heatmap(timetable_entry)
+        heatmap['class_id'] = timetable_entry.id
+        return JsonResponse({'success': True, 'heatmap': heatmap})
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
 @login_required
 @teacher_required_api
 @require_http_methods(["GET"])
@@ -369,36 +405,44 @@ def get_class_details(request, class_id):
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=400)
 
+def _filter_class_attendance(query, params):
+    """Apply the report filters (course/year/section/subject) shared by the attendance APIs."""
+    if params.get('course'):
+        query = query.filter(timetable_entry__course=params['course'])
+    if params.get('year'):
+        query = query.filter(timetable_entry__year=int(params['year']))
+    if params.get('section'):
+        query = query.filter(timetable_entry__section=params['section'])
+    if params.get('subject'):
+        query = query.filter(timetable_entry__subject_id=params['subject'])
+    return query
+
 @login_required
 @teacher_required_api
 @require_http_methods(["GET"])
 def get_attendance_summary(request):
     """Get attendance summary for teacher's subjects."""
     try:
-        # Get filters
-        course = request.GET.get('course', '')
-        year = request.GET.get('year', '')
-        section = request.GET.get('section', '')
-        subject_id = request.GET.get('subject', '')
-        
-        # Base query for attendance
-        attendance_query = Attendance.objects.filter(
+        source = request.GET.get('source', 'live')
+        if source not in ATTENDANCE_SOURCES:
+            source = 'live'
+        
+        # Base query for attendance (live table or closed-term archive)
+        attendance_query = _filter_class_attendance(get_attendance_model(source).objects.filter(
             timetable_entry__teacher=request.teacher
-        ).select_related('student', 'student__user', 'timetable_entry__subject')
-        
-        # Apply filters
-        if course:
-            attendance_query = attendance_query.filter(timetable_entry__course=course)
-        if year:
-            attendance_query = attendance_query.filter(timetable_entry__year=int(year))
-        if section:
-            attendance_query = attendance_query.filter(timetable_entry__section=section)
-        if subject_id:
-            attendance_query = attendance_query.filter(timetable_entry__subject_id=subject_id)
+        ).select_related('student', 'student__user', 'timetable_entry__subject'), request.GET)
         
         # Get statistics
-        total_classes = attendance_query.count()
-        present_count = attendance_query.filter(status='present').count()
+        if source == 'archive':
+            totals = _filter_class_attendance(AttendanceTermSummary.objects.filter(
+                timetable_entry__teacher=request.teacher
+            ), request.GET).aggregate(total=Sum('total_count'), present=Sum('present_count'))
+        else:
+            totals = attendance_query.aggregate(
+                total=Count('id'), present=Count('id', filter=Q(status='present'))
+            )
+        total_classes = totals['total'] or 0
+        present_count = totals['present'] or 0
         attendance_percentage = (present_count / total_classes * 100) if total_classes > 0 else 0
         
         # Get recent attendance records
@@ -420,7 +464,8 @@ def get_attendance_summary(request):
             'present_count': present_count,
             'absent_count': total_classes - present_count,
             'attendance_percentage': round(attendance_percentage, 1),
-            'recent_records': attendance_data
+            'recent_records': attendance_data,
+            'source': source
         }
         
         return JsonResponse({'success': True, 'summary': summary})
@@ -431,30 +476,101 @@ def get_attendance_summary(request):
 @login_required
 @teacher_required_api
 @require_http_methods(["GET"])
-def check_teacher_updates(request):
-    """Check for real-time updates for teacher interface."""
+def get_attendance_records(request):
+    """
+    Page through attendance for the teacher's classes, newest first.
+    Uses keyset pagination on (date, marked_at, id): pass back `next_cursor`
+    as `cursor`. `count=approx` adds a total from the bitmap counters,
+    `count=exact` runs a full COUNT.
+    """
     try:
-        teacher_id = request.teacher.id
-        updates = {
-            'has_updates': False,
-            'timestamp': timezone.now().isoformat()
-        }
-        
-        # Check for various update types
-        update_keys = [
-            f'attendance_updated_{teacher_id}',
-            f'materials_updated_{teacher_id}',
-            f'announcements_updated_{teacher_id}',
-            f'timetable_updated_{teacher_id}'
-        ]
+        attendance_query = _filter_class_attendance(Attendance.objects.filter(
+            timetable_entry__teacher=request.teacher
+        ), request.GET)
+        
+        status = request.GET.get('status', '')
+        start_date = request.GET.get('start_date', '')
+        end_date = request.GET.get('end_date', '')
+        if status:
+            attendance_query = attendance_query.filter(status=status)
+        if request.GET.get('student'):
+            attendance_query = attendance_query.filter(student_id=request.GET['student'])
+        if start_date:
+            attendance_query = attendance_query.filter(date__gte=start_date)
+        if end_date:
+            attendance_query = attendance_query.filter(date__lte=end_date)
+        
+        records, next_cursor = keyset_paginate(
+            attendance_query.values(
+                'id', 'date', 'status', 'marked_at', 'student_id', 'student__roll_number',
+                'student__user__first_name', 'student__user__last_name',
+                'timetable_entry_id', 'timetable_entry__subject__name'
+            ),
+            ('date', 'marked_at', 'id'),
+            cursor=request.GET.get('cursor'),
+            page_size=parse_page_size(request.GET.get('page_size'))
+        )
         
-        for key in update_keys:
-            if cache.get(key):
-                updates['has_updates'] = True
-                # Clear the cache key after reading
-                cache.delete(key)
-                break
+        attendance_data = [{
+            'id': record['id'],
+            'student_id': record['student_id'],
+            'student_name': f"{record['student__user__first_name']} {record['student__user__last_name']}".strip(),
+            'roll_number': record['student__roll_number'],
+            'class_id': record['timetable_entry_id'],
+            'subject': record['timetable_entry__subject__name'],
+            'date': record['date'].strftime('%Y-%m-%d'),
+            'status': record['status'],
+            'marked_at': record['marked_at'].strftime('%Y-%m-%d %H:%M')
+        } for record in records]
+        
+        response = {
+            'success': True,
+            'records': attendance_data,
+            'next_cursor': next_cursor
+        }
         
+        count_mode = request.GET.get('count', '')
+        if count_mode == 'exact':
+            response['total_count'] = attendance_query.count()
+        elif count_mode == 'approx':
+            # Bitmaps outlive archiving, so only classes with live attendance
+            # in the requested dates are summed. Their counters still cover
+            # the whole term and skip excused marks, hence "approximate"
+            live_sessions = Attendance.objects.filter(timetable_entry=OuterRef('timetable_entry'))
+            if start_date:
+                live_sessions = live_sessions.filter(date__gte=start_date)
+            if end_date:
+                live_sessions = live_sessions.filter(date__lte=end_date)
+            bitmap_query = _filter_class_attendance(AttendanceBitmap.objects.filter(
+                Exists(live_sessions), timetable_entry__teacher=request.teacher
+            ), request.GET)
+            if request.GET.get('student'):
+                bitmap_query = bitmap_query.filter(student_id=request.GET['student'])
+            counter_fields = {'present': 'present_count', 'absent': 'absent_count', 'late': 'late_count'}
+            if status in counter_fields:
+                counter = Sum(counter_fields[status])
+            else:
+                counter = Sum(F('present_count') + F('absent_count') + F('late_count'))
+            # Excused marks are not counted in the bitmaps
+            if status and status not in counter_fields:
+                response['approximate_count'] = None
+            else:
+                response['approximate_count'] = bitmap_query.aggregate(total=counter)['total'] or 0
+        
+        return JsonResponse(response)
+    
+    except InvalidCursor as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+@login_required
+@teacher_required_api
+@require_http_methods(["GET"])
+def check_teacher_updates(request):
+    """Check for real-time updates for teacher interface (pass ?since=<cursor>)."""
+    try:
+        updates = build_updates_response(request.GET.get('since'), teacher_scopes(request.teacher))
         return JsonResponse(updates)
     
     except Exception as e:
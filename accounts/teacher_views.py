@@ -16,9 +16,13 @@ import json
 from accounts.models import User, StudentProfile, TeacherProfile
 from timetable.models import (
     Course, Subject, Teacher, TeacherSubject, TimeSlot, Room,
-    TimetableEntry, Enrollment, Attendance, Announcement
+    TimetableEntry, Enrollment, Attendance, Announcement, AttendanceTermSummary
 )
 from ai_features.models import StudyMaterial, Assignment
+from utils.attendance_archive import ATTENDANCE_SOURCES, get_attendance_model
+from utils.attendance_sync import record_attendance
+from utils.change_feed import announcement_scopes, publish, section_scope
+from utils.timetable_cache import entries_on, get_teacher_timetable
 
 def teacher_required(view_func):
     """Decorator to ensure user is a teacher."""
@@ -31,18 +35,19 @@ def teacher_required(view_func):
             messages.error(request, 'Access denied. Teacher account required.')
             return redirect('accounts:landing')
         
-        # Check if user has teacher profile
-        if not hasattr(request.user, 'teacherprofile'):
+        # Check if user has teacher profile (resolved and cached by RoleContextMiddleware)
+        role_context = request.role_context
+        if role_context.teacher_profile is None:
             messages.error(request, 'Teacher profile not found. Please contact administrator.')
             return redirect('accounts:landing')
         
         # Get teacher record - first try from TeacherProfile, then by email matching
         teacher = None
-        teacher_profile = request.user.teacherprofile
+        teacher_profile = role_context.teacher_profile
         
         # Try to get linked Teacher model record
-        if teacher_profile.teacher:
-            teacher = teacher_profile.teacher
+        if role_context.teacher_linked:
+            teacher = role_context.teacher
         else:
             # Try to find Teacher model record by email or employee_id
             try:
@@ -120,17 +125,11 @@ def teacher_dashboard(request):
     today = timezone.now().date()
     today_weekday = today.weekday()  # Monday is 0
     
-    today_classes = TimetableEntry.objects.filter(
-        teacher=teacher,
-        is_active=True,
-        day_of_week=today_weekday
-    ).select_related('subject', 'time_slot', 'room').order_by('time_slot__start_time')
+    timetable = get_teacher_timetable(teacher.id)
+    today_classes = entries_on(timetable, today_weekday)
     
     # Get upcoming classes (next 7 days)
-    upcoming_classes = TimetableEntry.objects.filter(
-        teacher=teacher,
-        is_active=True
-    ).select_related('subject', 'time_slot', 'room').order_by('day_of_week', 'time_slot__start_time')[:10]
+    upcoming_classes = timetable['entries'][:10]
     
     # Get students count across all classes
     total_students = Enrollment.objects.filter(
@@ -178,28 +177,12 @@ def teacher_timetable(request):
     """View teacher's complete timetable."""
     teacher = request.teacher
     
-    # Get all timetable entries for the teacher
-    timetable_entries = TimetableEntry.objects.filter(
-        teacher=teacher,
-        is_active=True
-    ).select_related('subject', 'time_slot', 'room').order_by('day_of_week', 'time_slot__start_time')
+    # Cached grid: day name -> time slot id -> entry
+    timetable_grid = get_teacher_timetable(teacher.id)['grid']
     
     # Get all time slots for structure
     time_slots = TimeSlot.objects.filter(is_active=True).order_by('period_number')
-    
-    # Organize timetable by day and time
     days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-    timetable_grid = {}
-    
-    for day_num, day_name in enumerate(days):
-        timetable_grid[day_name] = {}
-        for time_slot in time_slots:
-            timetable_grid[day_name][time_slot.id] = None
-    
-    # Fill the grid with actual entries
-    for entry in timetable_entries:
-        day_name = days[entry.day_of_week]
-        timetable_grid[day_name][entry.time_slot.id] = entry
     
     context = {
         'teacher': teacher,
@@ -349,31 +332,17 @@ def mark_attendance(request):
             timetable_entry = get_object_or_404(TimetableEntry, id=timetable_entry_id, teacher=teacher)
             
             # Get enrolled students for this subject
-            enrolled_students = Enrollment.objects.filter(
+            enrolled_student_ids = Enrollment.objects.filter(
                 subject=timetable_entry.subject,
                 is_active=True
-            ).select_related('student', 'student__user')
+            ).values_list('student_id', flat=True)
             
+            statuses = {
+                student_id: request.POST.get(f'attendance_{student_id}', 'absent')
+                for student_id in enrolled_student_ids
+            }
             with transaction.atomic():
-                for enrollment in enrolled_students:
-                    student_id = str(enrollment.student.pk)
-                    status = request.POST.get(f'attendance_{student_id}', 'absent')
-                    
-                    # Create or update attendance record
-                    attendance, created = Attendance.objects.get_or_create(
-                        student=enrollment.student,
-                        timetable_entry=timetable_entry,
-                        date=attendance_date,
-                        defaults={
-                            'status': status,
-                            'marked_by': request.user
-                        }
-                    )
-                    
-                    if not created:
-                        attendance.status = status
-                        attendance.marked_by = request.user
-                        attendance.save()
+                record_attendance(timetable_entry, attendance_date, statuses, request.user)
             
             messages.success(request, 'Attendance marked successfully!')
             return redirect('accounts:mark_attendance')
@@ -441,7 +410,7 @@ def manage_materials(request):
         
         if action == 'add_material':
             try:
-                StudyMaterial.objects.create(
+                material = StudyMaterial.objects.create(
                     title=request.POST.get('title'),
                     description=request.POST.get('description'),
                     subject_id=request.POST.get('subject_id'),
@@ -454,6 +423,10 @@ def manage_materials(request):
                     uploaded_by=request.user,
                     is_published=bool(request.POST.get('is_published'))
                 )
+                publish('material', [
+                    f'subject:{material.subject_id}', f'teacher:{teacher.id}',
+                    section_scope(material.course, material.year, material.section)
+                ], {'material_id': material.id, 'subject_id': material.subject_id})
                 messages.success(request, 'Study material added successfully!')
             except Exception as e:
                 messages.error(request, 'Failed to add study material.')
@@ -512,7 +485,7 @@ def teacher_announcements(request):
     
     if request.method == 'POST':
         try:
-            Announcement.objects.create(
+            announcement = Announcement.objects.create(
                 title=request.POST.get('title'),
                 content=request.POST.get('content'),
                 posted_by=request.user,
@@ -522,6 +495,9 @@ def teacher_announcements(request):
                 target_section=request.POST.get('target_section', ''),
                 is_urgent=bool(request.POST.get('is_urgent'))
             )
+            publish('announcement', announcement_scopes(announcement) + [f'teacher:{teacher.id}'], {
+                'announcement_id': announcement.id
+            })
             messages.success(request, 'Announcement posted successfully!')
         except Exception as e:
             messages.error(request, 'Failed to post announcement.')
@@ -570,40 +546,62 @@ def attendance_reports(request):
     year = request.GET.get('year', '')
     section = request.GET.get('section', '')
     subject_id = request.GET.get('subject', '')
-    
-    # Base query for attendance
-    attendance_query = Attendance.objects.filter(
+    source = request.GET.get('source', 'live')
+    if source not in ATTENDANCE_SOURCES:
+        source = 'live'
+    
+    def apply_filters(query):
+        if course:
+            query = query.filter(timetable_entry__course=course)
+        if year:
+            query = query.filter(timetable_entry__year=int(year))
+        if section:
+            query = query.filter(timetable_entry__section=section)
+        if subject_id:
+            query = query.filter(timetable_entry__subject_id=subject_id)
+        return query
+    
+    # Base query for attendance (live table or closed-term archive)
+    attendance_query = apply_filters(get_attendance_model(source).objects.filter(
         timetable_entry__teacher=teacher
-    ).select_related('student', 'student__user', 'timetable_entry__subject')
-    
-    # Apply filters
-    if course:
-        attendance_query = attendance_query.filter(timetable_entry__course=course)
-    if year:
-        attendance_query = attendance_query.filter(timetable_entry__year=int(year))
-    if section:
-        attendance_query = attendance_query.filter(timetable_entry__section=section)
-    if subject_id:
-        attendance_query = attendance_query.filter(timetable_entry__subject_id=subject_id)
-    
-    # Get attendance statistics
-    total_classes = attendance_query.count()
-    present_count = attendance_query.filter(status='present').count()
-    attendance_percentage = (present_count / total_classes * 100) if total_classes > 0 else 0
+    ).select_related('student', 'student__user', 'timetable_entry__subject'))
     
     # Get recent attendance records
     recent_attendance = attendance_query.order_by('-date', '-marked_at')[:50]
     
-    # Get student-wise attendance summary
-    from django.db.models import Count, Case, When, IntegerField
-    student_attendance = attendance_query.values(
-        'student_id', 'student__roll_number', 'student__user__first_name', 'student__user__last_name'
-    ).annotate(
-        total_classes=Count('id'),
-        present_classes=Count(Case(When(status='present', then=1), output_field=IntegerField())),
-        absent_classes=Count(Case(When(status='absent', then=1), output_field=IntegerField())),
-        late_classes=Count(Case(When(status='late', then=1), output_field=IntegerField()))
-    ).order_by('-present_classes')
+    from django.db.models import Case, When, IntegerField, Sum
+    if source == 'archive':
+        # Closed terms are served from pre-aggregated summaries, not raw rows
+        summary_query = apply_filters(AttendanceTermSummary.objects.filter(
+            timetable_entry__teacher=teacher
+        ))
+        totals = summary_query.aggregate(total=Sum('total_count'), present=Sum('present_count'))
+        total_classes = totals['total'] or 0
+        present_count = totals['present'] or 0
+        
+        student_attendance = summary_query.values(
+            'student_id', 'student__roll_number', 'student__user__first_name', 'student__user__last_name'
+        ).annotate(
+            total_classes=Sum('total_count'),
+            present_classes=Sum('present_count'),
+            absent_classes=Sum('absent_count'),
+            late_classes=Sum('late_count')
+        ).order_by('-present_classes')
+    else:
+        # Get student-wise attendance summary
+        student_attendance = list(attendance_query.values(
+            'student_id', 'student__roll_number', 'student__user__first_name', 'student__user__last_name'
+        ).annotate(
+            total_classes=Count('id'),
+            present_classes=Count(Case(When(status='present', then=1), output_field=IntegerField())),
+            absent_classes=Count(Case(When(status='absent', then=1), output_field=IntegerField())),
+            late_classes=Count(Case(When(status='late', then=1), output_field=IntegerField()))
+        ).order_by('-present_classes'))
+        
+        # Overall statistics fall out of the per-student aggregate, no extra COUNT queries
+        total_classes = sum(student['total_classes'] for student in student_attendance)
+        present_count = sum(student['present_classes'] for student in student_attendance)
+    attendance_percentage = (present_count / total_classes * 100) if total_classes > 0 else 0
     
     # Calculate percentage for each student
     for student in student_attendance:
@@ -645,7 +643,8 @@ def attendance_reports(request):
         'selected_course': course,
         'selected_year': year,
         'selected_section': section,
-        'selected_subject': subject_id
+        'selected_subject': subject_id,
+        'selected_source': source
     }
     
     return render(request, 'teacher/attendance_reports.html', context)
@@ -1,3 +1,181 @@
-from django.test import TestCase
+from datetime import timedelta
+import io
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import OutboundMessage, StudentProfile, User
+from utils.executor import CircuitBreaker, CircuitOpenError, OutboundExecutor
+from utils.otp_store import OTPRateLimited, consume_otp, issue_otp
+from utils.outbox import REDACTED_BODY, claim_due, enqueue_email, send_message
+from utils.student_import import import_students, read_rows
+from utils.throttle import client_ip
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class StudentImportTests(TestCase):
+    """Rows that clash with existing accounts are rejected without aborting the import."""
+
+    HEADER = b'roll_number,first_name,last_name,email,course,year,section\n'
+
+    def _import(self, *lines):
+        csv = io.BytesIO(self.HEADER + b''.join(line + b'\n' for line in lines))
+        return import_students(read_rows(csv, 'students.csv'), workers=1, enrol=False)
+
+    def test_existing_email_is_matched_case_insensitively(self):
+        User.objects.create(username='OLD1', email='Asha.Rao@Example.com', user_type='student')
+        result = self._import(b'R1,Asha,Rao,asha.rao@example.com,B.Tech,1,A')
+        self.assertEqual((result['created'], result['skipped']), (0, 1))
+        self.assertEqual(result['errors'][0]['errors'], ['Email already registered.'])
+
+    def test_account_registered_during_the_import_only_rejects_its_row(self):
+        User.objects.create(username='R2', email='someone@example.com', user_type='student')
+        # As if R2 registered after the batch was checked
+        with mock.patch('utils.student_import._existing', return_value=(set(), set())):
+            result = self._import(b'R1,Asha,Rao,asha@example.com,B.Tech,1,A',
+                                  b'R2,Ravi,Kumar,ravi@example.com,B.Tech,1,A',
+                                  b'R3,Mira,Shah,mira@example.com,B.Tech,1,A')
+        self.assertEqual((result['created'], result['skipped']), (2, 1))
+        self.assertEqual(result['errors'][0]['roll_number'], 'R2')
+        self.assertEqual(sorted(StudentProfile.objects.values_list('roll_number', flat=True)), ['R1', 'R3'])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, OTP_AUDIT=False, OTP_MAX_ATTEMPTS=3)
+class OTPStoreTests(TestCase):
+    """Codes in the cache store are single-use, burned by wrong guesses and revoked on reissue."""
+
+    @staticmethod
+    def _wrong(code):
+        return f'{(int(code) + 1) % 10 ** 6:06d}'
+
+    def test_code_is_consumed_once(self):
+        code = issue_otp('Asha@Example.com')
+        self.assertTrue(consume_otp('asha@example.com', code))
+        self.assertFalse(consume_otp('asha@example.com', code))
+
+    def test_code_is_burned_after_max_attempts(self):
+        code = issue_otp('asha@example.com')
+        for _ in range(3):
+            self.assertFalse(consume_otp('asha@example.com', self._wrong(code)))
+        with self.assertRaises(OTPRateLimited):
+            consume_otp('asha@example.com', code)
+
+        # A new code starts with a clean slate
+        self.assertTrue(consume_otp('asha@example.com', issue_otp('asha@example.com')))
+
+    def test_reissue_revokes_the_previous_code(self):
+        with mock.patch('utils.otp_store.generate_code', side_effect=['111111', '222222']):
+            issue_otp('asha@example.com')
+            issue_otp('asha@example.com')
+        self.assertFalse(consume_otp('asha@example.com', '111111'))
+        self.assertTrue(consume_otp('asha@example.com', '222222'))
+
+
+class ClientIPTests(TestCase):
+    """Only the X-Forwarded-For hop added by our own outermost proxy is trusted."""
+
+    def _ip(self, forwarded_for=None):
+        headers = {'HTTP_X_FORWARDED_FOR': forwarded_for} if forwarded_for else {}
+        return client_ip(RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', **headers))
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_client_supplied_hops_are_ignored(self):
+        self.assertEqual(self._ip('198.51.100.9, 203.0.113.7'), '203.0.113.7')
+
+    @override_settings(TRUSTED_PROXY_COUNT=2)
+    def test_hop_added_by_the_outermost_of_two_proxies(self):
+        self.assertEqual(self._ip('198.51.100.9, 203.0.113.7, 10.0.0.2'), '203.0.113.7')
+        # Fewer hops than proxies: the header did not come through them
+        self.assertEqual(self._ip('203.0.113.7'), '10.0.0.1')
+
+    @override_settings(TRUSTED_PROXY_COUNT=0)
+    def test_header_is_ignored_without_trusted_proxies(self):
+        self.assertEqual(self._ip('203.0.113.7'), '10.0.0.1')
+
+
+def _failing_sender(message):
+    raise ConnectionError('SMTP server unavailable')
+
+
+@override_settings(OUTBOX_INLINE_WORKERS=0)
+@mock.patch('utils.executor._executor', None)
+class OutboxTests(TestCase):
+    """Claiming, retrying and dead-lettering queued messages."""
+
+    def _enqueue(self, **kwargs):
+        return enqueue_email('asha@example.com', 'Your code', 'Code: 123456', purpose='registration', **kwargs)
+
+    def test_message_is_claimed_once(self):
+        self._enqueue()
+        message = claim_due()[0]
+        self.assertEqual((message.status, message.attempts), ('sending', 1))
+        self.assertEqual(claim_due(), [])
+
+    def test_sent_otp_message_is_redacted(self):
+        message = self._enqueue()
+        self.assertEqual(send_message(claim_due()[0]), 'sent')
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.body), ('sent', REDACTED_BODY))
+        self.assertEqual(mail.outbox[0].body, 'Code: 123456')
+
+    @mock.patch.dict('utils.outbox.SENDERS', {'email': _failing_sender})
+    def test_failed_send_is_retried_after_a_backoff(self):
+        message = self._enqueue()
+        self.assertEqual(send_message(claim_due()[0]), 'retry')
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'pending')
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertIn('SMTP server unavailable', message.last_error)
+        self.assertEqual(claim_due(), [])
+
+        OutboundMessage.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim_due()[0].attempts, 2)
+
+    @mock.patch.dict('utils.outbox.SENDERS', {'email': _failing_sender})
+    def test_last_failed_attempt_dead_letters_and_redacts(self):
+        message = self._enqueue(max_attempts=1)
+        self.assertEqual(send_message(claim_due()[0]), 'dead')
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.body), ('dead', REDACTED_BODY))
+        self.assertEqual(claim_due(), [])
+
+
+class CircuitBreakerTests(TestCase):
+    """The breaker opens after consecutive failures and lets one trial call through after the cooldown."""
+
+    @mock.patch('utils.executor.time.monotonic')
+    def test_open_half_open_closed(self, monotonic):
+        monotonic.return_value = 100
+        breaker = CircuitBreaker(threshold=2, cooldown=30)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        monotonic.return_value = 130
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # one trial at a time
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+        monotonic.return_value = 160
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+
+    def test_open_circuit_fails_calls_without_running_them(self):
+        executor = OutboundExecutor(workers=2, queue_limit=2, destination_limit=1, breaker_threshold=2,
+                                    breaker_cooldown=30)
+        self.addCleanup(executor.pool.shutdown)
+        func = mock.Mock(side_effect=ConnectionError('down'))
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                executor.call('smtp', func, deadline=5)
+        with self.assertRaises(CircuitOpenError):
+            executor.call('smtp', func, deadline=5)
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(executor.metrics()['destinations']['smtp']['circuit'], 'open')
@@ -1,5 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, authenticate, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
@@ -10,8 +10,11 @@ from django.utils import timezone
 import json
 import re
 
-from .models import User, StudentProfile, AdminProfile, TeacherProfile, OTP, EmailOTP
+from .models import User, StudentProfile, AdminProfile, TeacherProfile
+from timetable.models import TimetableEntry
+from utils.login import LoginThrottled, authenticate_login
 from utils.notifications import send_otp_notification
+from utils.otp_store import OTPRateLimited, consume_otp, issue_otp
 import logging
 
 logger = logging.getLogger(__name__)
@@ -43,6 +46,15 @@ def register_choice(request):
     """Registration choice page."""
     return render(request, 'accounts/register_choice.html')
 
+def registration_sections():
+    """Sections offered on the registration form: A-D plus every section with an active timetable."""
+    timetabled = TimetableEntry.objects.filter(is_active=True).order_by().values_list('section', flat=True).distinct()
+    return sorted({'A', 'B', 'C', 'D'} | set(timetabled), key=lambda section: (len(section), section))
+
+def _register_page(request, context=None):
+    # Passed uncalled so the query only runs when the form step is shown
+    return render(request, 'accounts/student_register.html', {'sections': registration_sections, **(context or {})})
+
 def student_register(request):
     """Student registration view with OTP verification."""
     if request.method == 'POST':
@@ -55,7 +67,7 @@ def student_register(request):
             # Step 2: Verify OTP and complete registration
             return handle_student_registration_step2(request)
     
-    return render(request, 'accounts/student_register.html')
+    return _register_page(request)
 
 def handle_student_registration_step1(request):
     """Handle step 1 of student registration - collect info and send Email OTP (FREE)."""
@@ -81,8 +93,8 @@ def handle_student_registration_step1(request):
         if year not in [1, 2, 3, 4]:
             errors.append('Invalid year. Must be 1-4.')
         
-        if len(section) != 1 or not section.isalpha():
-            errors.append('Section must be a single letter (A, B, C, etc.)')
+        if not re.match(r'^[A-Z]{1,5}$', section):
+            errors.append('Section must be 1-5 letters (A, B, AAIML, etc.)')
         
         if not re.match(r'^[A-Z0-9]+$', roll_number):
             errors.append('Roll number should contain only uppercase letters and numbers.')
@@ -112,10 +124,10 @@ def handle_student_registration_step1(request):
         if errors:
             for error in errors:
                 messages.error(request, error)
-            return render(request, 'accounts/student_register.html')
+            return _register_page(request)
         
         # Generate and send Email OTP (FREE!)
-        otp_code = EmailOTP.generate_otp(email, 'registration')
+        otp_code = issue_otp(email, 'registration', request)
         
         # Send OTP notification (returns tuple: success, otp_code, error_message)
         success, otp_code, error_message = handle_otp_notification(email, otp_code, 'registration')
@@ -146,7 +158,7 @@ def handle_student_registration_step1(request):
             else:
                 messages.success(request, f'📧 OTP sent to {email}. Please check your email and enter the 6-digit code to complete registration.')
             
-            return render(request, 'accounts/student_register.html', {
+            return _register_page(request, {
                 'step': 2,
                 'email': email,
                 'show_otp': bool(error_message),  # Show OTP in template if email failed
@@ -154,11 +166,14 @@ def handle_student_registration_step1(request):
             })
         else:
             messages.error(request, f'Failed to send OTP email: {error_message if error_message else "Unknown error"}. Please try again or contact support.')
-            return render(request, 'accounts/student_register.html')
+            return _register_page(request)
             
+    except OTPRateLimited as e:
+        messages.error(request, str(e))
+        return _register_page(request)
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
-        return render(request, 'accounts/student_register.html')
+        return _register_page(request)
 
 def handle_student_registration_step2(request):
     """Handle step 2 of student registration - verify OTP and create account."""
@@ -172,13 +187,13 @@ def handle_student_registration_step2(request):
         
         if not otp_code:
             messages.error(request, 'Please enter the OTP code.')
-            return render(request, 'accounts/student_register.html', {
+            return _register_page(request, {
                 'step': 2,
                 'email': reg_data['email']
             })
         
         # Verify Email OTP
-        if EmailOTP.verify_otp(reg_data['email'], otp_code, 'registration'):
+        if consume_otp(reg_data['email'], otp_code, 'registration', request):
             # Create user and profile
             with transaction.atomic():
                 user = User.objects.create_user(
@@ -207,14 +222,20 @@ def handle_student_registration_step2(request):
             return redirect('accounts:login')
         else:
             messages.error(request, 'Invalid or expired OTP. Please try again.')
-            return render(request, 'accounts/student_register.html', {
+            return _register_page(request, {
                 'step': 2,
                 'email': reg_data['email']
             })
             
+    except OTPRateLimited as e:
+        messages.error(request, str(e))
+        return _register_page(request, {
+            'step': 2,
+            'email': request.session.get('reg_data', {}).get('email', '')
+        })
     except Exception as e:
         messages.error(request, 'An error occurred during verification. Please try again.')
-        return render(request, 'accounts/student_register.html', {
+        return _register_page(request, {
             'step': 2,
             'email': request.session.get('reg_data', {}).get('email', '')
         })
@@ -285,7 +306,7 @@ def handle_admin_registration_step1(request):
             return render(request, 'accounts/admin_register.html')
         
         # Generate and send Email OTP (FREE!)
-        otp_code = EmailOTP.generate_otp(email, 'registration')
+        otp_code = issue_otp(email, 'registration', request)
         
         success, otp_code, error_message = handle_otp_notification(email, otp_code, 'registration')
         
@@ -322,6 +343,9 @@ def handle_admin_registration_step1(request):
             messages.error(request, f'Failed to send OTP email: {error_message if error_message else "Unknown error"}. Please try again or contact support.')
             return render(request, 'accounts/admin_register.html')
             
+    except OTPRateLimited as e:
+        messages.error(request, str(e))
+        return render(request, 'accounts/admin_register.html')
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
         return render(request, 'accounts/admin_register.html')
@@ -344,7 +368,7 @@ def handle_admin_registration_step2(request):
             })
         
         # Verify Email OTP
-        if EmailOTP.verify_otp(reg_data['email'], otp_code, 'registration'):
+        if consume_otp(reg_data['email'], otp_code, 'registration', request):
             # Create user and profile
             with transaction.atomic():
                 user = User.objects.create_user(
@@ -377,6 +401,12 @@ def handle_admin_registration_step2(request):
                 'email': reg_data['email']
             })
             
+    except OTPRateLimited as e:
+        messages.error(request, str(e))
+        return render(request, 'accounts/admin_register.html', {
+            'step': 2,
+            'email': request.session.get('reg_data', {}).get('email', '')
+        })
     except Exception as e:
         messages.error(request, 'An error occurred during verification. Please try again.')
         return render(request, 'accounts/admin_register.html', {
@@ -456,7 +486,7 @@ def handle_teacher_registration_step1(request):
             return render(request, 'accounts/teacher_register.html')
         
         # Generate and send Email OTP (FREE!)
-        otp_code = EmailOTP.generate_otp(email, 'registration')
+        otp_code = issue_otp(email, 'registration', request)
         
         success, otp_code, error_message = handle_otp_notification(email, otp_code, 'registration')
         
@@ -495,6 +525,9 @@ def handle_teacher_registration_step1(request):
             messages.error(request, f'Failed to send OTP email: {error_message if error_message else "Unknown error"}. Please try again or contact support.')
             return render(request, 'accounts/teacher_register.html')
             
+    except OTPRateLimited as e:
+        messages.error(request, str(e))
+        return render(request, 'accounts/teacher_register.html')
     except Exception as e:
         messages.error(request, 'An error occurred. Please try again.')
         return render(request, 'accounts/teacher_register.html')
@@ -517,7 +550,7 @@ def handle_teacher_registration_step2(request):
             })
         
         # Verify Email OTP
-        if EmailOTP.verify_otp(reg_data['email'], otp_code, 'registration'):
+        if consume_otp(reg_data['email'], otp_code, 'registration', request):
             # Create user and profile
             with transaction.atomic():
                 user = User.objects.create_user(
@@ -551,6 +584,12 @@ def handle_teacher_registration_step2(request):
                 'email': reg_data['email']
             })
             
+    except OTPRateLimited as e:
+        messages.error(request, str(e))
+        return render(request, 'accounts/teacher_register.html', {
+            'step': 2,
+            'email': request.session.get('reg_data', {}).get('email', '')
+        })
     except Exception as e:
         messages.error(request, 'An error occurred during verification. Please try again.')
         return render(request, 'accounts/teacher_register.html', {
@@ -569,27 +608,12 @@ def user_login(request):
             messages.error(request, 'Please enter both user ID and password.')
             return render(request, 'accounts/login.html')
         
-        # For teachers, also try email if employee_id fails
-        user = None
-        if user_type == 'teacher':
-            # First try with the provided user_id as username
-            user = authenticate(request, username=user_id, password=password)
-            
-            # If that fails and user_id looks like email, try finding by email
-            if user is None and '@' in user_id:
-                try:
-                    # Find user by email and teacher type
-                    email_user = User.objects.get(email=user_id, user_type='teacher')
-                    user = authenticate(request, username=email_user.username, password=password)
-                except User.DoesNotExist:
-                    pass
-        else:
-            # For students and admins, normalize to uppercase (IDs are stored uppercase)
-            normalized_id = user_id.upper()
-            user = authenticate(request, username=normalized_id, password=password)
-            if user is None and user_id != normalized_id:
-                # Fallback: try as-is just in case
-                user = authenticate(request, username=user_id, password=password)
+        # One account lookup and at most one password hash (utils/login.py)
+        try:
+            user = authenticate_login(request, user_id, password, user_type)
+        except LoginThrottled as e:
+            messages.error(request, str(e))
+            return render(request, 'accounts/login.html', status=429)
         
         if user is not None:
             if user.is_active:
@@ -654,7 +678,11 @@ def forgot_password(request):
                 return render(request, 'accounts/forgot_password.html')
             
             # Generate Email OTP for password reset
-            otp_code = EmailOTP.generate_otp(user.email, 'password_reset')
+            try:
+                otp_code = issue_otp(user.email, 'password_reset', request)
+            except OTPRateLimited as e:
+                messages.error(request, str(e))
+                return render(request, 'accounts/forgot_password.html')
             
             # Send Email OTP
             success, otp_code, error_message = handle_otp_notification(user.email, otp_code, 'password_reset')
@@ -694,7 +722,13 @@ def verify_otp(request):
         
         email = request.session['reset_email']
         
-        if EmailOTP.verify_otp(email, otp_code, 'password_reset'):
+        try:
+            verified = consume_otp(email, otp_code, 'password_reset', request)
+        except OTPRateLimited as e:
+            messages.error(request, str(e))
+            return render(request, 'accounts/verify_otp.html')
+        
+        if verified:
             messages.success(request, 'OTP verified successfully. Please set your new password.')
             return redirect('accounts:reset_password')
         else:
@@ -749,8 +783,6 @@ def reset_password(request):
 @require_http_methods(["POST"])
 def resend_registration_otp(request):
     """Resend OTP for registration verification."""
-    import threading
-    
     if 'reg_data' not in request.session:
         return JsonResponse({
             'success': False,
@@ -768,29 +800,22 @@ def resend_registration_otp(request):
             }, status=400)
         
         # Generate new Email OTP
-        otp_code = EmailOTP.generate_otp(email, 'registration')
+        otp_code = issue_otp(email, 'registration', request)
         
-        # Send Email OTP in background to prevent timeout (fire-and-forget in production)
-        # Return immediately with success, OTP will be sent async
-        def send_email_async():
-            try:
-                handle_otp_notification(email, otp_code, 'registration')
-            except Exception as e:
-                logger.error(f"Background email send failed: {str(e)}")
+        # Queues the email in the outbox; nothing is sent on this request
+        handle_otp_notification(email, otp_code, 'registration')
         
-        # Start email sending in background thread
-        email_thread = threading.Thread(target=send_email_async, daemon=True)
-        email_thread.start()
-        
-        # Return success immediately (email is being sent in background)
-        # In production, email sending is already non-blocking, but we return immediately here
-        # to prevent any potential timeout
         return JsonResponse({
             'success': True,
             'message': f'OTP code sent to {email}. Please check your email inbox.',
             'otp_code': None  # Don't send OTP in response, user should check email
         })
             
+    except OTPRateLimited as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=429)
     except Exception as e:
         logger.error(f"Error in resend_registration_otp: {str(e)}")
         return JsonResponse({
@@ -0,0 +1,111 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ai_features.models import SmartNotification
+from timetable.models import Subject
+from utils.absenteeism import (
+    DEFAULT_THRESHOLDS,
+    NUMPY_AVAILABLE,
+    compute_attendance_metrics,
+    dedupe_key,
+    find_breaches,
+    load_term_matrix,
+    recent_dedupe_keys,
+)
+
+
+class Command(BaseCommand):
+    help = "Detect chronic absenteeism for the current term and create attendance_warning notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', type=str, default=None, help='Academic year (default: current)')
+        parser.add_argument('--semester', type=int, default=None, help='Semester (default: current)')
+        parser.add_argument('--window-days', type=int, default=28, help='Rolling window in days (default: 28)')
+        parser.add_argument('--rate-threshold', type=float, default=DEFAULT_THRESHOLDS['rate'],
+                            help='Flag attendance below this percentage (default: 75)')
+        parser.add_argument('--streak-threshold', type=int, default=DEFAULT_THRESHOLDS['streak'],
+                            help='Flag this many consecutive missed classes (default: 3)')
+        parser.add_argument('--min-classes', type=int, default=DEFAULT_THRESHOLDS['min_classes'],
+                            help='Minimum classes before a student is judged (default: 5)')
+        parser.add_argument('--dry-run', action='store_true', help='Report breaches without creating notifications')
+
+    def handle(self, *args, **options):
+        if not NUMPY_AVAILABLE:
+            raise CommandError('numpy is required for absenteeism detection (pip install numpy)')
+
+        started = time.monotonic()
+        matrix = load_term_matrix(options['academic_year'], options['semester'])
+        if matrix is None:
+            self.stdout.write(self.style.WARNING('No attendance recorded for this term.'))
+            return
+        loaded = time.monotonic()
+
+        metrics = compute_attendance_metrics(matrix, window_days=options['window_days'])
+        breaches = find_breaches(matrix, metrics, {
+            'rate': options['rate_threshold'],
+            'streak': options['streak_threshold'],
+            'min_classes': options['min_classes'],
+        })
+        computed = time.monotonic()
+
+        self.stdout.write(
+            f"Analysed {len(matrix['student']):,} records for {len(matrix['student_ids']):,} students "
+            f"(load {loaded - started:.1f}s, compute {computed - loaded:.1f}s); {len(breaches):,} at risk"
+        )
+        if options['dry_run'] or not breaches:
+            return
+
+        existing = recent_dedupe_keys()
+        subject_names = dict(Subject.objects.filter(
+            id__in={subject_id for b in breaches.values() for subject_id, _ in b['low_subjects']}
+        ).values_list('id', 'name'))
+        expires_at = timezone.now() + timedelta(days=7)
+
+        notifications = []
+        for student_id, breach in breaches.items():
+            key = dedupe_key(student_id)
+            if key in existing:
+                continue
+            notifications.append(SmartNotification(
+                recipient_id=student_id,  # StudentProfile pk is the user id
+                notification_type='attendance_warning',
+                title='Attendance needs attention',
+                message=self._build_message(breach, subject_names),
+                priority=self._priority(breach, options['rate_threshold']),
+                ai_context={'dedupe_key': key, 'source': 'detect_absenteeism', **breach},
+                confidence_score=min(1.0, breach['total_classes'] / 20),
+                expires_at=expires_at,
+            ))
+
+        SmartNotification.objects.bulk_create(notifications, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(notifications):,} notifications "
+            f"({len(breaches) - len(notifications):,} already notified this week) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
+
+    def _priority(self, breach, rate_threshold):
+        if breach['rate'] < rate_threshold - 25 or breach['streak'] >= 6:
+            return 'urgent'
+        if 'low_rate' in breach['flags'] or 'absence_streak' in breach['flags']:
+            return 'high'
+        return 'medium'
+
+    def _build_message(self, breach, subject_names):
+        parts = [f"Your attendance this term is {breach['rate']}% across {breach['total_classes']} classes."]
+        if 'low_rolling_rate' in breach['flags']:
+            parts.append(f"Recent attendance has dropped to {breach['rolling_rate']}%.")
+        if 'absence_streak' in breach['flags']:
+            parts.append(f"You have missed your last {breach['streak']} classes.")
+        if 'declining_trend' in breach['flags']:
+            parts.append("Your attendance has been declining week over week.")
+        if breach['low_subjects']:
+            subjects = ', '.join(
+                f"{subject_names.get(subject_id, 'Unknown')} ({rate}%)"
+                for subject_id, rate in breach['low_subjects']
+            )
+            parts.append(f"Subjects below the requirement: {subjects}.")
+        return ' '.join(parts)
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-19 07:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_features', '0002_timetableconfiguration_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aichat',
+            index=models.Index(fields=['updated_at'], name='aichat_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smartnotification',
+            index=models.Index(fields=['expires_at'], name='smart_notif_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studyrecommendation',
+            index=models.Index(fields=['expires_at'], name='study_rec_expires_idx'),
+        ),
+    ]
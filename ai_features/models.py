@@ -21,6 +21,9 @@ class AIChat(models.Model):
     
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['updated_at'], name='aichat_updated_idx'),
+        ]
     
     def __str__(self):
         return f"Chat {self.session_id} - {self.user.username} - {self.chat_type}"
@@ -193,6 +196,9 @@ class StudyRecommendation(models.Model):
     
     class Meta:
         ordering = ['-priority', '-confidence_score', '-created_at']
+        indexes = [
+            models.Index(fields=['expires_at'], name='study_rec_expires_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.student.roll_number} - {self.priority}"
@@ -350,6 +356,9 @@ class SmartNotification(models.Model):
     
     class Meta:
         ordering = ['-priority', '-created_at']
+        indexes = [
+            models.Index(fields=['expires_at'], name='smart_notif_expires_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.recipient.username} - {self.priority}"
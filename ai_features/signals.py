@@ -0,0 +1,29 @@
+"""
+Signal handlers that bump cache versions for AI feature content.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ai_features.models import StudyMaterial
+from utils.cache import bump_versions, materials_scope
+
+
+@receiver(pre_save, sender=StudyMaterial)
+def remember_previous_section(sender, instance, **kwargs):
+    """Keep the old section so moving a material invalidates both sides."""
+    instance._previous_section = None
+    if instance.pk:
+        instance._previous_section = sender.objects.filter(pk=instance.pk).values_list(
+            'course', 'year', 'section'
+        ).first()
+
+
+@receiver(post_save, sender=StudyMaterial)
+@receiver(post_delete, sender=StudyMaterial)
+def bump_material_version(sender, instance, **kwargs):
+    scopes = [materials_scope(instance.course, instance.year, instance.section)]
+    previous = getattr(instance, '_previous_section', None)
+    if previous:
+        scopes.append(materials_scope(*previous))
+    bump_versions(scopes)
@@ -5,6 +5,16 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+
+Real-time updates are pushed over Server-Sent Events from /api/events/,
+which holds one long-lived connection per browser tab. That only scales
+under an ASGI server, e.g.:
+
+    SSE_ENABLED=True uvicorn enhanced_timetable_system.asgi:application --workers 2
+
+With the default WSGI deployment (gunicorn + wsgi.py) leave SSE_ENABLED
+off; the endpoint then answers 204 and clients keep polling the
+/api/*/updates/ change feed instead.
 """
 
 import os
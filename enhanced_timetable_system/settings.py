@@ -68,9 +68,11 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'accounts.middleware.SessionRefreshMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.RoleContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -167,10 +169,51 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Cache Configuration
+# The cache must be shared by every worker: version counters, timetable
+# grids and attendance stats are invalidated by one process and read by
+# all of them. Redis when REDIS_URL is set, otherwise a file-based cache
+# that works for any number of workers on a single machine.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'ets',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / '.cache')),
+            'KEY_PREFIX': 'ets',
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int),
+            },
+        }
+    }
+
 # Session Configuration
 # Extended session timeout to prevent registration session expiry
 SESSION_COOKIE_AGE = 1800  # 30 minutes
-SESSION_SAVE_EVERY_REQUEST = True  # Refresh session on each request
+# Sliding expiry without a write per request: SessionRefreshMiddleware
+# re-saves an unchanged session at most once per SESSION_REFRESH_WINDOW,
+# so an active session expires between AGE - WINDOW and AGE after the
+# last request.
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_REFRESH_WINDOW = config('SESSION_REFRESH_WINDOW', default=300, cast=int)  # seconds
+# Reads come from the shared cache; set to ...backends.signed_cookies to drop session writes entirely
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
+
+# Real-time updates over Server-Sent Events (/api/events/).
+# Only enable when served by an ASGI server (see asgi.py); under WSGI the
+# stream would pin a worker, so clients fall back to polling.
+SSE_ENABLED = config('SSE_ENABLED', default=False, cast=bool)
+SSE_POLL_INTERVAL = config('SSE_POLL_INTERVAL', default=0.5, cast=float)  # seconds between feed reads per process
+SSE_HEARTBEAT_INTERVAL = config('SSE_HEARTBEAT_INTERVAL', default=15, cast=int)
+SSE_MAX_CONNECTION_SECONDS = config('SSE_MAX_CONNECTION_SECONDS', default=300, cast=int)
 
 
 # Static files (CSS, JavaScript, Images)
@@ -218,6 +261,8 @@ EMAIL_PROVIDER = config('EMAIL_PROVIDER', default='').lower()
 
 # Check if SendGrid API key is available (preferred method - uses HTTP API, not SMTP)
 SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
+# Override to point the SendGrid backend at a local stub server when testing
+SENDGRID_API_BASE_URL = config('SENDGRID_API_BASE_URL', default='https://api.sendgrid.com')
 
 # Prefer SendGrid HTTP API over SMTP (works better on Render free tier)
 if SENDGRID_API_KEY and (EMAIL_PROVIDER == 'sendgrid' or EMAIL_BACKEND == 'django.core.mail.backends.console.EmailBackend'):
@@ -264,6 +309,62 @@ else:
     # Console backend or other
     DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='noreply@enhanced-timetable.local')
 
+# Outbox for OTP email/SMS (utils/outbox.py). Requests only enqueue; run
+# `python manage.py process_outbox --loop` as a worker for retries.
+OUTBOX_WORKERS = config('OUTBOX_WORKERS', default=4, cast=int)  # send threads in process_outbox
+OUTBOX_INLINE_WORKERS = config('OUTBOX_INLINE_WORKERS', default=2, cast=int)  # 0 = leave everything to the worker
+OUTBOX_MAX_ATTEMPTS = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+OUTBOX_RETRY_BASE_SECONDS = config('OUTBOX_RETRY_BASE_SECONDS', default=30, cast=int)
+OUTBOX_RETRY_MAX_SECONDS = config('OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+# Messages per second per process; providers not listed are unlimited
+OUTBOX_RATE_LIMITS = {
+    'sendgrid': config('OUTBOX_RATE_SENDGRID', default=10, cast=float),
+    'smtp': config('OUTBOX_RATE_SMTP', default=2, cast=float),
+    'twilio': config('OUTBOX_RATE_TWILIO', default=1, cast=float),
+}
+
+# Shared executor for outbound I/O: email, SMS and AI providers (utils/executor.py)
+OUTBOUND_WORKERS = config('OUTBOUND_WORKERS', default=16, cast=int)
+OUTBOUND_QUEUE_LIMIT = config('OUTBOUND_QUEUE_LIMIT', default=100, cast=int)  # calls waiting for a thread
+OUTBOUND_DESTINATION_LIMIT = config('OUTBOUND_DESTINATION_LIMIT', default=4, cast=int)  # concurrent calls per provider
+OUTBOUND_DEFAULT_TIMEOUT = config('OUTBOUND_DEFAULT_TIMEOUT', default=30, cast=int)  # seconds
+OUTBOUND_BREAKER_THRESHOLD = config('OUTBOUND_BREAKER_THRESHOLD', default=5, cast=int)  # consecutive failures
+OUTBOUND_BREAKER_COOLDOWN = config('OUTBOUND_BREAKER_COOLDOWN', default=30, cast=int)  # seconds
+
+# Proxies in front of the app that append to X-Forwarded-For (one on
+# Render). Per-IP throttles use the hop the outermost of them recorded;
+# 0 ignores the header and uses REMOTE_ADDR.
+TRUSTED_PROXY_COUNT = config('TRUSTED_PROXY_COUNT', default=1, cast=int)
+
+# OTP codes (utils/otp_store.py). The cache store keeps codes out of the
+# database; use utils.otp_store.DatabaseOTPStore for the EmailOTP table.
+OTP_STORE = config('OTP_STORE', default='utils.otp_store.CacheOTPStore')
+OTP_TTL = config('OTP_TTL', default=15 * 60, cast=int)  # seconds
+OTP_MAX_ATTEMPTS = config('OTP_MAX_ATTEMPTS', default=5, cast=int)  # wrong guesses before the code is burned
+OTP_ISSUE_LIMIT = config('OTP_ISSUE_LIMIT', default=5, cast=int)  # codes per identifier per window
+OTP_ISSUE_WINDOW = config('OTP_ISSUE_WINDOW', default=15 * 60, cast=int)
+OTP_IP_LIMIT = config('OTP_IP_LIMIT', default=30, cast=int)  # requests + guesses per IP per window
+OTP_IP_WINDOW = config('OTP_IP_WINDOW', default=15 * 60, cast=int)
+OTP_AUDIT = config('OTP_AUDIT', default=True, cast=bool)  # record OTPAuditEvent rows in the background
+
+# Login throttling (utils/login.py): failed attempts per window before
+# further attempts are refused without checking the password
+LOGIN_ACCOUNT_LIMIT = config('LOGIN_ACCOUNT_LIMIT', default=10, cast=int)
+LOGIN_IP_LIMIT = config('LOGIN_IP_LIMIT', default=50, cast=int)
+LOGIN_THROTTLE_WINDOW = config('LOGIN_THROTTLE_WINDOW', default=15 * 60, cast=int)  # seconds
+
+# Bulk student import (utils/student_import.py): password hashing processes
+# used by the admin upload endpoint; the import_students command defaults to
+# one per CPU. 1 hashes inline in the web worker.
+STUDENT_IMPORT_WORKERS = config('STUDENT_IMPORT_WORKERS', default=2, cast=int)
+
+# Retention for `python manage.py purge_expired_records` (utils/housekeeping.py)
+HOUSEKEEPING_OTP_RETENTION_HOURS = config('HOUSEKEEPING_OTP_RETENTION_HOURS', default=24, cast=int)  # after expiry
+HOUSEKEEPING_AUDIT_RETENTION_DAYS = config('HOUSEKEEPING_AUDIT_RETENTION_DAYS', default=90, cast=int)
+HOUSEKEEPING_OUTBOX_RETENTION_DAYS = config('HOUSEKEEPING_OUTBOX_RETENTION_DAYS', default=30, cast=int)  # sent/dead messages
+HOUSEKEEPING_CHAT_RETENTION_DAYS = config('HOUSEKEEPING_CHAT_RETENTION_DAYS', default=90, cast=int)  # since last message
+HOUSEKEEPING_CHANGE_FEED_RETENTION_DAYS = config('HOUSEKEEPING_CHANGE_FEED_RETENTION_DAYS', default=7, cast=int)
+
 # OpenAI Configuration
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 
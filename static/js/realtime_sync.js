@@ -9,6 +9,9 @@ class RealtimeSync {
         this.pollInterval = 10000; // 10 seconds
         this.intervalId = null;
         this.lastUpdateCheck = null;
+        this.cursor = null; // change-feed sequence number of the last event seen
+        this.eventSource = null;
+        this.streamUnavailable = false;
         this.currentUser = null;
         this.currentPage = null;
         
@@ -83,6 +86,9 @@ class RealtimeSync {
         if (this.isActive) return;
         
         this.isActive = true;
+        // Prefer the push stream; polling is the fallback when SSE is off or unsupported
+        if (this.startStream()) return;
+        
         this.intervalId = setInterval(() => {
             this.checkForUpdates();
         }, this.pollInterval);
@@ -97,6 +103,10 @@ class RealtimeSync {
         if (!this.isActive) return;
         
         this.isActive = false;
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
         if (this.intervalId) {
             clearInterval(this.intervalId);
             this.intervalId = null;
@@ -117,11 +127,48 @@ class RealtimeSync {
         console.log('Real-time sync resumed');
     }
     
+    startStream() {
+        if (!window.EventSource || this.streamUnavailable) return false;
+        
+        const url = this.cursor === null ? '/api/events/' : `/api/events/?since=${this.cursor}`;
+        this.eventSource = new EventSource(url);
+        this.eventSource.onopen = () => this.showSyncIndicator('active');
+        Object.keys(RealtimeSync.KIND_FLAGS).forEach(kind => {
+            this.eventSource.addEventListener(kind, (e) => this.handleStreamEvent(e));
+        });
+        this.eventSource.onerror = () => {
+            if (this.eventSource && this.eventSource.readyState === EventSource.CLOSED) {
+                // Server answered 204 (SSE disabled) or refused: switch to polling
+                this.eventSource = null;
+                this.streamUnavailable = true;
+                this.isActive = false;
+                this.startPolling();
+            } else {
+                // The browser reconnects by itself and resumes from Last-Event-ID
+                this.showSyncIndicator('error');
+            }
+        };
+        console.log('Real-time sync connected (server-sent events)');
+        this.showSyncIndicator('active');
+        return true;
+    }
+    
+    handleStreamEvent(e) {
+        const event = JSON.parse(e.data);
+        this.cursor = event.id;
+        this.lastUpdateCheck = new Date();
+        const updates = { has_updates: true, events: [event] };
+        updates[RealtimeSync.KIND_FLAGS[event.kind]] = true;
+        this.processUpdates(updates);
+    }
+    
     async checkForUpdates() {
         if (!this.currentUser || this.currentUser === 'student') return;
         
         try {
-            const endpoint = this.currentUser === 'teacher' ? '/api/teacher/updates/' : '/api/admin/updates/';
+            const baseEndpoint = this.currentUser === 'teacher' ? '/api/teacher/updates/' : '/api/admin/updates/';
+            // First call (no cursor) only fetches the feed head; later calls ask for changes since it
+            const endpoint = this.cursor === null ? baseEndpoint : `${baseEndpoint}?since=${this.cursor}`;
             const response = await fetch(endpoint, {
                 method: 'GET',
                 headers: {
@@ -135,7 +182,14 @@ class RealtimeSync {
             }
             
             const data = await response.json();
+            if (typeof data.cursor === 'number') {
+                this.cursor = data.cursor;
+            }
             this.processUpdates(data);
+            if (data.truncated) {
+                // More events are waiting; fetch the rest right away
+                return this.checkForUpdates();
+            }
             
             this.lastUpdateCheck = new Date();
             this.showSyncIndicator('active');
@@ -443,6 +497,17 @@ class RealtimeSync {
     }
 }
 
+// Change-feed event kinds and the update flags they raise (mirrors utils/change_feed.py)
+RealtimeSync.KIND_FLAGS = {
+    timetable: 'timetable_changed',
+    attendance: 'attendance_changed',
+    announcement: 'announcements_changed',
+    material: 'materials_changed',
+    teacher: 'teachers_changed',
+    student: 'students_changed',
+    user: 'students_changed'
+};
+
 // Initialize real-time sync when DOM is ready
 document.addEventListener('DOMContentLoaded', () => {
     // Check if real-time sync is disabled
@@ -545,6 +545,36 @@ function markAllAbsent() {
     });
 }
 
+// Attendance heatmap (packed 2-bit codes from /api/teacher/class/<id>/heatmap/)
+class AttendanceHeatmap {
+    static fetch(classId) {
+        return fetch(`/api/teacher/class/${classId}/heatmap/`)
+            .then(response => response.json())
+            .then(data => {
+                if (!data.success) {
+                    throw new Error(data.message || 'Failed to load heatmap');
+                }
+                return AttendanceHeatmap.decode(data.heatmap);
+            });
+    }
+
+    // Returns {students, sessions, rows} where rows[i][j] is the status name of
+    // student i in weekly session j.
+    static decode(heatmap) {
+        const raw = atob(heatmap.matrix);
+        const rows = heatmap.students.map((student, i) => {
+            const row = [];
+            for (let session = 0; session < heatmap.sessions; session++) {
+                const byte = raw.charCodeAt(i * heatmap.bytes_per_row + (session >> 2));
+                const code = (byte >> ((session & 3) * 2)) & 3;
+                row.push(heatmap.codes[code]);
+            }
+            return row;
+        });
+        return {students: heatmap.students, sessions: heatmap.sessions, firstSession: heatmap.first_session, rows: rows};
+    }
+}
+
 // Real-time synchronization
 class TeacherSync {
     static init() {
@@ -558,13 +588,17 @@ class TeacherSync {
     }
     
     static checkForUpdates() {
-        fetch('/api/teacher/updates/', {
+        const since = TeacherSync.cursor === undefined ? '' : `?since=${TeacherSync.cursor}`;
+        fetch(`/api/teacher/updates/${since}`, {
             headers: {
                 'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value
             }
         })
         .then(response => response.json())
         .then(data => {
+            if (typeof data.cursor === 'number') {
+                TeacherSync.cursor = data.cursor;
+            }
             if (data.has_updates) {
                 TeacherSync.showUpdateNotification();
             }
@@ -613,6 +647,7 @@ class TeacherSync {
 
 // Make functions globally available
 window.markAttendance = AttendanceManagement.markAttendance;
+window.AttendanceHeatmap = AttendanceHeatmap;
 window.generateReport = AttendanceManagement.generateReport;
 window.uploadMaterial = MaterialsManagement.uploadMaterial;
 window.deleteMaterial = MaterialsManagement.deleteMaterial;
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from .models import (
     Course, Subject, Teacher, TeacherSubject, TimeSlot, Room,
-    TimetableEntry, Enrollment, Attendance, Announcement
+    TimetableEntry, Enrollment, Attendance, Announcement,
+    ArchivedAttendance, AttendanceTermSummary, AttendanceBitmap, AttendanceSyncKey, AnnouncementRead,
+    AnnouncementDelivery
 )
 
 @admin.register(Course)
@@ -75,6 +77,36 @@ class AttendanceAdmin(admin.ModelAdmin):
         return obj.timetable_entry.subject.name
     get_subject.short_description = 'Subject'
 
+@admin.register(ArchivedAttendance)
+class ArchivedAttendanceAdmin(admin.ModelAdmin):
+    list_display = ('student', 'timetable_entry', 'academic_year', 'semester', 'date', 'status', 'archived_at')
+    list_filter = ('academic_year', 'semester', 'status')
+    search_fields = ('student__roll_number', 'timetable_entry__subject__name')
+    ordering = ('-date', '-marked_at')
+    raw_id_fields = ('student', 'timetable_entry', 'marked_by')
+
+@admin.register(AttendanceTermSummary)
+class AttendanceTermSummaryAdmin(admin.ModelAdmin):
+    list_display = ('student', 'timetable_entry', 'academic_year', 'semester', 'total_count', 'present_count', 'updated_at')
+    list_filter = ('academic_year', 'semester')
+    search_fields = ('student__roll_number', 'timetable_entry__subject__name')
+    ordering = ('-academic_year', 'semester')
+    raw_id_fields = ('student', 'timetable_entry')
+
+@admin.register(AttendanceBitmap)
+class AttendanceBitmapAdmin(admin.ModelAdmin):
+    list_display = ('student', 'timetable_entry', 'first_session', 'present_count', 'absent_count', 'late_count', 'updated_at')
+    search_fields = ('student__roll_number', 'timetable_entry__subject__name')
+    raw_id_fields = ('student', 'timetable_entry')
+    readonly_fields = ('bits', 'updated_at')
+
+@admin.register(AttendanceSyncKey)
+class AttendanceSyncKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'teacher', 'timetable_entry', 'date', 'created_at')
+    search_fields = ('key', 'teacher__name')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at',)
+
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
     list_display = ('title', 'posted_by', 'target_audience', 'is_urgent', 'is_active', 'created_at')
@@ -82,3 +114,18 @@ class AnnouncementAdmin(admin.ModelAdmin):
     search_fields = ('title', 'content', 'posted_by__username')
     ordering = ('-is_urgent', '-created_at')
     readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(AnnouncementRead)
+class AnnouncementReadAdmin(admin.ModelAdmin):
+    list_display = ('announcement', 'user', 'read_at')
+    search_fields = ('announcement__title', 'user__username')
+    raw_id_fields = ('announcement', 'user')
+    readonly_fields = ('read_at',)
+
+@admin.register(AnnouncementDelivery)
+class AnnouncementDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('announcement', 'status', 'sent_count', 'failed_count', 'skipped_count', 'batches_done', 'attempts', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('announcement__title',)
+    raw_id_fields = ('announcement',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'updated_at')
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.attendance_archive import (
+    archive_academic_year,
+    get_closed_academic_years,
+    rebuild_term_summaries,
+)
+
+
+class Command(BaseCommand):
+    help = "Move attendance for closed academic years into the archive and rebuild term summaries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--academic-year', action='append', dest='academic_years', default=[],
+                            help='Academic year to archive, e.g. 2023-2024 (repeatable)')
+        parser.add_argument('--all-closed', action='store_true',
+                            help='Archive every academic year that is no longer current')
+        parser.add_argument('--semester', type=int, default=None,
+                            help='Limit archival to one semester of the academic year')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows moved per transaction (default: 2000)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many rows would be archived without moving them')
+        parser.add_argument('--rebuild-summaries', action='store_true',
+                            help='Only recompute term summaries from already archived rows')
+
+    def handle(self, *args, **options):
+        academic_years = list(options['academic_years'])
+        if options['all_closed']:
+            academic_years.extend(get_closed_academic_years())
+        if not academic_years:
+            if options['all_closed']:
+                self.stdout.write(self.style.WARNING('No closed academic years have live attendance.'))
+                return
+            raise CommandError('Pass --academic-year or --all-closed')
+
+        semester = options['semester']
+        for academic_year in dict.fromkeys(academic_years):
+            if options['rebuild_summaries']:
+                count = rebuild_term_summaries(academic_year, semester)
+                self.stdout.write(self.style.SUCCESS(f"{academic_year}: rebuilt {count} term summaries"))
+                continue
+
+            try:
+                result = archive_academic_year(
+                    academic_year,
+                    semester=semester,
+                    batch_size=options['batch_size'],
+                    dry_run=options['dry_run'],
+                )
+            except ValueError as e:
+                self.stdout.write(self.style.ERROR(str(e)))
+                continue
+
+            if options['dry_run']:
+                self.stdout.write(f"{academic_year}: {result['archived']} records would be archived")
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{academic_year}: archived {result['archived']} records, "
+                    f"built {result['summaries']} term summaries"
+                ))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utils.announcement_delivery import DEFAULT_BATCH_SIZE, claim_deliveries, deliver
+
+
+class Command(BaseCommand):
+    help = "Send queued announcement emails in batches (run from cron, or with --loop as a worker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Recipients per batch (default: {DEFAULT_BATCH_SIZE})')
+        parser.add_argument('--limit', type=int, default=10, help='Deliveries to claim per pass (default: 10)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new deliveries')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            deliveries = claim_deliveries(options['limit'])
+            for delivery in deliveries:
+                delivery = deliver(delivery, batch_size=options['batch_size'])
+                style = self.style.SUCCESS if delivery.status == 'completed' else self.style.ERROR
+                self.stdout.write(style(
+                    f"Announcement {delivery.announcement_id}: {delivery.status}, "
+                    f"{delivery.sent_count} sent, {delivery.failed_count} failed, "
+                    f"{delivery.skipped_count} without email"
+                ))
+            if not options['loop']:
+                if not deliveries:
+                    self.stdout.write("No announcements waiting for delivery")
+                return
+            if not deliveries:
+                time.sleep(options['interval'])
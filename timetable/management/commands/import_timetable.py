@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from timetable.models import TimetableEntry
+from utils.timetable_import import TimetableImportError, apply_plan, build_plan
+
+DEFAULT_PATH = settings.BASE_DIR / 'static' / 'TT4.1.xlsx'
+DAY_NAMES = dict(TimetableEntry.DAY_CHOICES)
+
+
+class Command(BaseCommand):
+    help = "Import class timetables from the master workbook (one sheet per class) in a single transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_PATH),
+                            help=f'Workbook to import (default: {DEFAULT_PATH})')
+        parser.add_argument('--sheet', action='append', dest='sheets', help='Import only this sheet (repeatable)')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Create courses, subjects, teachers, rooms and time slots named in the workbook '
+                                 'but missing from the database')
+        parser.add_argument('--dry-run', action='store_true', help='Print the diff without writing anything')
+        parser.add_argument('--verbose-diff', action='store_true', help='List every added, changed and removed entry')
+
+    def _describe(self, item):
+        return (f"{item['course']} Y{item['year']}{item['section']} {DAY_NAMES[item['day_of_week']]} "
+                f"P{item['time_slot'].period_number}: {item['subject'].code} / {item['teacher'].name} / "
+                f"{item['room'].room_number}")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            plan = build_plan(options['path'], sheets=options['sheets'], create_missing=options['create_missing'])
+        except (TimetableImportError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in plan['errors']:
+            self.stdout.write(self.style.WARNING(f"{error['cell'] or error['sheet']}: {error['message']}"))
+        if plan['created']:
+            self.stdout.write(f"{'Would create' if options['dry_run'] else 'Creating'} {len(plan['created'])} "
+                              f"reference rows: " + ', '.join(
+                                  f"{type(obj).__name__} {obj}" for obj in plan['created']))
+        if options['verbose_diff'] or options['dry_run']:
+            for item in plan['added']:
+                self.stdout.write(f"+ {self._describe(item)}")
+            for item in plan['changed']:
+                self.stdout.write(f"~ {self._describe(item)}")
+            for entry in plan['removed']:
+                state = 'deactivate' if entry.pk in plan['kept'] else 'delete'
+                self.stdout.write(f"- {entry.course} Y{entry.year}{entry.section} "
+                                  f"{entry.get_day_of_week_display()} slot {entry.time_slot_id} ({state})")
+
+        summary = (f"{len(plan['classes'])} classes: {len(plan['added'])} added, {len(plan['changed'])} changed, "
+                   f"{len(plan['unchanged'])} unchanged, {len(plan['removed'])} removed, "
+                   f"{len(plan['errors'])} cells skipped")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Dry run, nothing written. {summary}"))
+            return
+        apply_plan(plan)
+        self.stdout.write(self.style.SUCCESS(f"{summary} ({time.perf_counter() - started:.1f}s)"))
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.cache import invalidate, parse_section_label, section_namespace
+from utils.timetable_cache import REFERENCE_SCOPE, teacher_timetable_scope
+
+
+class Command(BaseCommand):
+    help = "Invalidate cached read models by namespace, or clear the whole cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--section', action='append', dest='sections', default=[],
+                            help='Class section as COURSE-YEAR-SECTION, e.g. B.Tech-2-A (repeatable)')
+        parser.add_argument('--teacher', type=int, action='append', dest='teacher_ids', default=[],
+                            help='Teacher id whose cached timetable should be dropped (repeatable)')
+        parser.add_argument('--reference', action='store_true',
+                            help='Invalidate everything that embeds subject, teacher, room or time slot data')
+        parser.add_argument('--all', action='store_true', help='Clear the entire cache')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            cache.clear()
+            self.stdout.write(self.style.SUCCESS("Cache cleared"))
+            return
+
+        namespaces = []
+        for label in options['sections']:
+            try:
+                namespaces.append(section_namespace(*parse_section_label(label)))
+            except ValueError:
+                raise CommandError(f"Invalid section '{label}', expected COURSE-YEAR-SECTION")
+        namespaces += [teacher_timetable_scope(teacher_id) for teacher_id in options['teacher_ids']]
+        if options['reference']:
+            namespaces.append(REFERENCE_SCOPE)
+        if not namespaces:
+            raise CommandError("Nothing to invalidate; pass --section, --teacher, --reference or --all")
+
+        invalidate(*namespaces)
+        for namespace in namespaces:
+            self.stdout.write(f"Invalidated {namespace}")
+        self.stdout.write(self.style.SUCCESS(f"Invalidated {len(namespaces)} namespaces"))
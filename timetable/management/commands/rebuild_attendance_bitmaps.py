@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from timetable.models import TimetableEntry
+from utils.attendance_bitmap import rebuild_bitmaps
+
+
+class Command(BaseCommand):
+    help = "Rebuild packed attendance bitmaps from the Attendance table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class-id', type=int, action='append', dest='class_ids', default=[],
+                            help='Timetable entry id to rebuild (repeatable, default: all with attendance)')
+
+    def handle(self, *args, **options):
+        entries = TimetableEntry.objects.all()
+        if options['class_ids']:
+            entries = entries.filter(id__in=options['class_ids'])
+        else:
+            entries = entries.filter(attendance_records__isnull=False).distinct()
+
+        total = 0
+        for entry in entries.order_by('id'):
+            count = rebuild_bitmaps(entry)
+            total += count
+            self.stdout.write(f"Class {entry.id}: {count} bitmaps")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} bitmaps"))
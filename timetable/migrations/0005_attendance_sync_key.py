@@ -0,0 +1,29 @@
+# Generated by Django 4.2.16 on 2026-10-19 07:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0004_attendance_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceSyncKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('date', models.DateField()),
+                ('result', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_sync_keys', to='timetable.teacher')),
+                ('timetable_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='timetable.timetableentry')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
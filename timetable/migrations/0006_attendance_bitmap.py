@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-19 07:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_emailotp_alter_user_phone_number'),
+        ('timetable', '0005_attendance_sync_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_session', models.DateField(help_text='Date of session 0 (first class day of the term)')),
+                ('bits', models.BinaryField(default=bytes)),
+                ('present_count', models.PositiveIntegerField(default=0)),
+                ('absent_count', models.PositiveIntegerField(default=0)),
+                ('late_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='accounts.studentprofile')),
+                ('timetable_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_bitmaps', to='timetable.timetableentry')),
+            ],
+            options={
+                'unique_together': {('student', 'timetable_entry')},
+            },
+        ),
+    ]
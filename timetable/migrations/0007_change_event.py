@@ -0,0 +1,27 @@
+# Generated by Django 4.2.16 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('timetable', '0006_attendance_bitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('timetable', 'Timetable'), ('attendance', 'Attendance'), ('announcement', 'Announcement'), ('material', 'Study Material'), ('teacher', 'Teacher'), ('student', 'Student'), ('user', 'User')], max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['scope', 'id'], name='change_event_scope_idx'), models.Index(fields=['created_at'], name='change_event_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.16 on 2026-10-19 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_audience(apps, schema_editor):
+    # Same rules as utils.announcement_inbox.audience_keys, frozen here
+    Announcement = apps.get_model('timetable', 'Announcement')
+    AnnouncementAudience = apps.get_model('timetable', 'AnnouncementAudience')
+
+    rows = []
+    for announcement in Announcement.objects.all().iterator(chunk_size=1000):
+        audience = announcement.target_audience
+        if audience == 'course' and announcement.target_course:
+            key = f'course:{announcement.target_course}'
+        elif audience == 'year' and announcement.target_year:
+            key = f'year:{announcement.target_year}'
+        elif (audience == 'section' and announcement.target_course
+                and announcement.target_year and announcement.target_section):
+            key = f'section:{announcement.target_course}:{announcement.target_year}:{announcement.target_section}'
+        else:
+            key = 'all'
+        rows.append(AnnouncementAudience(
+            announcement_id=announcement.id,
+            scope_key=key,
+            is_active=announcement.is_active,
+            is_urgent=announcement.is_urgent,
+            created_at=announcement.created_at,
+        ))
+    AnnouncementAudience.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('timetable', '0007_change_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementRead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reads', to='timetable.announcement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='announcement_reads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'announcement')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AnnouncementAudience',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope_key', models.CharField(max_length=100)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_urgent', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('announcement', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='audience', to='timetable.announcement')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope_key', 'is_active', '-is_urgent', '-created_at'], name='announcement_feed_idx')],
+                'unique_together': {('scope_key', 'announcement')},
+            },
+        ),
+        migrations.RunPython(backfill_audience, migrations.RunPython.noop),
+    ]
@@ -207,6 +207,129 @@ class Attendance(models.Model):
     def __str__(self):
         return f"{self.student.roll_number} - {self.timetable_entry.subject.code} - {self.date} - {self.status}"
 
+class ArchivedAttendance(models.Model):
+    """Attendance rows moved out of the live table once their academic year is closed."""
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='archived_attendance_records')
+    timetable_entry = models.ForeignKey(TimetableEntry, on_delete=models.CASCADE, related_name='archived_attendance_records')
+    academic_year = models.CharField(max_length=10)  # Denormalized from timetable_entry for term filters
+    semester = models.IntegerField(choices=Subject.SEMESTER_CHOICES)
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=Attendance.STATUS_CHOICES)
+    marked_at = models.DateTimeField()
+    marked_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    notes = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', '-marked_at']
+        unique_together = ['student', 'timetable_entry', 'date']
+        indexes = [
+            models.Index(fields=['academic_year', 'semester'], name='archived_att_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.roll_number} - {self.date} - {self.status} (archived {self.academic_year})"
+
+class AttendanceTermSummary(models.Model):
+    """Pre-aggregated attendance counts per student and class for an archived term."""
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='attendance_term_summaries')
+    timetable_entry = models.ForeignKey(TimetableEntry, on_delete=models.CASCADE, related_name='attendance_term_summaries')
+    academic_year = models.CharField(max_length=10)
+    semester = models.IntegerField(choices=Subject.SEMESTER_CHOICES)
+    total_count = models.IntegerField(default=0)
+    present_count = models.IntegerField(default=0)
+    absent_count = models.IntegerField(default=0)
+    late_count = models.IntegerField(default=0)
+    excused_count = models.IntegerField(default=0)
+    first_date = models.DateField(null=True, blank=True)
+    last_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['academic_year', 'semester']
+        unique_together = ['student', 'timetable_entry']
+        indexes = [
+            models.Index(fields=['academic_year', 'semester'], name='att_summary_term_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.roll_number} - {self.timetable_entry.subject.code} - {self.academic_year} S{self.semester}"
+
+    @property
+    def attendance_percentage(self):
+        return (self.present_count / self.total_count * 100) if self.total_count > 0 else 0
+
+class AttendanceBitmap(models.Model):
+    """
+    Packed per-student attendance history for one class.
+    Each weekly session since `first_session` takes two bits in `bits`
+    (0 unmarked/excused, 1 present, 2 absent, 3 late), four sessions per byte.
+    """
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    timetable_entry = models.ForeignKey(TimetableEntry, on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    first_session = models.DateField(help_text="Date of session 0 (first class day of the term)")
+    bits = models.BinaryField(default=bytes)
+    present_count = models.PositiveIntegerField(default=0)
+    absent_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'timetable_entry']
+
+    def __str__(self):
+        return f"{self.student_id} - {self.timetable_entry_id} ({len(self.bits)} bytes)"
+
+    @property
+    def marked_count(self):
+        return self.present_count + self.absent_count + self.late_count
+
+class AttendanceSyncKey(models.Model):
+    """Client-supplied idempotency key for a synced attendance session, with its stored result."""
+    key = models.CharField(max_length=100, unique=True)
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name='attendance_sync_keys')
+    timetable_entry = models.ForeignKey(TimetableEntry, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.key} - {self.timetable_entry_id} - {self.date}"
+
+class ChangeEvent(models.Model):
+    """
+    Append-only change feed. The auto-increment id is the sequence number
+    clients use as their cursor; `scope` says who should see the event
+    (e.g. "teacher:4", "section:B.Tech:2:A", "student:17", "all").
+    """
+    KIND_CHOICES = [
+        ('timetable', 'Timetable'),
+        ('attendance', 'Attendance'),
+        ('announcement', 'Announcement'),
+        ('material', 'Study Material'),
+        ('teacher', 'Teacher'),
+        ('student', 'Student'),
+        ('user', 'User'),
+    ]
+
+    scope = models.CharField(max_length=100)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['scope', 'id'], name='change_event_scope_idx'),
+            models.Index(fields=['created_at'], name='change_event_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} -> {self.scope}"
+
 class Announcement(models.Model):
     """Announcements posted by admins."""
     AUDIENCE_CHOICES = [
@@ -250,3 +373,72 @@ class Announcement(models.Model):
             )
         
         return queryset
+
+class AnnouncementAudience(models.Model):
+    """
+    Audience index: one row per announcement and audience key ("all",
+    "course:B.Tech", "year:2", "section:B.Tech:2:A"). Ordering fields are
+    copied from the announcement so a student's feed is a single indexed
+    lookup on the keys they belong to. Maintained by utils/announcement_inbox.py.
+    """
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='audience')
+    scope_key = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+    is_urgent = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['scope_key', 'announcement']
+        indexes = [
+            models.Index(fields=['scope_key', 'is_active', '-is_urgent', '-created_at'], name='announcement_feed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.announcement_id} -> {self.scope_key}"
+
+class AnnouncementRead(models.Model):
+    """Read receipt: the user has opened the announcement."""
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='reads')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='announcement_reads')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'announcement']
+
+    def __str__(self):
+        return f"{self.user_id} read {self.announcement_id}"
+
+class AnnouncementDelivery(models.Model):
+    """
+    Progress of the email fan-out for one announcement. Recipients are
+    walked in student-id order in batches; `last_student_id` is the resume
+    point, so a worker that dies mid-delivery picks up where it stopped.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    announcement = models.OneToOneField(Announcement, on_delete=models.CASCADE, related_name='delivery')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    last_student_id = models.BigIntegerField(default=0)
+    batches_done = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0, help_text="Recipients without an email address")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='announcement_delivery_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.announcement_id} - {self.status} ({self.sent_count} sent)"
@@ -0,0 +1,68 @@
+"""
+Signal handlers that keep cached timetable read models coherent.
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from timetable.models import Announcement, Enrollment, Room, Subject, Teacher, TimeSlot, TimetableEntry
+from utils.announcement_delivery import queue_delivery
+from utils.announcement_inbox import index_announcement
+from utils.cache import ANNOUNCEMENTS_SCOPE, bump_versions, enrollment_scope
+from utils.timetable_cache import invalidate_timetables
+
+
+@receiver(pre_save, sender=TimetableEntry)
+def remember_previous_placement(sender, instance, **kwargs):
+    """Keep the old section/teacher so moving an entry invalidates both sides."""
+    instance._previous_placement = None
+    if instance.pk:
+        instance._previous_placement = sender.objects.filter(pk=instance.pk).values_list(
+            'course', 'year', 'section', 'teacher_id'
+        ).first()
+
+
+@receiver(post_save, sender=TimetableEntry)
+@receiver(post_delete, sender=TimetableEntry)
+def invalidate_entry_timetables(sender, instance, **kwargs):
+    sections = {(instance.course, instance.year, instance.section)}
+    teacher_ids = {instance.teacher_id}
+    previous = getattr(instance, '_previous_placement', None)
+    if previous:
+        sections.add(previous[:3])
+        teacher_ids.add(previous[3])
+    invalidate_timetables(sections=sections, teacher_ids=teacher_ids)
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Room)
+@receiver(post_save, sender=TimeSlot)
+def invalidate_timetable_references(sender, instance, **kwargs):
+    # Names, codes and times are copied into every cached grid
+    invalidate_timetables(reference=True)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def bump_enrollment_version(sender, instance, **kwargs):
+    bump_versions([enrollment_scope(instance.student_id)])
+
+
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def bump_announcement_version(sender, instance, **kwargs):
+    bump_versions([ANNOUNCEMENTS_SCOPE])
+
+
+@receiver(post_save, sender=Announcement)
+def index_announcement_audience(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_announcement(instance)
+
+
+@receiver(post_save, sender=Announcement)
+def queue_announcement_delivery(sender, instance, created, raw=False, **kwargs):
+    # Sending happens in the deliver_announcements worker, not in the request
+    if created and not raw:
+        queue_delivery(instance)
@@ -1,3 +1,198 @@
+from datetime import date, datetime, time, timezone as dt_timezone
+import io
+import os
+import tempfile
+from unittest import mock, skipUnless
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import StudentProfile, User
+from timetable.models import (
+    Announcement, AnnouncementDelivery, Attendance, AttendanceBitmap, Course, Enrollment, Room, Subject, Teacher,
+    TimeSlot, TimetableEntry,
+)
+from utils.announcement_delivery import RETRY_AFTER, claim_deliveries, deliver
+from utils.enrolment import deactivate_section, enrol_section
+from utils.student_import import import_students, read_rows
+from utils.timetable_import import OPENPYXL_AVAILABLE, apply_plan, build_plan
+
+if OPENPYXL_AVAILABLE:
+    import openpyxl
+
+
+@skipUnless(OPENPYXL_AVAILABLE, 'openpyxl is not installed')
+class TimetableImportTests(TestCase):
+    """Re-imports of sections that already have entries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(name='B.Tech', full_name='Bachelor of Technology')
+        cls.subject = Subject.objects.create(code='PCS701', name='Networks', course=course, year=4, semester=7)
+        cls.t_teacher = Teacher.objects.create(employee_id='TT', name='T Teacher', email='tt@example.com',
+                                               department='CSE')
+        cls.u_teacher = Teacher.objects.create(employee_id='UU', name='U Teacher', email='uu@example.com',
+                                               department='CSE')
+        cls.rooms = {'A': Room.objects.create(room_number='R101', capacity=60),
+                     'B': Room.objects.create(room_number='R102', capacity=60)}
+        cls.slot = TimeSlot.objects.create(period_number=1, start_time=time(9, 0), end_time=time(9, 50))
+
+    def _entry(self, section, teacher):
+        return TimetableEntry.objects.create(
+            subject=self.subject, teacher=teacher, room=self.rooms[section], time_slot=self.slot,
+            course='B.Tech', year=4, section=section, day_of_week=0, academic_year='2025-26', semester=7,
+        )
+
+    def _workbook(self, initials):
+        """One sheet per section; `initials` maps a section to its Monday P1 teacher, or None for a free period."""
+        workbook = openpyxl.Workbook()
+        workbook.remove(workbook.active)
+        for section, teacher in initials.items():
+            sheet = workbook.create_sheet(section)
+            sheet.append([f'TIME TABLE: B.Tech CSE VII {section} (2025-26 ODD SEMESTER)'])
+            sheet.append([f'ROOM NO: {self.rooms[section].room_number}'])
+            sheet.append(['DAY \\ TIME', '9:00-9:50'])
+            sheet.append(['MONDAY', 'PCS701' if teacher else 'LIBRARY'])
+            sheet.append([None, teacher])
+            sheet.append(['Subject', 'Code', 'Faculty', 'Initials'])
+            sheet.append(['Networks', 'PCS701', 'T Teacher+U Teacher', 'TT+UU'])
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workbook.save(path)
+        return path
+
+    def _teachers(self):
+        return dict(TimetableEntry.objects.filter(is_active=True).values_list('section', 'teacher__employee_id'))
+
+    def test_teacher_moves_to_a_free_slot_in_another_section(self):
+        self._entry('A', self.t_teacher)
+        plan = build_plan(self._workbook({'A': None, 'B': 'TT'}))
+        self.assertEqual(plan['errors'], [])
+        self.assertEqual((len(plan['added']), len(plan['removed'])), (1, 1))
+
+        apply_plan(plan)
+        self.assertEqual(self._teachers(), {'B': 'TT'})
+
+    def test_imported_students_are_enrolled_in_an_imported_timetable(self):
+        apply_plan(build_plan(self._workbook({'A': 'TT'})))
+        self.assertEqual(TimetableEntry.objects.get().semester, 7)
+
+        csv = io.BytesIO(b'roll_number,first_name,last_name,email,course,year,section\n'
+                         b'R4001,Asha,Rao,asha@example.com,B.Tech,4,A\n')
+        # An October day of the workbook's 2025-26 odd term
+        with mock.patch('utils.academic_calendar.timezone.now', return_value=datetime(2025, 10, 1, tzinfo=dt_timezone.utc)):
+            result = import_students(read_rows(csv, 'students.csv'), workers=1)
+        self.assertEqual((result['created'], result['enrolled']), (1, 1))
+        enrolment = Enrollment.objects.get()
+        self.assertEqual((enrolment.subject, enrolment.semester), (self.subject, 7))
+
+    def _student(self):
+        user = User.objects.create(username='R4001', user_type='student')
+        return StudentProfile.objects.create(user=user, roll_number='R4001', course='B.Tech', year=4, section='A')
+
+    def test_removed_entry_with_attendance_history_keeps_its_slot(self):
+        entry = self._entry('A', self.t_teacher)
+        AttendanceBitmap.objects.create(student=self._student(), timetable_entry=entry, first_session=date(2025, 6, 2))
+        plan = build_plan(self._workbook({'A': None, 'B': 'TT'}))
+        self.assertEqual(plan['kept'], {entry.pk})
+        self.assertEqual(plan['added'], [])
+        self.assertIn(f'conflict with entry {entry.pk}', plan['errors'][0]['message'])
+
+        apply_plan(plan)
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_active)
+        self.assertTrue(AttendanceBitmap.objects.filter(timetable_entry=entry).exists())
+
+    def test_changed_entry_with_attendance_is_reported_not_updated(self):
+        entry = self._entry('A', self.t_teacher)
+        Attendance.objects.create(student=self._student(), timetable_entry=entry, date=date(2025, 7, 7), status='present')
+        plan = build_plan(self._workbook({'A': 'UU'}))
+        self.assertEqual(plan['changed'], [])
+        self.assertIn('already has attendance', plan['errors'][0]['message'])
+
+        apply_plan(plan)
+        self.assertEqual(self._teachers(), {'A': 'TT'})
+
+    def test_teachers_swap_sections(self):
+        self._entry('A', self.t_teacher)
+        self._entry('B', self.u_teacher)
+        plan = build_plan(self._workbook({'A': 'UU', 'B': 'TT'}))
+        self.assertEqual(plan['errors'], [])
+        self.assertEqual(len(plan['changed']), 2)
+
+        apply_plan(plan)
+        self.assertEqual(self._teachers(), {'A': 'UU', 'B': 'TT'})
+
+
+class EnrolmentTests(TestCase):
+    """Enrolments stored under either spelling of the academic year are the same enrolments."""
+
+    def setUp(self):
+        course = Course.objects.create(name='B.Tech', full_name='Bachelor of Technology')
+        self.subject = Subject.objects.create(code='PCS701', name='Networks', course=course, year=4, semester=7)
+        user = User.objects.create(username='R4001', user_type='student')
+        self.student = StudentProfile.objects.create(user=user, roll_number='R4001', course='B.Tech', year=4,
+                                                     section='A')
+
+    def test_enrolment_under_the_short_spelling_is_reactivated_not_duplicated(self):
+        Enrollment.objects.create(student=self.student, subject=self.subject, academic_year='2025-26', semester=7,
+                                  is_active=False)
+        self.assertEqual(enrol_section('B.Tech', 4, 'A', 7, academic_year='2025-2026'), (1, 1, 1))
+        self.assertEqual(list(Enrollment.objects.values_list('academic_year', 'is_active')), [('2025-26', True)])
+
+        self.assertEqual(deactivate_section('B.Tech', 4, 'A', academic_year='2025-2026'), 1)
+        self.assertFalse(Enrollment.objects.get().is_active)
+
+
+class FlakyBackend(EmailBackend):
+    """Locmem backend that fails every send after the first `succeed` batches."""
+
+    def __init__(self, succeed, **kwargs):
+        super().__init__(**kwargs)
+        self.succeed = succeed
+
+    def send_messages(self, messages):
+        if self.succeed <= 0:
+            raise ConnectionError('SMTP server unavailable')
+        self.succeed -= 1
+        return super().send_messages(messages)
+
+
+@mock.patch('utils.announcement_delivery.time.sleep')
+class AnnouncementDeliveryTests(TestCase):
+    """A provider outage leaves the delivery failed at the batch that could not be sent."""
+
+    def setUp(self):
+        admin = User.objects.create(username='ADMIN1', user_type='admin')
+        self.students = []
+        for number in range(3):
+            user = User.objects.create(username=f'S{number}', email=f's{number}@example.com', user_type='student')
+            self.students.append(StudentProfile.objects.create(
+                user=user, roll_number=f'S{number}', course='B.Tech', year=1, section='A'
+            ))
+        self.announcement = Announcement.objects.create(title='Exam', content='Monday', posted_by=admin)
+        self.delivery = claim_deliveries()[0]
+
+    def test_failed_batch_keeps_the_cursor(self, sleep):
+        delivery = deliver(self.delivery, batch_size=1, connection=FlakyBackend(succeed=1))
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'failed')
+        self.assertEqual(delivery.last_student_id, self.students[0].pk)
+        self.assertEqual((delivery.batches_done, delivery.sent_count, delivery.failed_count), (1, 1, 0))
+        self.assertIn('SMTP server unavailable', delivery.last_error)
+
+    def test_failed_delivery_resumes_from_the_failed_batch(self, sleep):
+        deliver(self.delivery, batch_size=1, connection=FlakyBackend(succeed=1))
+        self.assertEqual(claim_deliveries(), [])  # not before RETRY_AFTER
+        AnnouncementDelivery.objects.update(updated_at=timezone.now() - RETRY_AFTER)
 
-# Create your tests here.
+        delivery = deliver(claim_deliveries()[0], batch_size=1, connection=FlakyBackend(succeed=10))
+        self.assertEqual(delivery.status, 'completed')
+        self.assertEqual(delivery.last_student_id, self.students[-1].pk)
+        self.assertEqual(delivery.sent_count, 3)
+        # Nobody was skipped and nobody got the announcement twice
+        self.assertEqual([message.to[0] for message in mail.outbox],
+                         ['s0@example.com', 's1@example.com', 's2@example.com'])
@@ -0,0 +1,192 @@
+"""
+Chronic absenteeism detection.
+The current term's attendance is loaded once into flat NumPy arrays and every
+metric (overall/subject/rolling rates, trailing absence streaks, trend slope)
+is computed with bincount-style reductions, so cost grows with the number of
+attendance rows rather than with students x queries.
+"""
+
+from datetime import timedelta
+import logging
+
+from django.utils import timezone
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from timetable.models import Attendance
+from utils.academic_calendar import academic_year_aliases, get_current_academic_year, get_current_semester
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = {
+    'rate': 75.0,           # overall / subject attendance percentage
+    'rolling_rate': 60.0,   # attendance percentage inside the rolling window
+    'streak': 3,            # consecutive missed classes
+    'slope': -5.0,          # percentage points per week
+    'min_classes': 5,       # ignore students with too little history
+}
+
+
+def load_term_matrix(academic_year=None, semester=None, chunk_size=20000):
+    """
+    Load the term's attendance as parallel arrays.
+    Returns a dict of arrays (student, subject, day, present) plus the
+    student/subject id lookup tables, or None when there is no attendance.
+    """
+    academic_year = academic_year or get_current_academic_year()
+    semester = semester or get_current_semester()
+
+    rows = Attendance.objects.filter(
+        timetable_entry__academic_year__in=academic_year_aliases(academic_year),
+        timetable_entry__semester=semester,
+    ).values_list('student_id', 'timetable_entry__subject_id', 'date', 'status').order_by()
+
+    students, subjects, days, present = [], [], [], []
+    for student_id, subject_id, date, status in rows.iterator(chunk_size=chunk_size):
+        students.append(student_id)
+        subjects.append(subject_id)
+        days.append(date.toordinal())
+        present.append(status == 'present')
+
+    if not students:
+        return None
+
+    student_ids, student_idx = np.unique(np.asarray(students, dtype=np.int64), return_inverse=True)
+    subject_ids, subject_idx = np.unique(np.asarray(subjects, dtype=np.int64), return_inverse=True)
+    day = np.asarray(days, dtype=np.int64)
+
+    return {
+        'student_ids': student_ids,
+        'subject_ids': subject_ids,
+        'student': student_idx,
+        'subject': subject_idx,
+        'day': day - day.min(),
+        'last_day': int(day.max()),
+        'present': np.asarray(present, dtype=np.float64),
+    }
+
+
+def compute_attendance_metrics(matrix, window_days=28):
+    """Vectorised per-student and per-(student, subject) attendance metrics."""
+    student = matrix['student']
+    present = matrix['present']
+    day = matrix['day'].astype(np.float64)
+    n_students = len(matrix['student_ids'])
+
+    total = np.bincount(student, minlength=n_students).astype(np.float64)
+    attended = np.bincount(student, weights=present, minlength=n_students)
+    rate = np.divide(attended * 100, total, out=np.full(n_students, 100.0), where=total > 0)
+
+    # Rolling window ending at the most recent marked day
+    recent = day >= day.max() - window_days
+    recent_total = np.bincount(student[recent], minlength=n_students).astype(np.float64)
+    recent_attended = np.bincount(student[recent], weights=present[recent], minlength=n_students)
+    rolling_rate = np.divide(recent_attended * 100, recent_total,
+                             out=np.full(n_students, 100.0), where=recent_total > 0)
+
+    # Least-squares slope of present(0/1) against day, scaled to points per week
+    sum_x = np.bincount(student, weights=day, minlength=n_students)
+    sum_xx = np.bincount(student, weights=day * day, minlength=n_students)
+    sum_xy = np.bincount(student, weights=day * present, minlength=n_students)
+    denominator = total * sum_xx - sum_x * sum_x
+    slope = np.divide(total * sum_xy - sum_x * attended, denominator,
+                      out=np.zeros(n_students), where=denominator > 0) * 7 * 100
+
+    # Trailing streak of missed classes: records after each student's last "present"
+    order = np.lexsort((day, student))
+    sorted_student = student[order]
+    sorted_present = present[order] > 0
+    position = np.arange(len(order))
+    group_end = np.full(n_students, -1)
+    np.maximum.at(group_end, sorted_student, position)
+    group_start = group_end - total.astype(np.int64) + 1
+    last_present = group_start - 1
+    np.maximum.at(last_present, sorted_student[sorted_present], position[sorted_present])
+    streak = group_end - last_present
+
+    # Per (student, subject) rates over compact pair keys
+    pair_key = student * len(matrix['subject_ids']) + matrix['subject']
+    pairs, pair_idx = np.unique(pair_key, return_inverse=True)
+    pair_total = np.bincount(pair_idx).astype(np.float64)
+    pair_rate = np.bincount(pair_idx, weights=present) * 100 / pair_total
+
+    return {
+        'total': total,
+        'rate': rate,
+        'rolling_rate': rolling_rate,
+        'recent_total': recent_total,
+        'slope': slope,
+        'streak': streak,
+        'pair_student': pairs // len(matrix['subject_ids']),
+        'pair_subject': pairs % len(matrix['subject_ids']),
+        'pair_total': pair_total,
+        'pair_rate': pair_rate,
+    }
+
+
+def find_breaches(matrix, metrics, thresholds=None):
+    """
+    Apply thresholds and return {student_id: {metric breaches}} for students
+    with enough history to judge.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    eligible = metrics['total'] >= thresholds['min_classes']
+
+    flags = {
+        'low_rate': eligible & (metrics['rate'] < thresholds['rate']),
+        'low_rolling_rate': eligible & (metrics['recent_total'] >= thresholds['min_classes'])
+                            & (metrics['rolling_rate'] < thresholds['rolling_rate']),
+        'absence_streak': metrics['streak'] >= thresholds['streak'],
+        'declining_trend': eligible & (metrics['slope'] <= thresholds['slope']),
+    }
+
+    subject_flag = (metrics['pair_total'] >= thresholds['min_classes']) & (metrics['pair_rate'] < thresholds['rate'])
+    low_subjects = {}
+    for s_idx, subj_idx, pair_rate in zip(metrics['pair_student'][subject_flag],
+                                          metrics['pair_subject'][subject_flag],
+                                          metrics['pair_rate'][subject_flag]):
+        low_subjects.setdefault(int(s_idx), []).append(
+            (int(matrix['subject_ids'][subj_idx]), round(float(pair_rate), 1))
+        )
+
+    any_flag = np.zeros(len(matrix['student_ids']), dtype=bool)
+    for mask in flags.values():
+        any_flag |= mask
+    any_flag[list(low_subjects)] = True
+
+    breaches = {}
+    for s_idx in np.flatnonzero(any_flag):
+        breaches[int(matrix['student_ids'][s_idx])] = {
+            'flags': [name for name, mask in flags.items() if mask[s_idx]],
+            'rate': round(float(metrics['rate'][s_idx]), 1),
+            'rolling_rate': round(float(metrics['rolling_rate'][s_idx]), 1),
+            'streak': int(metrics['streak'][s_idx]),
+            'slope_per_week': round(float(metrics['slope'][s_idx]), 1),
+            'total_classes': int(metrics['total'][s_idx]),
+            'low_subjects': low_subjects.get(int(s_idx), []),
+        }
+    return breaches
+
+
+def dedupe_key(student_id, on_date=None):
+    """One absenteeism warning per student per ISO week."""
+    year, week, _ = (on_date or timezone.now().date()).isocalendar()
+    return f"absenteeism:{student_id}:{year}-W{week:02d}"
+
+
+def recent_dedupe_keys(days=7):
+    """Dedupe keys of absenteeism warnings created in the last `days` days."""
+    from ai_features.models import SmartNotification
+
+    since = timezone.now() - timedelta(days=days)
+    return set(
+        SmartNotification.objects.filter(
+            notification_type='attendance_warning',
+            created_at__gte=since,
+            ai_context__has_key='dedupe_key',
+        ).values_list('ai_context__dedupe_key', flat=True)
+    )
@@ -0,0 +1,66 @@
+"""
+Academic calendar helpers shared by views and management commands.
+The academic year starts in June; semester 1 runs June-December and
+semester 2 runs January-May.
+"""
+
+from datetime import date
+
+from django.utils import timezone
+
+
+def get_current_academic_year():
+    """Get current academic year dynamically (e.g. "2024-2025")."""
+    current_year = timezone.now().year
+    current_month = timezone.now().month
+    # Academic year starts in June (month 6)
+    if current_month >= 6:
+        return f"{current_year}-{current_year + 1}"
+    else:
+        return f"{current_year-1}-{current_year}"
+
+
+def get_current_semester():
+    """Get current semester dynamically."""
+    current_month = timezone.now().month
+    # Semester 1: June to December (months 6-12)
+    # Semester 2: January to May (months 1-5)
+    return 1 if current_month in [6, 7, 8, 9, 10, 11, 12] else 2
+
+
+def year_semester(year, term=None):
+    """
+    Semester number (1-8) a student in `year` is taking in a term: 1 is the
+    odd (June-December) term, 2 the even one; the current term by default.
+    Subjects and imported timetables are stored with these numbers.
+    """
+    term = term or get_current_semester()
+    return (int(year) - 1) * 2 + (1 if int(term) % 2 == 1 else 2)
+
+
+def academic_year_aliases(academic_year):
+    """
+    Return every spelling of an academic year label.
+    Entries are stored both as "2023-24" and "2023-2024" across the app.
+    """
+    try:
+        start, end = academic_year.split('-')
+        start_year = int(start)
+    except (AttributeError, ValueError):
+        return {academic_year}
+    return {
+        academic_year,
+        f"{start_year}-{start_year + 1}",
+        f"{start_year}-{str(start_year + 1)[-2:]}",
+    }
+
+
+def get_term_start(academic_year, semester):
+    """
+    First day of a term. Odd semesters start in June of the academic year's
+    first calendar year, even semesters in January of the second.
+    """
+    start_year = int(str(academic_year).split('-')[0])
+    if int(semester) % 2 == 1:
+        return date(start_year, 6, 1)
+    return date(start_year + 1, 1, 1)
@@ -22,6 +22,8 @@ try:
 except ImportError:
     REQUESTS_AVAILABLE = False
 
+from utils.executor import run_outbound
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -146,7 +148,7 @@ class AIService:
             
             prompt = self._build_recommendation_prompt(student_data)
             
-            response = self.client.chat.completions.create(
+            response = self._complete(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are an AI study advisor for students. Provide personalized study recommendations based on their academic data."},
@@ -175,7 +177,7 @@ class AIService:
             
             prompt = self._build_optimization_prompt(timetable_data)
             
-            response = self.client.chat.completions.create(
+            response = self._complete(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are a timetable optimization expert. Analyze schedules and suggest improvements for better learning outcomes."},
@@ -203,7 +205,7 @@ class AIService:
             
             prompt = self._build_analysis_prompt(performance_data)
             
-            response = self.client.chat.completions.create(
+            response = self._complete(
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": "You are an educational data analyst. Analyze student performance data and provide insights."},
@@ -382,11 +384,15 @@ class AIService:
         return self._mock_performance_analysis({})
     
     # AI Provider specific methods
+    def _complete(self, **kwargs):
+        """Chat completion through the shared outbound executor (deadline and circuit breaker per provider)."""
+        return run_outbound(self.ai_provider, self.client.chat.completions.create, **kwargs)
+    
     def _chat_with_openai(self, message: str, context: Dict = None) -> str:
         """Chat using OpenAI API."""
         system_prompt = self._build_system_prompt(context)
         
-        response = self.client.chat.completions.create(
+        response = self._complete(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -408,7 +414,7 @@ class AIService:
         )
         try:
             # Try through OpenAI-compatible client first
-            response = self.client.chat.completions.create(
+            response = self._complete(
                 model=model,
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -438,7 +444,7 @@ class AIService:
                 'max_tokens': 500,
                 'temperature': 0.7
             }
-            resp = requests.post(f"{base_url}/chat/completions", headers=headers, json=payload, timeout=30)
+            resp = run_outbound('groq', requests.post, f"{base_url}/chat/completions", headers=headers, json=payload, timeout=30)
             resp.raise_for_status()
             data = resp.json()
             return data['choices'][0]['message']['content'].strip()
@@ -470,7 +476,8 @@ class AIService:
             
             for model in models_to_try:
                 try:
-                    response = requests.post(
+                    response = run_outbound(
+                        'huggingface', requests.post,
                         f"https://api-inference.huggingface.co/models/{model}",
                         headers=headers,
                         json=payload,
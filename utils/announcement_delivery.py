@@ -0,0 +1,170 @@
+"""
+Batched announcement email fan-out.
+Creating an announcement only queues an AnnouncementDelivery row; the
+deliver_announcements management command does the sending, off the
+request path. Recipients are read with keyset batches (never the whole
+audience at once), the message is rendered once per announcement, and each
+batch goes out over a single backend connection with retries. Progress is
+saved after every batch so an interrupted delivery resumes where it
+stopped; a batch that still fails after its retries marks the delivery
+failed without moving past it, and the next claim resumes from that batch.
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from timetable.models import AnnouncementDelivery
+from utils.email_rendering import prepare
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_ATTEMPTS = 3
+MAX_DELIVERY_ATTEMPTS = 3
+# A failed delivery is retried this long after its last attempt, so a
+# provider outage is not burned through in three back-to-back polls
+RETRY_AFTER = timedelta(minutes=2)
+# A running delivery whose progress has not moved for this long is assumed
+# to belong to a dead worker and may be claimed again
+STALE_AFTER = timedelta(minutes=10)
+
+
+def queue_delivery(announcement):
+    if announcement.is_active:
+        AnnouncementDelivery.objects.get_or_create(announcement=announcement)
+
+
+def render_announcement(announcement):
+    """(subject, text, html) for an announcement; rendered once and reused for every batch."""
+    posted_by = announcement.posted_by.get_full_name() or announcement.posted_by.username
+    subject = f"{'[Urgent] ' if announcement.is_urgent else ''}{announcement.title}"
+    html, text = prepare('emails/announcement.html', {
+        'announcement': announcement,
+        'posted_by': posted_by,
+    }).render()
+    return subject, text, html
+
+
+def send_batch(rendered, emails, connection, attempts=MAX_BATCH_ATTEMPTS):
+    """
+    Send one message per address over `connection`, retrying the batch with
+    exponential backoff. Returns (sent, error). A retried batch may repeat
+    messages the backend sent before failing; for announcements a duplicate
+    beats a gap.
+    """
+    subject, text, html = rendered
+    messages = []
+    for email in emails:
+        message = EmailMultiAlternatives(subject, text, settings.DEFAULT_FROM_EMAIL, [email], connection=connection)
+        message.attach_alternative(html, 'text/html')
+        messages.append(message)
+
+    error = None
+    for attempt in range(attempts):
+        try:
+            return connection.send_messages(messages) or 0, None
+        except Exception as e:
+            error = str(e)
+            logger.warning(f"Announcement batch of {len(messages)} failed (attempt {attempt + 1}/{attempts}): {e}")
+            if attempt + 1 < attempts:
+                time.sleep(2 ** attempt)
+    return 0, error
+
+
+def recipient_batches(announcement, after_id=0, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of (student_id, email) in student-id order, starting after `after_id`."""
+    students = announcement.get_target_students().filter(user__is_active=True)
+    while True:
+        batch = list(
+            students.filter(pk__gt=after_id).order_by('pk').values_list('pk', 'user__email')[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1][0]
+
+
+def deliver(delivery, batch_size=DEFAULT_BATCH_SIZE, connection=None):
+    """Run (or resume) one delivery to completion. Returns the updated delivery."""
+    announcement = delivery.announcement
+    if not announcement.is_active:
+        delivery.status = 'completed'
+        delivery.last_error = 'Announcement was deactivated before delivery finished'
+        delivery.finished_at = timezone.now()
+        delivery.save(update_fields=['status', 'last_error', 'finished_at', 'updated_at'])
+        return delivery
+
+    rendered = render_announcement(announcement)
+    connection = connection or get_connection(fail_silently=False)
+    progress_fields = ['last_student_id', 'batches_done', 'sent_count', 'failed_count',
+                       'skipped_count', 'last_error', 'updated_at']
+    try:
+        connection.open()
+        for batch in recipient_batches(announcement, delivery.last_student_id, batch_size):
+            emails = [email for _, email in batch if email]
+            sent, error = send_batch(rendered, emails, connection) if emails else (0, None)
+            if error:
+                # The backend is down: keep the cursor on this batch so the
+                # next claim (claim_deliveries) resumes from it
+                delivery.status = 'failed'
+                delivery.last_error = error
+                delivery.save(update_fields=['status', 'last_error', 'updated_at'])
+                logger.error(f"Announcement {announcement.id} delivery stopped at batch "
+                             f"{delivery.batches_done + 1}: {error}")
+                return delivery
+
+            delivery.last_student_id = batch[-1][0]
+            delivery.batches_done += 1
+            delivery.sent_count += sent
+            delivery.failed_count += len(emails) - sent
+            delivery.skipped_count += len(batch) - len(emails)
+            delivery.save(update_fields=progress_fields)
+            logger.info(
+                f"Announcement {announcement.id}: batch {delivery.batches_done} done, "
+                f"{delivery.sent_count} sent, {delivery.failed_count} failed"
+            )
+
+        delivery.status = 'completed'
+        delivery.last_error = ''
+        delivery.finished_at = timezone.now()
+        delivery.save(update_fields=['status', 'last_error', 'finished_at', 'updated_at'])
+    except Exception as e:
+        logger.error(f"Announcement {announcement.id} delivery failed: {e}")
+        delivery.status = 'failed'
+        delivery.last_error = str(e)
+        delivery.save(update_fields=['status', 'last_error', 'updated_at'])
+    finally:
+        connection.close()
+    return delivery
+
+
+def claim_deliveries(limit=10):
+    """
+    Atomically claim deliveries that are pending, failed with attempts left
+    (once RETRY_AFTER has passed), or stuck on a dead worker. Safe to call
+    from several workers at once.
+    """
+    now = timezone.now()
+    candidates = AnnouncementDelivery.objects.filter(
+        Q(status='pending') |
+        Q(status='failed', attempts__lt=MAX_DELIVERY_ATTEMPTS, updated_at__lt=now - RETRY_AFTER) |
+        Q(status='running', updated_at__lt=now - STALE_AFTER)
+    ).order_by('-announcement__is_urgent', 'created_at').values_list('pk', 'status', 'updated_at', 'attempts')[:limit]
+
+    claimed = []
+    for pk, status, updated_at, attempts in candidates:
+        # Conditional update: only one worker sees the row unchanged
+        won = AnnouncementDelivery.objects.filter(pk=pk, status=status, updated_at=updated_at).update(
+            status='running', attempts=attempts + 1, started_at=now, updated_at=now
+        )
+        if won:
+            claimed.append(AnnouncementDelivery.objects.select_related(
+                'announcement', 'announcement__posted_by'
+            ).get(pk=pk))
+    return claimed
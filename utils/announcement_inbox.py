@@ -0,0 +1,111 @@
+"""
+Announcement inbox.
+Each announcement is indexed under the audience key it targets
+(AnnouncementAudience) when it is created or edited, so a student's feed is
+a lookup on their four keys instead of the four-way OR over the whole
+Announcement table. Read receipts (AnnouncementRead) give per-user unread
+counts.
+"""
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from timetable.models import Announcement, AnnouncementAudience, AnnouncementRead
+from utils.cache import announcement_reads_scope, bump_versions
+
+BROADCAST_KEY = 'all'
+
+
+def audience_keys(announcement):
+    """Keys an announcement is delivered to; mirrors Announcement.get_target_students()."""
+    audience = announcement.target_audience
+    if audience == 'course' and announcement.target_course:
+        return [f'course:{announcement.target_course}']
+    if audience == 'year' and announcement.target_year:
+        return [f'year:{announcement.target_year}']
+    if (audience == 'section' and announcement.target_course
+            and announcement.target_year and announcement.target_section):
+        return [f'section:{announcement.target_course}:{announcement.target_year}:{announcement.target_section}']
+    return [BROADCAST_KEY]
+
+
+def student_audience_keys(student):
+    return [
+        BROADCAST_KEY,
+        f'course:{student.course}',
+        f'year:{student.year}',
+        f'section:{student.course}:{student.year}:{student.section}',
+    ]
+
+
+def index_announcement(announcement):
+    """(Re)build the audience rows for one announcement."""
+    with transaction.atomic():
+        AnnouncementAudience.objects.filter(announcement=announcement).delete()
+        AnnouncementAudience.objects.bulk_create([
+            AnnouncementAudience(
+                announcement=announcement,
+                scope_key=key,
+                is_active=announcement.is_active,
+                is_urgent=announcement.is_urgent,
+                created_at=announcement.created_at,
+            )
+            for key in audience_keys(announcement)
+        ])
+
+
+def inbox_entries(student, user=None):
+    """
+    Active audience rows visible to `student`, newest urgent first. Each
+    announcement targets exactly one key, so rows never repeat. With `user`,
+    rows are annotated with `is_read`.
+    """
+    entries = AnnouncementAudience.objects.filter(
+        scope_key__in=student_audience_keys(student),
+        is_active=True
+    ).order_by('-is_urgent', '-created_at')
+    if user is not None:
+        entries = entries.annotate(is_read=Exists(
+            AnnouncementRead.objects.filter(announcement_id=OuterRef('announcement_id'), user=user)
+        ))
+    return entries
+
+
+def visible_announcement_ids(student):
+    """Subquery of announcement ids visible to `student`, for filtering other queries."""
+    return inbox_entries(student).values('announcement_id')
+
+
+def get_inbox(student, user, limit=20):
+    """
+    Latest announcements for a student's feed with read state.
+    Returns (announcements, counts) where each announcement has `is_read`
+    set and counts holds total, unread and urgent totals.
+    """
+    entries = inbox_entries(student, user)
+    page = list(entries.values('announcement_id', 'is_read')[:limit])
+    by_id = Announcement.objects.select_related('posted_by').in_bulk(
+        [entry['announcement_id'] for entry in page]
+    )
+    announcements = []
+    for entry in page:
+        announcement = by_id.get(entry['announcement_id'])
+        if announcement is not None:
+            announcement.is_read = entry['is_read']
+            announcements.append(announcement)
+
+    counts = {
+        'total': entries.count(),
+        'unread': entries.filter(is_read=False).count(),
+        'urgent': entries.filter(is_urgent=True).count(),
+    }
+    return announcements, counts
+
+
+def mark_read(user, announcement_ids):
+    """Record read receipts; already-read announcements are ignored."""
+    AnnouncementRead.objects.bulk_create(
+        [AnnouncementRead(user=user, announcement_id=announcement_id) for announcement_id in set(announcement_ids)],
+        ignore_conflicts=True
+    )
+    bump_versions([announcement_reads_scope(user.pk)])
@@ -0,0 +1,129 @@
+"""
+Term-based archival for attendance records.
+Closed academic years are moved out of the live Attendance table into
+ArchivedAttendance, and per-student/per-class counts are pre-aggregated into
+AttendanceTermSummary so historical reports never scan raw rows.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+import logging
+
+from timetable.models import Attendance, ArchivedAttendance, AttendanceTermSummary
+from utils.academic_calendar import get_current_academic_year, academic_year_aliases
+from utils.attendance_stats import invalidate_student_stats
+
+logger = logging.getLogger(__name__)
+
+ATTENDANCE_SOURCES = ('live', 'archive')
+
+
+def get_attendance_model(source='live'):
+    """Return the attendance model backing a report source ('live' or 'archive')."""
+    return ArchivedAttendance if source == 'archive' else Attendance
+
+
+def get_closed_academic_years():
+    """Academic years that still have live attendance but are no longer current."""
+    current = academic_year_aliases(get_current_academic_year())
+    years = Attendance.objects.values_list(
+        'timetable_entry__academic_year', flat=True
+    ).distinct()
+    return sorted(year for year in years if year not in current)
+
+
+def archive_academic_year(academic_year, semester=None, batch_size=2000, dry_run=False):
+    """
+    Move live attendance for a closed academic year into the archive.
+    Rows are copied and deleted in batches, each batch in its own transaction,
+    so the live table is never locked for the whole term.
+    Returns a dict with the number of rows archived and summaries built.
+    """
+    if academic_year in academic_year_aliases(get_current_academic_year()):
+        raise ValueError(f"Academic year {academic_year} is still open and cannot be archived")
+
+    live_query = Attendance.objects.filter(timetable_entry__academic_year=academic_year)
+    if semester:
+        live_query = live_query.filter(timetable_entry__semester=semester)
+
+    if dry_run:
+        return {'archived': live_query.count(), 'summaries': 0}
+
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch_ids = list(live_query.order_by('id').values_list('id', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+
+            rows = Attendance.objects.filter(id__in=batch_ids).values(
+                'student_id', 'timetable_entry_id', 'timetable_entry__academic_year',
+                'timetable_entry__semester', 'date', 'status', 'marked_at',
+                'marked_by_id', 'notes'
+            )
+            ArchivedAttendance.objects.bulk_create([
+                ArchivedAttendance(
+                    student_id=row['student_id'],
+                    timetable_entry_id=row['timetable_entry_id'],
+                    academic_year=row['timetable_entry__academic_year'],
+                    semester=row['timetable_entry__semester'],
+                    date=row['date'],
+                    status=row['status'],
+                    marked_at=row['marked_at'],
+                    marked_by_id=row['marked_by_id'],
+                    notes=row['notes'],
+                )
+                for row in rows
+            ], ignore_conflicts=True)
+            Attendance.objects.filter(id__in=batch_ids).delete()
+
+        archived += len(batch_ids)
+        logger.info(f"Archived {archived} attendance records for {academic_year}")
+
+    summaries = rebuild_term_summaries(academic_year, semester)
+    return {'archived': archived, 'summaries': summaries}
+
+
+def rebuild_term_summaries(academic_year, semester=None):
+    """Recompute AttendanceTermSummary rows for an archived term from the raw archive."""
+    archive_query = ArchivedAttendance.objects.filter(academic_year=academic_year)
+    summary_query = AttendanceTermSummary.objects.filter(academic_year=academic_year)
+    if semester:
+        archive_query = archive_query.filter(semester=semester)
+        summary_query = summary_query.filter(semester=semester)
+
+    aggregates = archive_query.values(
+        'student_id', 'timetable_entry_id', 'semester'
+    ).annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+        excused=Count('id', filter=Q(status='excused')),
+        first=Min('date'),
+        last=Max('date'),
+    ).order_by()
+
+    summaries = [
+        AttendanceTermSummary(
+            student_id=row['student_id'],
+            timetable_entry_id=row['timetable_entry_id'],
+            academic_year=academic_year,
+            semester=row['semester'],
+            total_count=row['total'],
+            present_count=row['present'],
+            absent_count=row['absent'],
+            late_count=row['late'],
+            excused_count=row['excused'],
+            first_date=row['first'],
+            last_date=row['last'],
+        )
+        for row in aggregates
+    ]
+
+    with transaction.atomic():
+        summary_query.delete()
+        AttendanceTermSummary.objects.bulk_create(summaries, batch_size=1000)
+
+    invalidate_student_stats({summary.student_id for summary in summaries})
+    return len(summaries)
@@ -0,0 +1,200 @@
+"""
+Two-bit-per-session attendance bitmaps.
+Each (student, class) pair keeps its whole term as a short byte string,
+updated incrementally on every attendance write, so a class heatmap is a
+single query over AttendanceBitmap instead of a scan of Attendance.
+
+The format is lossy, and build_heatmap() says so in its payload: with only
+four codes, an excused mark is stored as 0 like an unmarked session, and a
+session is a week from `first_session`, so a second session of the same
+class in one week (a make-up class) overwrites the other one's mark.
+"""
+
+from base64 import b64encode
+from datetime import timedelta
+import logging
+
+from django.db import transaction
+
+from timetable.models import Attendance, AttendanceBitmap
+from utils.academic_calendar import get_term_start
+
+logger = logging.getLogger(__name__)
+
+STATUS_CODES = {'present': 1, 'absent': 2, 'late': 3}  # excused and unmarked are 0
+CODE_NAMES = {0: 'unmarked_or_excused', 1: 'present', 2: 'absent', 3: 'late'}
+COUNTER_FIELDS = {1: 'present_count', 2: 'absent_count', 3: 'late_count'}
+SESSIONS_PER_BYTE = 4
+
+
+def first_session_date(timetable_entry):
+    """First date on or after the term start that falls on the class weekday."""
+    term_start = get_term_start(timetable_entry.academic_year, timetable_entry.semester)
+    return term_start + timedelta(days=(timetable_entry.day_of_week - term_start.weekday()) % 7)
+
+
+def session_index(first_session, attendance_date):
+    """Weekly session number for a date, or None if it precedes the term."""
+    if attendance_date < first_session:
+        return None
+    return (attendance_date - first_session).days // 7
+
+
+def get_code(bits, index):
+    byte_index, slot = divmod(index, SESSIONS_PER_BYTE)
+    if byte_index >= len(bits):
+        return 0
+    return (bits[byte_index] >> (slot * 2)) & 0b11
+
+
+def set_code(bits, index, code):
+    """Return a copy of `bits` with session `index` set to `code`."""
+    byte_index, slot = divmod(index, SESSIONS_PER_BYTE)
+    buffer = bytearray(bits)
+    if byte_index >= len(buffer):
+        buffer.extend(b'\x00' * (byte_index + 1 - len(buffer)))
+    buffer[byte_index] = (buffer[byte_index] & ~(0b11 << (slot * 2)) & 0xFF) | (code << (slot * 2))
+    return bytes(buffer)
+
+
+def decode(bits, sessions=None):
+    """Expand a bitmap into a list of status codes (mainly for debugging and tests)."""
+    sessions = sessions if sessions is not None else len(bits) * SESSIONS_PER_BYTE
+    return [get_code(bits, index) for index in range(sessions)]
+
+
+def _apply(bitmap, index, code):
+    old = get_code(bitmap.bits, index)
+    if old == code:
+        return False
+    if old in COUNTER_FIELDS:
+        field = COUNTER_FIELDS[old]
+        setattr(bitmap, field, getattr(bitmap, field) - 1)
+    if code in COUNTER_FIELDS:
+        field = COUNTER_FIELDS[code]
+        setattr(bitmap, field, getattr(bitmap, field) + 1)
+    bitmap.bits = set_code(bitmap.bits, index, code)
+    return True
+
+
+def update_bitmaps(timetable_entry, attendance_date, statuses):
+    """
+    Fold one session's statuses ({student_id: status}) into the class bitmaps.
+    Runs one select, one bulk_update and one bulk_create, plus one more
+    select and bulk_update when it had bitmaps to create.
+    """
+    first_session = first_session_date(timetable_entry)
+    index = session_index(first_session, attendance_date)
+    if index is None or not statuses:
+        return
+
+    existing = {
+        bitmap.student_id: bitmap
+        for bitmap in AttendanceBitmap.objects.select_for_update().filter(
+            timetable_entry=timetable_entry, student_id__in=list(statuses)
+        )
+    }
+    changed, created = [], []
+    for student_id, status in statuses.items():
+        code = STATUS_CODES.get(status, 0)
+        bitmap = existing.get(student_id)
+        if bitmap is None:
+            bitmap = AttendanceBitmap(
+                student_id=student_id, timetable_entry=timetable_entry, first_session=first_session
+            )
+            _apply(bitmap, index, code)
+            created.append(bitmap)
+        elif _apply(bitmap, index, code):
+            changed.append(bitmap)
+
+    if changed:
+        AttendanceBitmap.objects.bulk_update(
+            changed, ['bits', 'present_count', 'absent_count', 'late_count'], batch_size=500
+        )
+    if created:
+        AttendanceBitmap.objects.bulk_create(created, batch_size=500, ignore_conflicts=True)
+        # A concurrent write may have created some of these rows first, in
+        # which case ours were skipped. Applying the code again is a no-op on
+        # our own rows and adds this session to theirs
+        raced = []
+        for bitmap in AttendanceBitmap.objects.select_for_update().filter(
+            timetable_entry=timetable_entry, student_id__in=[bitmap.student_id for bitmap in created]
+        ):
+            if _apply(bitmap, index, STATUS_CODES.get(statuses[bitmap.student_id], 0)):
+                raced.append(bitmap)
+        if raced:
+            AttendanceBitmap.objects.bulk_update(
+                raced, ['bits', 'present_count', 'absent_count', 'late_count'], batch_size=500
+            )
+
+
+def rebuild_bitmaps(timetable_entry):
+    """Rebuild every bitmap of a class from the live Attendance table."""
+    first_session = first_session_date(timetable_entry)
+    bitmaps = {}
+    records = Attendance.objects.filter(timetable_entry=timetable_entry).values_list(
+        'student_id', 'date', 'status'
+    ).order_by('date', 'marked_at')
+    for student_id, attendance_date, status in records.iterator(chunk_size=5000):
+        index = session_index(first_session, attendance_date)
+        if index is None:
+            continue
+        bitmap = bitmaps.get(student_id)
+        if bitmap is None:
+            bitmap = bitmaps[student_id] = AttendanceBitmap(
+                student_id=student_id, timetable_entry=timetable_entry, first_session=first_session
+            )
+        _apply(bitmap, index, STATUS_CODES.get(status, 0))
+
+    with transaction.atomic():
+        AttendanceBitmap.objects.filter(timetable_entry=timetable_entry).delete()
+        AttendanceBitmap.objects.bulk_create(bitmaps.values(), batch_size=500)
+    return len(bitmaps)
+
+
+def build_heatmap(timetable_entry):
+    """
+    Student x session grid for a class as a packed base64 payload.
+    Rows are padded to the same byte length and concatenated in roll-number
+    order. `notes` tells clients what the encoding cannot show; use the
+    attendance records for exact history.
+    """
+    rows = list(
+        AttendanceBitmap.objects.filter(timetable_entry=timetable_entry).values(
+            'student_id', 'student__roll_number', 'student__user__first_name',
+            'student__user__last_name', 'first_session', 'bits',
+            'present_count', 'absent_count', 'late_count'
+        ).order_by('student__roll_number')
+    )
+    first_session = rows[0]['first_session'] if rows else first_session_date(timetable_entry)
+    bytes_per_row = max((len(row['bits']) for row in rows), default=0)
+
+    packed = bytearray()
+    students = []
+    for row in rows:
+        bits = bytes(row['bits'])
+        packed.extend(bits.ljust(bytes_per_row, b'\x00'))
+        students.append({
+            'id': row['student_id'],
+            'roll_number': row['student__roll_number'],
+            'name': f"{row['student__user__first_name']} {row['student__user__last_name']}".strip(),
+            'present': row['present_count'],
+            'absent': row['absent_count'],
+            'late': row['late_count'],
+        })
+
+    sessions = bytes_per_row * SESSIONS_PER_BYTE
+    return {
+        'encoding': '2bit-le',
+        'codes': CODE_NAMES,
+        'first_session': first_session.isoformat(),
+        'session_interval_days': 7,
+        'sessions': sessions,
+        'bytes_per_row': bytes_per_row,
+        'students': students,
+        'matrix': b64encode(bytes(packed)).decode('ascii'),
+        'notes': [
+            'Excused sessions are shown as unmarked_or_excused and are not in the per-student counts.',
+            'Each session spans a week; when a class met twice in one week only the mark saved last is kept.',
+        ],
+    }
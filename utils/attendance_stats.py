@@ -0,0 +1,97 @@
+"""
+Student attendance statistics.
+Totals are computed in the database with conditional aggregates grouped by
+subject, over the live table plus archived terms, and the unfiltered result
+is cached per student until the next attendance write for that student.
+"""
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+
+from timetable.models import Attendance, ArchivedAttendance, AttendanceTermSummary
+
+STATS_CACHE_TIMEOUT = 60 * 60
+
+
+def stats_cache_key(student_id):
+    return f'attendance_stats_{student_id}'
+
+
+def invalidate_student_stats(student_ids):
+    """Drop cached statistics for the given students after their attendance changed."""
+    cache.delete_many([stats_cache_key(student_id) for student_id in student_ids])
+
+
+def _merge(subject_wise, rows):
+    for row in rows:
+        stats = subject_wise.setdefault(row['subject_name'], {
+            'subject_id': row['subject_id'], 'total': 0, 'present': 0, 'absent': 0, 'late': 0,
+        })
+        for field in ('total', 'present', 'absent', 'late'):
+            stats[field] += row[field] or 0
+
+
+def _raw_counts(model, filters):
+    return model.objects.filter(**filters).values(
+        subject_id=F('timetable_entry__subject_id'),
+        subject_name=F('timetable_entry__subject__name'),
+    ).annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+    ).order_by()
+
+
+def compute_student_stats(student_id, subject_id=None, start_date=None, end_date=None):
+    """Attendance totals and subject-wise breakdown over the student's full history."""
+    filters = {'student_id': student_id}
+    if subject_id:
+        filters['timetable_entry__subject_id'] = subject_id
+
+    subject_wise = {}
+    if start_date or end_date:
+        if start_date:
+            filters['date__gte'] = start_date
+        if end_date:
+            filters['date__lte'] = end_date
+        # Date ranges need row-level data, so archived terms are counted from raw rows
+        _merge(subject_wise, _raw_counts(Attendance, filters))
+        _merge(subject_wise, _raw_counts(ArchivedAttendance, filters))
+    else:
+        _merge(subject_wise, _raw_counts(Attendance, filters))
+        _merge(subject_wise, AttendanceTermSummary.objects.filter(**filters).values(
+            subject_id=F('timetable_entry__subject_id'),
+            subject_name=F('timetable_entry__subject__name'),
+        ).annotate(
+            total=Sum('total_count'),
+            present=Sum('present_count'),
+            absent=Sum('absent_count'),
+            late=Sum('late_count'),
+        ).order_by())
+
+    total_classes = sum(stats['total'] for stats in subject_wise.values())
+    present_count = sum(stats['present'] for stats in subject_wise.values())
+    for stats in subject_wise.values():
+        stats['percentage'] = round(stats['present'] / stats['total'] * 100, 1) if stats['total'] > 0 else 0
+
+    return {
+        'total_classes': total_classes,
+        'present_count': present_count,
+        'absent_count': total_classes - present_count,
+        'attendance_percentage': round(present_count / total_classes * 100, 1) if total_classes > 0 else 0,
+        'subject_wise': subject_wise,
+    }
+
+
+def get_student_stats(student_id, subject_id=None, start_date=None, end_date=None):
+    """Cached entry point; only the unfiltered full-history result is cached."""
+    if subject_id or start_date or end_date:
+        return compute_student_stats(student_id, subject_id, start_date, end_date)
+
+    key = stats_cache_key(student_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_student_stats(student_id)
+        cache.set(key, stats, timeout=STATS_CACHE_TIMEOUT)
+    return stats
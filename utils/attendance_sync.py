@@ -0,0 +1,157 @@
+"""
+Shared attendance write path.
+Every view that marks attendance goes through record_attendance(), which
+validates the roster in one query and writes all rows with a single bulk
+upsert instead of a get_or_create() per student.
+"""
+
+from datetime import datetime
+
+from django.db import IntegrityError, connection, transaction
+import logging
+
+from accounts.models import StudentProfile
+from timetable.models import Attendance, AttendanceSyncKey, TimetableEntry
+from utils.attendance_bitmap import update_bitmaps
+from utils.attendance_stats import invalidate_student_stats
+from utils.change_feed import entry_scopes, publish
+
+logger = logging.getLogger(__name__)
+
+VALID_STATUSES = {choice for choice, _ in Attendance.STATUS_CHOICES}
+
+# Upper bound on sessions accepted by one sync request
+MAX_SYNC_SESSIONS = 100
+
+
+def _parse_date(value):
+    if hasattr(value, 'year'):
+        return value
+    return datetime.strptime(str(value), '%Y-%m-%d').date()
+
+
+def record_attendance(timetable_entry, attendance_date, statuses, marked_by):
+    """
+    Upsert attendance for one class session.
+    `statuses` maps student pk -> status. Unknown students and invalid
+    statuses are skipped and reported back instead of aborting the session.
+    Returns a dict with the saved count and the rejected student ids.
+    """
+    attendance_date = _parse_date(attendance_date)
+
+    invalid_status = sorted(str(sid) for sid, status in statuses.items() if status not in VALID_STATUSES)
+    wanted = {str(sid): status for sid, status in statuses.items() if status in VALID_STATUSES}
+
+    known_ids = set(
+        StudentProfile.objects.filter(pk__in=list(wanted)).values_list('pk', flat=True)
+    )
+    known = {str(pk): pk for pk in known_ids}
+    unknown_students = sorted(sid for sid in wanted if sid not in known)
+
+    rows = [
+        Attendance(
+            student_id=known[sid],
+            timetable_entry=timetable_entry,
+            date=attendance_date,
+            status=status,
+            marked_by=marked_by,
+        )
+        for sid, status in wanted.items() if sid in known
+    ]
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target; the other
+    # backends require one
+    conflict_target = {}
+    if connection.features.supports_update_conflicts_with_target:
+        conflict_target['unique_fields'] = ['student', 'timetable_entry', 'date']
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            update_fields=['status', 'marked_by'],
+            **conflict_target,
+        )
+        update_bitmaps(timetable_entry, attendance_date, {row.student_id: row.status for row in rows})
+    invalidate_student_stats(known_ids)
+
+    # Broadcast change for real-time sync
+    publish('attendance', entry_scopes(timetable_entry), {
+        'class_id': timetable_entry.id, 'date': attendance_date.isoformat()
+    })
+
+    return {
+        'saved': len(rows),
+        'unknown_students': unknown_students,
+        'invalid_status': invalid_status,
+    }
+
+
+def sync_attendance_sessions(teacher, user, sessions):
+    """
+    Apply a batch of attendance sessions for one teacher.
+    Each session is {'idempotency_key', 'class_id', 'date', 'attendance'}.
+    The batch runs in one transaction with a savepoint per session, so one
+    bad session is reported without rolling back the others. Sessions whose
+    idempotency key was already applied return the stored result unchanged.
+    """
+    keys = [s.get('idempotency_key') for s in sessions if s.get('idempotency_key')]
+    seen = {
+        sync_key.key: sync_key
+        for sync_key in AttendanceSyncKey.objects.filter(key__in=keys)
+    }
+    class_ids = {s.get('class_id') for s in sessions}
+    entries = TimetableEntry.objects.filter(teacher=teacher).in_bulk(
+        [cid for cid in class_ids if str(cid).isdigit()]
+    )
+
+    results = []
+    with transaction.atomic():
+        for session in sessions:
+            key = session.get('idempotency_key')
+            result = {'idempotency_key': key, 'class_id': session.get('class_id'), 'date': session.get('date')}
+
+            if key in seen:
+                sync_key = seen[key]
+                if sync_key.teacher_id != teacher.id:
+                    result.update({'success': False, 'message': 'Idempotency key already used'})
+                else:
+                    result.update(sync_key.result, replayed=True)
+                results.append(result)
+                continue
+
+            entry = entries.get(int(session['class_id'])) if str(session.get('class_id')).isdigit() else None
+            if entry is None:
+                result.update({'success': False, 'message': 'Class not found'})
+                results.append(result)
+                continue
+
+            try:
+                with transaction.atomic():
+                    attendance_date = _parse_date(session.get('date'))
+                    outcome = record_attendance(entry, attendance_date, session.get('attendance') or {}, user)
+                    outcome['success'] = True
+                    if key:
+                        AttendanceSyncKey.objects.create(
+                            key=key, teacher=teacher, timetable_entry=entry,
+                            date=attendance_date, result=outcome
+                        )
+                        seen[key] = AttendanceSyncKey(key=key, teacher=teacher, result=outcome)
+                result.update(outcome, replayed=False)
+            except IntegrityError as e:
+                # Most likely another request stored the same key first
+                sync_key = AttendanceSyncKey.objects.filter(key=key).first() if key else None
+                if sync_key is None:
+                    logger.error(f"Attendance sync failed for class {entry.id}: {e}")
+                    result.update({'success': False, 'message': 'Could not save attendance'})
+                elif sync_key.teacher_id != teacher.id:
+                    result.update({'success': False, 'message': 'Idempotency key already used'})
+                else:
+                    seen[key] = sync_key
+                    result.update(sync_key.result, replayed=True)
+            except (TypeError, ValueError) as e:
+                result.update({'success': False, 'message': str(e)})
+            except Exception as e:
+                logger.error(f"Attendance sync failed for class {entry.id}: {e}")
+                result.update({'success': False, 'message': str(e)})
+            results.append(result)
+
+    return results
@@ -0,0 +1,121 @@
+"""
+Versioned cache keys and namespace (tag) invalidation.
+Each scope (a section's timetable, a teacher's timetable, ...) has a
+version counter; cached read models embed the version in their key, so
+bumping the counter invalidates every derived entry at once without having
+to know or delete the individual keys. Stale entries simply age out.
+
+A scope can also serve as a namespace shared by several read models, e.g.
+section_namespace('B.Tech', 2, 'A') is part of every section-level key, so
+invalidate(section_namespace(...)) drops all of them. Counters live in the
+shared backend configured in settings.CACHES, so a bump in one worker is
+seen by all of them.
+"""
+
+import random
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY_PREFIX = 'cache_version'
+
+
+def version_key(scope):
+    return f'{VERSION_KEY_PREFIX}:{scope}'
+
+
+def _fresh_version():
+    # From the clock, so an evicted counter never restarts at a value whose
+    # keys may still be cached, plus a random tail so two bumps in the same
+    # microsecond still differ
+    return time.time_ns() // 1000 * 1000 + random.randrange(1000)
+
+
+def get_version(scope):
+    """Current version number for `scope`, initialising it if missing."""
+    key = version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(scopes):
+    """Versions for several scopes in one cache round trip."""
+    keys = {scope: version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        versions[scope] = found[key] if key in found else get_version(scope)
+    return versions
+
+
+def bump_version(scope):
+    # A new value rather than incr(): the file-based cache's incr() is a
+    # get and a set, so two concurrent bumps could both land on v + 1
+    cache.set(version_key(scope), _fresh_version(), timeout=None)
+
+
+def bump_versions(scopes):
+    """
+    Invalidate everything cached under `scopes` once the current transaction
+    commits, so a concurrent reader cannot re-cache pre-commit data under
+    the new version.
+    """
+    scopes = list(dict.fromkeys(scope for scope in scopes if scope))
+
+    def bump():
+        for scope in scopes:
+            bump_version(scope)
+
+    transaction.on_commit(bump)
+
+
+def invalidate(*namespaces):
+    """Invalidate everything cached under the given namespaces (after commit)."""
+    bump_versions(namespaces)
+
+
+def versioned_key(name, scopes):
+    """Cache key for `name` that changes whenever any of `scopes` is bumped."""
+    versions = get_versions(scopes)
+    return f"{name}:" + '.'.join(str(versions[scope]) for scope in scopes)
+
+
+def get_or_build(name, namespaces, builder, timeout):
+    """Return the value cached under `name` in `namespaces`, building it on a miss."""
+    key = versioned_key(name, namespaces)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout=timeout)
+    return value
+
+
+def section_namespace(course, year, section):
+    return f'section:{course}:{year}:{section}'
+
+
+def parse_section_label(label):
+    """Split a "B.Tech-2-A" style label into (course, year, section)."""
+    course, year, section = label.rsplit('-', 2)
+    return course, int(year), section
+
+
+# Version scopes for data that is not cached server-side but is served to
+# polling clients with ETags (see utils/etags.py)
+ANNOUNCEMENTS_SCOPE = 'announcements'
+
+
+def materials_scope(course, year, section):
+    return f'materials:section:{course}:{year}:{section}'
+
+
+def enrollment_scope(student_id):
+    return f'enrollment:student:{student_id}'
+
+
+def announcement_reads_scope(user_id):
+    return f'announcement_reads:user:{user_id}'
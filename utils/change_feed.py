@@ -0,0 +1,152 @@
+"""
+Durable change feed for real-time sync.
+Mutating views call publish(); clients poll (or stream) "events since
+cursor N" for the scopes they care about. Events are written after the
+surrounding transaction commits, so a reader never sees an event for data
+it cannot read yet, and every tab keeps its own cursor instead of racing
+to consume a shared cache flag.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+import logging
+
+from timetable.models import ChangeEvent
+from utils.housekeeping import DEFAULT_BATCH_SIZE, delete_in_batches
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_SCOPE = 'all'
+MAX_EVENTS_PER_READ = 200
+
+# Legacy boolean flags understood by static/js/realtime_sync.js
+KIND_FLAGS = {
+    'timetable': 'timetable_changed',
+    'attendance': 'attendance_changed',
+    'announcement': 'announcements_changed',
+    'material': 'materials_changed',
+    'teacher': 'teachers_changed',
+    'student': 'students_changed',
+    'user': 'students_changed',
+}
+
+
+def section_scope(course, year, section):
+    return f"section:{course}:{year}:{section}"
+
+
+def entry_scopes(entry):
+    """Scopes touched by a change to a timetable entry (or its attendance)."""
+    return [
+        f"entry:{entry.id}",
+        f"teacher:{entry.teacher_id}",
+        section_scope(entry.course, entry.year, entry.section),
+    ]
+
+
+def teacher_scopes(teacher):
+    """Scopes a teacher client subscribes to."""
+    return [f"teacher:{teacher.id}", BROADCAST_SCOPE]
+
+
+def student_scopes(student):
+    """Scopes a student client subscribes to."""
+    return [
+        f"student:{student.pk}",
+        section_scope(student.course, student.year, student.section),
+        BROADCAST_SCOPE,
+    ]
+
+
+def announcement_scopes(announcement):
+    """Section-targeted announcements go to that section, everything else is broadcast."""
+    if announcement.target_audience == 'section' and announcement.target_section:
+        return [section_scope(announcement.target_course, announcement.target_year, announcement.target_section)]
+    return [BROADCAST_SCOPE]
+
+
+def publish(kind, scopes, payload=None):
+    """Record one event per scope once the current transaction commits."""
+    scopes = list(dict.fromkeys(scope for scope in scopes if scope))
+    payload = payload or {}
+
+    def write():
+        try:
+            ChangeEvent.objects.bulk_create([
+                ChangeEvent(scope=scope, kind=kind, payload=payload) for scope in scopes
+            ])
+        except Exception as e:
+            # The feed is advisory; never fail the user's request because of it
+            logger.error(f"Failed to publish {kind} change event: {e}")
+
+    transaction.on_commit(write)
+
+
+def latest_cursor():
+    return ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def changes_since(cursor, scopes=None, limit=MAX_EVENTS_PER_READ):
+    """
+    Events after `cursor`, oldest first. `scopes=None` reads every scope
+    (admin view). Returns (events, next_cursor, truncated).
+    """
+    query = ChangeEvent.objects.filter(id__gt=cursor)
+    if scopes is not None:
+        query = query.filter(scope__in=scopes)
+    events = list(query.order_by('id').values('id', 'scope', 'kind', 'payload', 'created_at')[:limit + 1])
+
+    truncated = len(events) > limit
+    events = events[:limit]
+    next_cursor = events[-1]['id'] if events else cursor
+    return events, next_cursor, truncated
+
+
+def parse_cursor(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def build_updates_response(since, scopes=None):
+    """
+    Response body for the check_*updates endpoints.
+    Without `since`, returns the current head so the client can start from it.
+    """
+    cursor = parse_cursor(since)
+    response = {
+        'has_updates': False,
+        'timestamp': timezone.now().isoformat(),
+    }
+    if cursor is None:
+        response['cursor'] = latest_cursor()
+        response['events'] = []
+        return response
+
+    events, next_cursor, truncated = changes_since(cursor, scopes)
+    response.update({
+        'has_updates': bool(events),
+        'cursor': next_cursor,
+        'truncated': truncated,
+        'events': [
+            {
+                'id': event['id'],
+                'scope': event['scope'],
+                'kind': event['kind'],
+                'payload': event['payload'],
+                'created_at': event['created_at'].isoformat(),
+            }
+            for event in events
+        ],
+    })
+    for event in events:
+        flag = KIND_FLAGS.get(event['kind'])
+        if flag:
+            response[flag] = True
+    return response
+
+
+def prune_events(older_than, batch_size=DEFAULT_BATCH_SIZE):
+    """Delete events created before `older_than` in batches; returns the number removed."""
+    return delete_in_batches(ChangeEvent.objects.filter(created_at__lt=older_than), batch_size)
@@ -0,0 +1,97 @@
+"""
+Email rendering with a render-once shell.
+prepare() renders a template a single time with every per-recipient field
+replaced by a placeholder, then splits the result around the
+placeholders. PreparedEmail.render() only joins those fragments with the
+(escaped) values, so rendering for the thousandth recipient costs a string
+join rather than a template render. The plain-text alternative is derived
+from the same HTML, so the two never drift apart.
+
+Per-recipient fields must be output as a bare {{ field }}; anything that
+goes through a filter or a tag belongs in the static context instead.
+Shells for constant contexts (OTP emails) are cached for the life of the
+process by get_prepared().
+"""
+
+from functools import lru_cache
+from html import unescape
+import re
+import secrets
+
+from django.template.loader import get_template
+from django.utils.html import conditional_escape, strip_tags
+
+_BODY = re.compile(r'<body[^>]*>(.*)</body>', re.IGNORECASE | re.DOTALL)
+_HIDDEN = re.compile(r'<(style|script|title)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_LINE_BREAKS = re.compile(r'<\s*(br|/p|/div|/h[1-6]|/li|/tr)\b[^>]*>', re.IGNORECASE)
+_BLANK_LINES = re.compile(r'\n{3,}')
+
+
+def html_to_text(html):
+    """Readable plain-text version of an HTML email."""
+    match = _BODY.search(html)
+    html = match.group(1) if match else html
+    html = _LINE_BREAKS.sub('\n', _HIDDEN.sub('', html))
+    lines = (' '.join(line.split()) for line in unescape(strip_tags(html)).splitlines())
+    return _BLANK_LINES.sub('\n\n', '\n'.join(lines)).strip()
+
+
+class PreparedEmail:
+    """A rendered template shell; render() fills in the per-recipient fields."""
+
+    def __init__(self, html_parts, text_parts, fields):
+        self.html_parts = html_parts
+        self.text_parts = text_parts
+        self.fields = fields
+
+    @staticmethod
+    def _join(parts, values, escape):
+        out = []
+        for part in parts:
+            if isinstance(part, tuple):
+                value = str(values[part[0]])
+                out.append(str(conditional_escape(value)) if escape else value)
+            else:
+                out.append(part)
+        return ''.join(out)
+
+    def render(self, **values):
+        """(html, text) for one recipient. Every field named in prepare() must be given."""
+        missing = set(self.fields) - set(values)
+        if missing:
+            raise KeyError(f"Missing email fields: {', '.join(sorted(missing))}")
+        return self._join(self.html_parts, values, True), self._join(self.text_parts, values, False)
+
+
+def _split(rendered, tokens):
+    """Split `rendered` into literal strings and (field,) markers."""
+    if not tokens:
+        return [rendered]
+    pattern = re.compile('|'.join(re.escape(token) for token in tokens))
+    parts, position = [], 0
+    for match in pattern.finditer(rendered):
+        parts.append(rendered[position:match.start()])
+        parts.append((tokens[match.group(0)],))
+        position = match.end()
+    parts.append(rendered[position:])
+    return parts
+
+
+def prepare(template_name, context=None, fields=()):
+    """Render `template_name` once with `context`, leaving `fields` to be filled per recipient."""
+    nonce = secrets.token_hex(4)
+    tokens = {f'[[email-field:{field}:{nonce}]]': field for field in fields}
+    shell_context = dict(context or {})
+    shell_context.update({field: token for token, field in tokens.items()})
+    html = get_template(template_name).render(shell_context)
+    return PreparedEmail(_split(html, tokens), _split(html_to_text(html), tokens), tuple(fields))
+
+
+@lru_cache(maxsize=64)
+def _prepared(template_name, fields, context_items):
+    return prepare(template_name, dict(context_items), fields)
+
+
+def get_prepared(template_name, fields=(), **context):
+    """prepare() cached per process; the static context values must be hashable."""
+    return _prepared(template_name, tuple(fields), tuple(sorted(context.items())))
@@ -0,0 +1,135 @@
+"""
+Subject enrolment by section.
+enrol_students() enrols new students in the subjects on their section's
+active timetable for the current term. enrol_section() enrols a whole
+section in every active subject of a semester, and deactivate_section()
+ends a section's enrolments for a term, so a semester rollover is one call
+per section.
+
+Enrolments are computed as a set difference against the existing rows and
+written with batched bulk_create(ignore_conflicts=True) plus single UPDATE
+statements for reactivation and deactivation.
+"""
+
+from accounts.models import StudentProfile
+from timetable.models import Enrollment, Subject, TimetableEntry
+from utils.academic_calendar import (
+    academic_year_aliases, get_current_academic_year, get_current_semester, year_semester
+)
+from utils.cache import bump_versions, enrollment_scope
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def section_subject_ids(course, year, section, academic_year=None, semester=None):
+    """
+    Ids of the subjects timetabled for one section in a term (the current
+    one by default). Without a semester, entries stored with the term
+    number (1 or 2) and with the year's semester number (e.g. 7) both count.
+    """
+    academic_year = academic_year or get_current_academic_year()
+    semesters = {semester} if semester else {get_current_semester(), year_semester(year)}
+    return set(TimetableEntry.objects.filter(
+        course=course,
+        year=year,
+        section=section,
+        academic_year__in=academic_year_aliases(academic_year),
+        semester__in=semesters,
+        is_active=True,
+    ).values_list('subject_id', flat=True))
+
+
+def _bump_students(student_ids):
+    # Queryset update() and bulk_create() skip the Enrollment signals that
+    # keep the students' timetable ETags current
+    bump_versions([enrollment_scope(student_id) for student_id in sorted(student_ids)])
+
+
+def _enrol_pairs(wanted, academic_year, semester, batch_size):
+    """
+    Create or reactivate Enrollment rows for a set of (student_id, subject_id)
+    pairs. A row stored under another spelling of the academic year counts
+    as existing, so it is reactivated rather than duplicated.
+    """
+    if not wanted:
+        return 0
+    existing = {}
+    student_ids = list({student_id for student_id, _ in wanted})
+    for start in range(0, len(student_ids), batch_size):
+        rows = Enrollment.objects.filter(
+            student_id__in=student_ids[start:start + batch_size],
+            academic_year__in=academic_year_aliases(academic_year),
+            semester=semester,
+        ).values_list('student_id', 'subject_id', 'pk', 'is_active')
+        existing.update({(student_id, subject_id): (pk, active) for student_id, subject_id, pk, active in rows})
+
+    reactivate_keys = [key for key in wanted if key in existing and not existing[key][1]]
+    reactivate = [existing[key][0] for key in reactivate_keys]
+    for start in range(0, len(reactivate), batch_size):
+        Enrollment.objects.filter(pk__in=reactivate[start:start + batch_size]).update(is_active=True)
+
+    missing = [
+        Enrollment(student_id=student_id, subject_id=subject_id, academic_year=academic_year, semester=semester)
+        for student_id, subject_id in sorted(wanted - existing.keys())
+    ]
+    Enrollment.objects.bulk_create(missing, batch_size=batch_size, ignore_conflicts=True)
+    _bump_students({enrolment.student_id for enrolment in missing} | {key[0] for key in reactivate_keys})
+    return len(missing) + len(reactivate)
+
+
+def enrol_students(students, academic_year=None, semester=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Enrol each StudentProfile in its section's subjects for the term,
+    reactivating inactive enrolments. Enrolments are recorded under the
+    semester number of the student's year unless `semester` is given.
+    Returns the number of rows created or reactivated.
+    """
+    academic_year = academic_year or get_current_academic_year()
+    subjects = {}
+    wanted = {}
+    for student in students:
+        section = (student.course, student.year, student.section)
+        if section not in subjects:
+            subjects[section] = section_subject_ids(*section, academic_year=academic_year, semester=semester)
+        pairs = wanted.setdefault(semester or year_semester(student.year), set())
+        pairs.update((student.pk, subject_id) for subject_id in subjects[section])
+    return sum(
+        _enrol_pairs(pairs, academic_year, student_semester, batch_size)
+        for student_semester, pairs in wanted.items()
+    )
+
+
+def section_students(course, year, section):
+    return StudentProfile.objects.filter(course=course, year=year, section=section, user__is_active=True)
+
+
+def enrol_section(course, year, section, semester, academic_year=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Enrol every active student of a section in all active subjects of its
+    course, year and semester. Returns (students, subjects, rows created or
+    reactivated).
+    """
+    academic_year = academic_year or get_current_academic_year()
+    subject_ids = list(Subject.objects.filter(
+        course__name=course, year=year, semester=semester, is_active=True
+    ).values_list('pk', flat=True))
+    student_ids = list(section_students(course, year, section).values_list('pk', flat=True))
+    wanted = {(student_id, subject_id) for student_id in student_ids for subject_id in subject_ids}
+    return len(student_ids), len(subject_ids), _enrol_pairs(wanted, academic_year, semester, batch_size)
+
+
+def deactivate_section(course, year, section, academic_year=None, semester=None):
+    """Deactivate a section's active enrolments for a term (every semester if none given)."""
+    enrolments = Enrollment.objects.filter(
+        student__course=course,
+        student__year=year,
+        student__section=section,
+        academic_year__in=academic_year_aliases(academic_year or get_current_academic_year()),
+        is_active=True,
+    )
+    if semester:
+        enrolments = enrolments.filter(semester=semester)
+    student_ids = set(enrolments.values_list('student_id', flat=True))
+    updated = enrolments.update(is_active=False)
+    _bump_students(student_ids)
+    return updated
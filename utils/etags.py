@@ -0,0 +1,49 @@
+"""
+ETag support for polled JSON read APIs.
+The validator is derived from the version counters in utils/cache.py
+rather than from the response body, so an unchanged resource is answered
+with 304 Not Modified after a single cache round trip, before the view
+runs any queries.
+"""
+
+from functools import wraps
+import hashlib
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from utils.cache import get_versions
+
+
+def etag_from_versions(scopes_for):
+    """
+    Decorate a GET view with ETag/If-None-Match handling.
+    `scopes_for(request, *args, **kwargs)` returns the version scopes the
+    response depends on; place the decorator below the auth decorators so
+    request.student / request.teacher are already resolved.
+    """
+    def etag_func(request, *args, **kwargs):
+        scopes = list(scopes_for(request, *args, **kwargs))
+        versions = get_versions(scopes)
+        # The query string and user are part of the validator: the same
+        # versions mean different bodies for different filters or users
+        raw = '|'.join(
+            [request.get_full_path(), str(request.user.pk)]
+            + [f'{scope}={versions[scope]}' for scope in scopes]
+        )
+        return hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                # Let browsers keep the body but always revalidate it
+                patch_cache_control(response, private=True, no_cache=True)
+            elif response.has_header('ETag'):
+                del response.headers['ETag']
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,138 @@
+"""
+Server-Sent Events fan-out for the change feed.
+One poller per process reads new ChangeEvent rows and hands them to every
+connected stream whose scopes match, so N open tabs cost one query per tick
+instead of N. Requires an ASGI server; see enhanced_timetable_system/asgi.py.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from utils.change_feed import changes_since, latest_cursor
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of a slow subscriber's backlog to end its stream
+OVERFLOWED = object()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ChangeEventHub:
+    """Per-process broadcaster; the poll task runs only while someone is listening."""
+
+    def __init__(self):
+        self.subscribers = set()
+        self.cursor = None
+        self.task = None
+
+    def subscribe(self, scopes, cursor):
+        """Register a listener; `cursor` seeds the poller if it is not running yet."""
+        queue = asyncio.Queue(maxsize=1000)
+        subscriber = (frozenset(scopes) if scopes is not None else None, queue)
+        self.subscribers.add(subscriber)
+        if self.cursor is None:
+            self.cursor = cursor
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def overflow(self, subscriber):
+        """
+        Cut off a subscriber whose queue is full. Later events would move its
+        Last-Event-ID past the dropped ones, so its stream is ended instead
+        and the client reconnects and replays from its last delivered id.
+        """
+        self.unsubscribe(subscriber)
+        queue = subscriber[1]
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(OVERFLOWED)
+
+    async def _run(self):
+        interval = _setting('SSE_POLL_INTERVAL', 0.5)
+        while self.subscribers:
+            try:
+                events, self.cursor, truncated = await sync_to_async(changes_since)(self.cursor)
+            except Exception as e:
+                logger.error(f"Change feed poll failed: {e}")
+                events, truncated = [], False
+            for event in events:
+                for subscriber in list(self.subscribers):
+                    scopes, queue = subscriber
+                    if scopes is None or event['scope'] in scopes:
+                        try:
+                            queue.put_nowait(event)
+                        except asyncio.QueueFull:
+                            self.overflow(subscriber)
+            if not truncated:
+                await asyncio.sleep(interval)
+        # Idle: the next subscriber re-seeds the cursor
+        self.cursor = None
+
+
+hub = ChangeEventHub()
+
+
+def format_event(event):
+    data = json.dumps({
+        'id': event['id'],
+        'scope': event['scope'],
+        'kind': event['kind'],
+        'payload': event['payload'],
+        'created_at': event['created_at'].isoformat(),
+    })
+    return f"id: {event['id']}\nevent: {event['kind']}\ndata: {data}\n\n"
+
+
+async def stream_changes(scopes, last_event_id):
+    """
+    Async generator of SSE frames. Replays anything after `last_event_id`,
+    then forwards live events, with comment heartbeats while idle. The stream
+    ends after SSE_MAX_CONNECTION_SECONDS, or early if the client falls too
+    far behind; EventSource reconnects with Last-Event-ID so nothing is lost.
+    """
+    heartbeat = _setting('SSE_HEARTBEAT_INTERVAL', 15)
+    deadline = time.monotonic() + _setting('SSE_MAX_CONNECTION_SECONDS', 300)
+    head = await sync_to_async(latest_cursor)()
+    sent = head if last_event_id is None else last_event_id
+    # Subscribe before catching up so nothing committed in between is missed;
+    # duplicates are dropped by id below
+    subscriber = hub.subscribe(scopes, head)
+    queue = subscriber[1]
+
+    try:
+        yield f"retry: {_setting('SSE_RETRY_MS', 3000)}\n\n"
+
+        while True:
+            events, cursor, truncated = await sync_to_async(changes_since)(sent, scopes)
+            for event in events:
+                yield format_event(event)
+            sent = cursor
+            if not truncated:
+                break
+
+        while time.monotonic() < deadline:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if event is OVERFLOWED:
+                break
+            if event['id'] <= sent:
+                continue
+            sent = event['id']
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(subscriber)
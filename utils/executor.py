@@ -0,0 +1,246 @@
+"""
+Shared, bounded executor for outbound I/O (email, SMS, AI providers).
+Every call to a third party runs on one fixed-size thread pool and is
+tagged with a destination ('smtp', 'sendgrid', 'twilio', 'groq', ...):
+
+* the caller waits at most `deadline` seconds;
+* at most OUTBOUND_DESTINATION_LIMIT calls per destination are in flight.
+  A call that timed out keeps its slot until the thread really returns,
+  so a hung provider can hold only that many threads;
+* at most OUTBOUND_QUEUE_LIMIT calls may wait for a free thread; beyond
+  that calls are rejected instead of queued;
+* a circuit breaker per destination opens after
+  OUTBOUND_BREAKER_THRESHOLD consecutive failures or timeouts, and fails
+  calls immediately for OUTBOUND_BREAKER_COOLDOWN seconds before letting
+  one trial call through.
+
+Thread count and memory therefore stay flat however long a provider is
+down. executor_metrics() reports queue depth and per-destination state.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OutboundError(Exception):
+    """Base class for calls the executor refused to run."""
+
+
+class CircuitOpenError(OutboundError):
+    pass
+
+
+class DestinationBusyError(OutboundError):
+    pass
+
+
+class ExecutorSaturatedError(OutboundError):
+    pass
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half_open after `cooldown` -> closed on success."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        with self.lock:
+            self.trial_running = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class Destination:
+    def __init__(self, name, limit, breaker):
+        self.name = name
+        self.slots = threading.BoundedSemaphore(limit)
+        self.limit = limit
+        self.breaker = breaker
+        self.in_flight = 0
+        self.counts = {'calls': 0, 'failures': 0, 'timeouts': 0, 'rejected': 0}
+
+
+class OutboundExecutor:
+    def __init__(self, workers, queue_limit, destination_limit, breaker_threshold, breaker_cooldown):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.destination_limit = destination_limit
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbound')
+        self.destinations = {}
+        self.lock = threading.Lock()
+        self.submitted = 0  # accepted and not yet finished
+        self.running = 0
+
+    def destination(self, name):
+        with self.lock:
+            if name not in self.destinations:
+                self.destinations[name] = Destination(
+                    name, self.destination_limit,
+                    CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+                )
+            return self.destinations[name]
+
+    def _count(self, destination, key):
+        with self.lock:
+            destination.counts[key] += 1
+
+    def call(self, name, func, *args, deadline=None, **kwargs):
+        """
+        Run func(*args, **kwargs) for destination `name` and return its
+        result, waiting at most `deadline` seconds in total. Raises
+        OutboundError subclasses when the call is refused, TimeoutError
+        when the deadline passes, or whatever func raised.
+        """
+        timeout = deadline or settings.OUTBOUND_DEFAULT_TIMEOUT
+        deadline = time.monotonic() + timeout
+        destination = self.destination(name)
+
+        if not destination.breaker.allow():
+            self._count(destination, 'rejected')
+            raise CircuitOpenError(f"{name} is failing; not calling it for now")
+        if not destination.slots.acquire(timeout=timeout):
+            self._count(destination, 'rejected')
+            # Waiting this long for a slot means the destination is stuck
+            destination.breaker.record_failure()
+            raise DestinationBusyError(f"{name} already has {destination.limit} calls in flight")
+
+        with self.lock:
+            if self.submitted - self.running >= self.queue_limit:
+                saturated = True
+            else:
+                saturated = False
+                self.submitted += 1
+                destination.in_flight += 1
+                destination.counts['calls'] += 1
+        if saturated:
+            destination.slots.release()
+            # Not the destination's fault: leave the breaker as it was
+            destination.breaker.cancel_trial()
+            self._count(destination, 'rejected')
+            raise ExecutorSaturatedError(f"{self.queue_limit} outbound calls already queued")
+
+        future = self.pool.submit(self._run, destination, func, args, kwargs)
+        done, _ = wait([future], timeout=max(0, deadline - time.monotonic()))
+        if not done:
+            # Still queued: drop it. Already running: it keeps its slot until it returns
+            if future.cancel():
+                self._release(destination)
+            self._count(destination, 'timeouts')
+            destination.breaker.record_failure()
+            logger.warning(f"Outbound call to {name} timed out after {timeout}s")
+            raise TimeoutError(f"Call to {name} timed out after {timeout} seconds")
+        try:
+            result = future.result()
+        except Exception:
+            self._count(destination, 'failures')
+            destination.breaker.record_failure()
+            raise
+        destination.breaker.record_success()
+        return result
+
+    def _run(self, destination, func, args, kwargs):
+        with self.lock:
+            self.running += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+            self._release(destination)
+
+    def _release(self, destination):
+        with self.lock:
+            self.submitted -= 1
+            destination.in_flight -= 1
+        destination.slots.release()
+
+    def metrics(self):
+        with self.lock:
+            return {
+                'workers': self.workers,
+                'running': self.running,
+                'queued': self.submitted - self.running,
+                'queue_limit': self.queue_limit,
+                'destinations': {
+                    name: dict(
+                        destination.counts,
+                        in_flight=destination.in_flight,
+                        limit=destination.limit,
+                        circuit=destination.breaker.state,
+                    )
+                    for name, destination in self.destinations.items()
+                },
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = OutboundExecutor(
+                workers=settings.OUTBOUND_WORKERS,
+                queue_limit=settings.OUTBOUND_QUEUE_LIMIT,
+                destination_limit=settings.OUTBOUND_DESTINATION_LIMIT,
+                breaker_threshold=settings.OUTBOUND_BREAKER_THRESHOLD,
+                breaker_cooldown=settings.OUTBOUND_BREAKER_COOLDOWN,
+            )
+        return _executor
+
+
+def run_outbound(destination, func, *args, deadline=None, **kwargs):
+    """
+    Run an outbound call on the shared executor (see OutboundExecutor.call).
+    `deadline` is in seconds; other keyword arguments go to `func`.
+    """
+    return get_executor().call(destination, func, *args, deadline=deadline, **kwargs)
+
+
+def executor_metrics():
+    return get_executor().metrics()
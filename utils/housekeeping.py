@@ -0,0 +1,101 @@
+"""
+Garbage collection for rows that are only useful for a while: OTP codes,
+expired AI recommendations and notifications, abandoned AI chats, the
+outbox, the OTP audit trail and the change feed.
+Rows are deleted in primary-key batches, each in its own short
+transaction, so a purge never holds long locks on a busy table. Run it
+from cron via the purge_expired_records command.
+"""
+
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import OTP, EmailOTP, OTPAuditEvent, OutboundMessage
+from ai_features.models import AIChat, SmartNotification, StudyRecommendation
+from timetable.models import ChangeEvent
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def delete_in_batches(queryset, batch_size=DEFAULT_BATCH_SIZE, pause=0):
+    """Delete every row of `queryset` in batches. Returns the number of rows removed (not counting cascades)."""
+    model = queryset.model
+    removed = 0
+    while True:
+        pks = list(queryset.order_by().values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return removed
+        with transaction.atomic():
+            _, per_model = model.objects.filter(pk__in=pks).delete()
+        removed += per_model.get(model._meta.label, 0)
+        if pause:
+            time.sleep(pause)
+
+
+def _expired_otps(now):
+    return OTP.objects.filter(expires_at__lt=now - timedelta(hours=settings.HOUSEKEEPING_OTP_RETENTION_HOURS))
+
+
+def _expired_email_otps(now):
+    return EmailOTP.objects.filter(expires_at__lt=now - timedelta(hours=settings.HOUSEKEEPING_OTP_RETENTION_HOURS))
+
+
+def _otp_audit_events(now):
+    return OTPAuditEvent.objects.filter(
+        created_at__lt=now - timedelta(days=settings.HOUSEKEEPING_AUDIT_RETENTION_DAYS)
+    )
+
+
+def _finished_outbox_messages(now):
+    return OutboundMessage.objects.filter(
+        status__in=['sent', 'dead'],
+        created_at__lt=now - timedelta(days=settings.HOUSEKEEPING_OUTBOX_RETENTION_DAYS)
+    )
+
+
+def _expired_recommendations(now):
+    return StudyRecommendation.objects.filter(expires_at__lt=now)
+
+
+def _expired_notifications(now):
+    return SmartNotification.objects.filter(expires_at__lt=now)
+
+
+def _stale_chats(now):
+    cutoff = now - timedelta(days=settings.HOUSEKEEPING_CHAT_RETENTION_DAYS)
+    # Adding a message does not touch the chat row, so check the messages too
+    return AIChat.objects.filter(updated_at__lt=cutoff).exclude(messages__timestamp__gte=cutoff)
+
+
+def _old_change_events(now):
+    # Only clients catching up after a disconnect read old events
+    return ChangeEvent.objects.filter(
+        created_at__lt=now - timedelta(days=settings.HOUSEKEEPING_CHANGE_FEED_RETENTION_DAYS)
+    )
+
+
+# name -> queryset of rows due for deletion
+PURGE_TARGETS = {
+    'otp': _expired_otps,
+    'email_otp': _expired_email_otps,
+    'otp_audit': _otp_audit_events,
+    'outbox': _finished_outbox_messages,
+    'recommendations': _expired_recommendations,
+    'notifications': _expired_notifications,
+    'ai_chats': _stale_chats,
+    'change_events': _old_change_events,
+}
+
+
+def purge_expired_records(targets=None, batch_size=DEFAULT_BATCH_SIZE, pause=0, dry_run=False):
+    """Purge the named targets (all by default). Returns {target: rows removed, or due with dry_run}."""
+    now = timezone.now()
+    results = {}
+    for name in targets or PURGE_TARGETS:
+        queryset = PURGE_TARGETS[name](now)
+        results[name] = queryset.count() if dry_run else delete_in_batches(queryset, batch_size, pause)
+    return results
@@ -1,59 +1,45 @@
 """
 Notification service for sending OTP and other messages.
-Supports both SMS (Twilio) and Email notifications.
+Supports both SMS (Twilio) and Email notifications; OTPs are queued in
+the outbox (utils/outbox.py) rather than sent inline.
 """
 
 from django.conf import settings
-from django.core.mail import send_mail, get_connection
-from django.template.loader import render_to_string
+from django.core.mail import get_connection
 import logging
 import os
-import threading
 from functools import wraps
 
+from utils.email_rendering import get_prepared
+from utils.executor import run_outbound
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def timeout_handler(timeout_seconds):
-    """Decorator to add timeout to function calls."""
+def timeout_handler(timeout_seconds, destination='default'):
+    """
+    Decorator to add timeout to function calls. Calls run on the shared
+    outbound executor (utils/executor.py), so a timed-out call holds one of
+    the destination's slots instead of leaking a thread.
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            result = [None]
-            exception = [None]
-            
-            def target():
-                try:
-                    result[0] = func(*args, **kwargs)
-                except Exception as e:
-                    exception[0] = e
-            
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-            thread.join(timeout_seconds)
-            
-            if thread.is_alive():
-                # Thread is still running - timeout occurred
-                logger.error(f"{func.__name__} timed out after {timeout_seconds} seconds")
-                raise TimeoutError(f"Operation timed out after {timeout_seconds} seconds")
-            
-            if exception[0]:
-                raise exception[0]
-            
-            return result[0]
+            return run_outbound(destination, func, *args, deadline=timeout_seconds, **kwargs)
         
         return wrapper
     return decorator
 
 def send_otp_notification(identifier, otp_code, purpose='registration', method='email'):
     """
-    Send OTP notification via email (FREE) or SMS.
+    Queue an OTP notification via email (FREE) or SMS.
     identifier: email address or phone number
     method: 'email' (default/free) or 'sms'
     Returns tuple: (success: bool, otp_code: str, error_message: str)
     
-    Note: In case of network errors, OTP is still returned so user can manually enter it.
+    Sending happens off the request path (utils/outbox.py), so success means
+    the message was queued. The OTP is returned either way so the user can
+    still enter it manually.
     """
     success = False
     error_message = None
@@ -70,19 +56,13 @@ def send_otp_notification(identifier, otp_code, purpose='registration', method='
         print(f"Purpose: {purpose}")
         print(f"======================\n")
         
-        # Try to send email, but don't fail if it doesn't work
-        try:
-            if method == 'email':
-                send_otp_email(identifier, otp_code, purpose)
-                success = True
-        except Exception as e:
-            error_message = f"Email sending failed: {str(e)}"
-            logger.warning(f"Email sending failed in development mode: {e}")
+        # Try to queue the email, but don't fail if it doesn't work
+        if method == 'email' and not send_otp_email(identifier, otp_code, purpose):
+            error_message = "Email could not be queued"
         
         # Always return success in development (OTP is in console)
         return (True, otp_code, error_message)
     
-    # Production mode: try to send, but handle network errors gracefully
     if method == 'email':
         # Check if email backend is configured
         email_backend = getattr(settings, 'EMAIL_BACKEND', '')
@@ -91,40 +71,15 @@ def send_otp_notification(identifier, otp_code, purpose='registration', method='
             logger.info(f"Using console email backend - OTP logged: {otp_code}")
             return (True, otp_code, "Email backend is console (development mode)")
         
-        # Try to send email
-        try:
-            success = send_otp_email(identifier, otp_code, purpose)
-            if not success:
-                # Email sending failed but OTP was attempted in background
-                # In production, we return success=True (fire-and-forget) but log the error
-                error_message = "Email sending initiated but may fail (check logs)"
-                logger.warning(f"Email sending may have failed for {identifier}, but OTP generated: {otp_code}")
-        except (OSError, ConnectionError, TimeoutError) as e:
-            # Network errors - return OTP so user can manually enter it
-            error_code = getattr(e, 'errno', None)
-            error_str = str(e).lower()
-            
-            if error_code == 101 or 'unreachable' in error_str:
-                error_message = "Network unreachable - SMTP server cannot be reached. OTP is still valid."
-            elif 'timeout' in error_str or isinstance(e, TimeoutError):
-                error_message = "Email sending timed out. OTP is still valid - please check your email or use the code shown below."
-            else:
-                error_message = f"Network error: {str(e)}. OTP is still valid."
-            logger.error(f"Network error sending email to {identifier}: {e}")
-            logger.info(f"OTP {otp_code} is still valid for {identifier} - can be entered manually")
-            # Return True with error message - OTP is still valid
-            return (True, otp_code, error_message)
-        except Exception as e:
-            error_message = f"Email sending error: {str(e)}"
-            logger.error(f"Failed to send email to {identifier}: {e}")
-            # Still return OTP code even if email fails
-            return (False, otp_code, error_message)
+        success = send_otp_email(identifier, otp_code, purpose)
+        if not success:
+            error_message = "Email could not be queued. OTP is still valid."
     elif method == 'sms':
         # Use SMS OTP (requires Twilio setup)
         if hasattr(settings, 'TWILIO_ACCOUNT_SID') and settings.TWILIO_ACCOUNT_SID:
             success = send_otp_sms(identifier, otp_code, purpose)
             if not success:
-                error_message = "SMS sending failed"
+                error_message = "SMS could not be queued"
         else:
             error_message = "SMS requested but Twilio not configured"
             logger.warning("SMS requested but Twilio not configured")
@@ -132,37 +87,27 @@ def send_otp_notification(identifier, otp_code, purpose='registration', method='
     return (success, otp_code, error_message)
 
 def send_otp_sms(phone_number, otp_code, purpose='password_reset'):
-    """Send OTP via SMS using Twilio."""
+    """Queue an OTP SMS (sent through Twilio by the outbox)."""
+    from utils.outbox import enqueue_sms
+    
+    if not (hasattr(settings, 'TWILIO_ACCOUNT_SID') and settings.TWILIO_ACCOUNT_SID):
+        logger.warning("Twilio not configured")
+        return False
+    
+    if purpose == 'password_reset':
+        message_body = f"Your Student Tracking System password reset OTP is: {otp_code}. This code expires in 10 minutes."
+    else:
+        message_body = f"Your Student Tracking System verification code is: {otp_code}. This code expires in 10 minutes."
+    
     try:
-        # Only import Twilio if we're actually going to use it
-        if not (hasattr(settings, 'TWILIO_ACCOUNT_SID') and settings.TWILIO_ACCOUNT_SID):
-            logger.warning("Twilio not configured")
-            return False
-            
-        from twilio.rest import Client
-        
-        client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-        
-        if purpose == 'password_reset':
-            message_body = f"Your Student Tracking System password reset OTP is: {otp_code}. This code expires in 10 minutes."
-        else:
-            message_body = f"Your Student Tracking System verification code is: {otp_code}. This code expires in 10 minutes."
-        
-        message = client.messages.create(
-            body=message_body,
-            from_=settings.TWILIO_PHONE_NUMBER,
-            to=phone_number
-        )
-        
-        logger.info(f"SMS sent successfully to {phone_number}. Message SID: {message.sid}")
+        enqueue_sms(phone_number, message_body, purpose=purpose)
         return True
-        
     except Exception as e:
-        logger.error(f"Failed to send SMS to {phone_number}: {str(e)}")
+        logger.error(f"Failed to queue SMS to {phone_number}: {str(e)}")
         return False
 
-def _send_email_sync(email, otp_code, purpose):
-    """Internal synchronous email sending function with explicit connection timeout."""
+def render_otp_email(otp_code, purpose):
+    """(subject, plain_message, html_message) for an OTP email."""
     if purpose == 'password_reset':
         subject = "Student Tracking System - Password Reset OTP"
         template = 'emails/password_reset_otp.html'
@@ -170,116 +115,46 @@ def _send_email_sync(email, otp_code, purpose):
         subject = "Student Tracking System - Verification Code"
         template = 'emails/verification_otp.html'
     
-    context = {
-        'otp_code': otp_code,
-        'purpose': purpose,
-        'expires_minutes': 10
-    }
-    
-    html_message = render_to_string(template, context)
-    plain_message = f"Your OTP verification code is: {otp_code}. This code expires in 10 minutes."
-    
-    # Get timeout from settings
-    timeout = getattr(settings, 'EMAIL_TIMEOUT', 10)
-    
-    # Create connection with explicit timeout
-    connection = get_connection(
-        backend=None,  # Use default backend from settings
-        fail_silently=False,  # We want to catch errors
-        timeout=timeout  # Explicit timeout
-    )
-    
-    # Send email using the connection with timeout
-    # send_mail with connection parameter uses the provided connection
-    result = send_mail(
-        subject=subject,
-        message=plain_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[email],
-        html_message=html_message,
-        connection=connection,
-        fail_silently=False
+    # Shell rendered once per process; each OTP is a string join
+    html_message, plain_message = get_prepared(template, fields=('otp_code',), expires_minutes=10).render(
+        otp_code=otp_code
     )
-    
-    # Close connection
-    connection.close()
-    
-    # send_mail returns the number of emails sent (should be 1)
-    return result > 0
+    return subject, plain_message, html_message
 
 def send_otp_email(email, otp_code, purpose='password_reset'):
-    """Send OTP via email with timeout protection. Tries synchronous send first."""
+    """Queue an OTP email in the outbox. Returns False only if it could not be queued."""
+    from utils.outbox import enqueue_email
+    
     try:
-        # Get timeout from settings, default to 10 seconds
-        timeout_seconds = getattr(settings, 'EMAIL_TIMEOUT', 10)
-        
-        # Try synchronous send first (with timeout protection)
-        # This ensures we can catch errors immediately
-        try:
-            result = _send_email_sync(email, otp_code, purpose)
-            if result:
-                logger.info(f"✅ Email sent successfully to {email}")
-                return True
-            else:
-                logger.warning(f"⚠️ Email sending to {email} returned False")
-                # Still try background send as fallback in production
-                if not settings.DEBUG:
-                    _send_email_background_fallback(email, otp_code, purpose)
-                return False
-        except TimeoutError as e:
-            # Timeout errors - log and try background send as fallback
-            timeout_seconds = getattr(settings, 'EMAIL_TIMEOUT', 30)
-            logger.warning(f"⚠️ Email send timed out after {timeout_seconds}s for {email}: {str(e)}")
-            if not settings.DEBUG:
-                # Try background send as fallback (might work even if sync timed out)
-                _send_email_background_fallback(email, otp_code, purpose)
-            raise  # Re-raise so calling code can handle it
-        except (OSError, ConnectionError) as e:
-            # Network/connection errors - try background send as fallback
-            logger.warning(f"⚠️ Email send connection error for {email}: {str(e)}")
-            if not settings.DEBUG:
-                # Try background send as fallback
-                _send_email_background_fallback(email, otp_code, purpose)
-            raise  # Re-raise so calling code can handle it
-        except Exception as e:
-            logger.error(f"❌ Failed to send email to {email}: {str(e)}")
-            # Try background send as fallback in production
-            if not settings.DEBUG:
-                _send_email_background_fallback(email, otp_code, purpose)
-            raise  # Re-raise so calling code can handle it
-        
+        subject, plain_message, html_message = render_otp_email(otp_code, purpose)
+        enqueue_email(email, subject, plain_message, html_body=html_message, purpose=purpose)
+        logger.info(f"OTP email to {email} queued")
+        return True
     except Exception as e:
-        logger.error(f"Failed to send email to {email}: {str(e)}")
+        logger.error(f"Failed to queue email to {email}: {str(e)}")
         return False
 
-def _send_email_background_fallback(email, otp_code, purpose):
-    """Send email in background thread as fallback if synchronous send fails."""
-    def send_in_thread():
-        try:
-            logger.info(f"Attempting background email send to {email} (fallback)")
-            result = _send_email_sync(email, otp_code, purpose)
-            if result:
-                logger.info(f"✅ Background email sent successfully to {email}")
-            else:
-                logger.warning(f"⚠️ Background email send failed for {email}")
-        except Exception as e:
-            logger.error(f"❌ Background email send error for {email}: {str(e)}")
+def send_announcement_notification(users, announcement, batch_size=500):
+    """
+    Email an announcement to the given users in batches over one connection.
+    Large audiences should go through the queued pipeline instead
+    (utils/announcement_delivery.py, deliver_announcements command).
+    """
+    from utils.announcement_delivery import render_announcement, send_batch
     
-    thread = threading.Thread(target=send_in_thread)
-    thread.daemon = True
-    thread.start()
-
-def send_announcement_notification(users, announcement):
-    """Send announcement notification to users."""
+    rendered = render_announcement(announcement)
+    emails = [user.email for user in users if user.email]
     success_count = 0
     
-    for user in users:
-        try:
-            # You could implement email or SMS notifications here
-            # For now, we'll just log it
-            logger.info(f"Announcement '{announcement.title}' sent to user {user.username}")
-            success_count += 1
-        except Exception as e:
-            logger.error(f"Failed to send announcement to {user.username}: {str(e)}")
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+        for start in range(0, len(emails), batch_size):
+            sent, error = send_batch(rendered, emails[start:start + batch_size], connection)
+            if error:
+                logger.error(f"Failed to send announcement '{announcement.title}' batch: {error}")
+            success_count += sent
+    finally:
+        connection.close()
     
     return success_count
@@ -0,0 +1,175 @@
+"""
+OTP issue and verification.
+Codes live in a pluggable store (settings.OTP_STORE). The default,
+CacheOTPStore, keeps them in the shared cache with a native TTL, so
+registration traffic never touches the OTP tables and nothing needs
+purging. DatabaseOTPStore keeps the old EmailOTP table behaviour.
+
+issue_otp() and consume_otp() add what every store shares:
+* per-identifier limits on codes requested and on wrong guesses per code
+  (the code is burned after OTP_MAX_ATTEMPTS failures);
+* a per-IP limit on OTP requests and guesses combined;
+* an optional audit trail (OTPAuditEvent) written on a background thread.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import logging
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection as db_connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import EmailOTP, OTPAuditEvent
+from utils.throttle import client_ip, hit, is_limited, reset
+
+logger = logging.getLogger(__name__)
+
+
+class OTPRateLimited(Exception):
+    """Raised instead of issuing or checking a code; the message is safe to show to users."""
+
+
+def generate_code():
+    return f'{secrets.randbelow(10 ** 6):06d}'
+
+
+def normalize(identifier):
+    return identifier.strip().lower()
+
+
+class CacheOTPStore:
+    """
+    One cache key per issued code, named by an HMAC of (purpose,
+    identifier, code). Verifying is a lookup plus delete of that key, and
+    only the caller whose delete succeeds gets True, so a code can be
+    consumed once even under concurrent submits.
+    """
+
+    def _digest(self, *parts):
+        message = '\x1f'.join(parts).encode()
+        return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+    def _code_key(self, identifier, purpose, code):
+        return f'otp:code:{self._digest(purpose, identifier, code)}'
+
+    def _current_key(self, identifier, purpose):
+        return f'otp:current:{self._digest(purpose, identifier)}'
+
+    def issue(self, identifier, purpose, ttl):
+        self.revoke(identifier, purpose)
+        code = generate_code()
+        key = self._code_key(identifier, purpose, code)
+        cache.set(key, 1, timeout=ttl)
+        cache.set(self._current_key(identifier, purpose), key, timeout=ttl)
+        return code
+
+    def consume(self, identifier, purpose, code):
+        key = self._code_key(identifier, purpose, code)
+        # get() honours the TTL; delete() alone would also remove an expired
+        # entry the file backend has not culled yet
+        if cache.get(key) is None or not cache.delete(key):
+            return False
+        cache.delete(self._current_key(identifier, purpose))
+        return True
+
+    def revoke(self, identifier, purpose):
+        """Invalidate the outstanding code, if any."""
+        current = self._current_key(identifier, purpose)
+        previous = cache.get(current)
+        if previous:
+            cache.delete_many([previous, current])
+
+
+class DatabaseOTPStore:
+    """Codes in the EmailOTP table, consumed with a single conditional UPDATE."""
+
+    def issue(self, identifier, purpose, ttl):
+        return EmailOTP.generate_otp(identifier, purpose)
+
+    def consume(self, identifier, purpose, code):
+        return EmailOTP.objects.filter(
+            email=identifier,
+            otp_code=code,
+            purpose=purpose,
+            is_used=False,
+            expires_at__gt=timezone.now()
+        ).update(is_used=True) > 0
+
+    def revoke(self, identifier, purpose):
+        EmailOTP.objects.filter(email=identifier, purpose=purpose, is_used=False).update(is_used=True)
+
+
+_store = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.OTP_STORE)()
+    return _store
+
+
+_audit_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='otp-audit')
+
+
+def _write_audit(identifier, purpose, event, ip_address):
+    try:
+        OTPAuditEvent.objects.create(identifier=identifier, purpose=purpose, event=event, ip_address=ip_address)
+    except Exception as e:
+        logger.warning(f"Could not record OTP audit event {event} for {identifier}: {e}")
+    finally:
+        db_connection.close()
+
+
+def audit(identifier, purpose, event, ip_address=None):
+    if settings.OTP_AUDIT:
+        _audit_pool.submit(_write_audit, identifier, purpose, event, ip_address)
+
+
+def _check_ip(ip_address, identifier, purpose):
+    if ip_address and not hit(f'otp:ip:{ip_address}', settings.OTP_IP_LIMIT, settings.OTP_IP_WINDOW):
+        audit(identifier, purpose, 'throttled', ip_address)
+        raise OTPRateLimited("Too many verification requests from your network. Please wait a few minutes and try again.")
+
+
+def issue_otp(identifier, purpose='registration', request=None):
+    """Create a new code for `identifier`, replacing any outstanding one. Raises OTPRateLimited."""
+    identifier = normalize(identifier)
+    ip_address = client_ip(request) if request is not None else None
+    _check_ip(ip_address, identifier, purpose)
+    if not hit(f'otp:issue:{purpose}:{identifier}', settings.OTP_ISSUE_LIMIT, settings.OTP_ISSUE_WINDOW):
+        audit(identifier, purpose, 'throttled', ip_address)
+        raise OTPRateLimited("Too many codes requested for this address. Please wait a few minutes and try again.")
+
+    code = get_otp_store().issue(identifier, purpose, settings.OTP_TTL)
+    reset(f'otp:failures:{purpose}:{identifier}')
+    audit(identifier, purpose, 'issued', ip_address)
+    return code
+
+
+def consume_otp(identifier, code, purpose='registration', request=None):
+    """Check and consume a code. Returns True at most once per code; raises OTPRateLimited."""
+    identifier = normalize(identifier)
+    ip_address = client_ip(request) if request is not None else None
+    _check_ip(ip_address, identifier, purpose)
+
+    store = get_otp_store()
+    failures = f'otp:failures:{purpose}:{identifier}'
+    if is_limited(failures, settings.OTP_MAX_ATTEMPTS):
+        store.revoke(identifier, purpose)
+        audit(identifier, purpose, 'locked', ip_address)
+        raise OTPRateLimited("Too many incorrect codes. Please request a new OTP.")
+
+    if store.consume(identifier, purpose, code.strip()):
+        reset(failures)
+        audit(identifier, purpose, 'verified', ip_address)
+        return True
+
+    hit(failures, settings.OTP_MAX_ATTEMPTS, settings.OTP_TTL)
+    audit(identifier, purpose, 'failed', ip_address)
+    return False
@@ -0,0 +1,309 @@
+"""
+Durable outbox for OTP and other transactional messages.
+Request handlers only insert an OutboundMessage row (enqueue_email /
+enqueue_sms); sending happens off the request path:
+
+* the process_outbox management command is the worker: it claims due rows,
+  sends them on a bounded thread pool, retries failures with exponential
+  backoff and dead-letters a message once it runs out of attempts;
+* after commit, each enqueue also hands the new row to a small in-process
+  pool (OUTBOX_INLINE_WORKERS threads) so OTPs still go out promptly on
+  deployments that run no separate worker. Anything it fails to send stays
+  in the table for the worker.
+
+Sends are rate limited per provider (OUTBOX_RATE_LIMITS, messages per
+second per process) so a registration burst cannot trip SendGrid, SMTP or
+Twilio throttling, and run on the shared outbound executor
+(utils/executor.py) for deadlines and circuit breaking.
+
+OTP messages only keep their body while they can still be sent: it is
+redacted once a message is sent or dead-lettered, so codes do not sit in
+the table until housekeeping purges it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import random
+import smtplib
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from accounts.models import OTP, EmailOTP, OutboundMessage
+from utils.executor import OutboundError, run_outbound
+
+logger = logging.getLogger(__name__)
+
+# A message left in 'sending' this long belongs to a dead worker
+STALE_AFTER = timedelta(minutes=5)
+# Failures that retrying cannot fix
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused,)
+# Purposes whose messages carry a one-time code
+SECRET_PURPOSES = {purpose for purpose, _ in OTP.PURPOSE_CHOICES + EmailOTP.PURPOSE_CHOICES}
+REDACTED_BODY = '[redacted]'
+
+
+def email_provider():
+    """Rate limit bucket for the configured email backend."""
+    backend = settings.EMAIL_BACKEND.lower()
+    if 'sendgrid' in backend:
+        return 'sendgrid'
+    # django.core.mail.backends.smtp.EmailBackend -> 'smtp'
+    return backend.rsplit('.', 2)[-2]
+
+
+def enqueue_email(recipient, subject, body, html_body='', purpose='', max_attempts=None):
+    message = OutboundMessage.objects.create(
+        channel='email',
+        provider=email_provider(),
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        purpose=purpose,
+        max_attempts=max_attempts or settings.OUTBOX_MAX_ATTEMPTS,
+    )
+    _dispatch_after_commit(message.pk)
+    return message
+
+
+def enqueue_sms(recipient, body, purpose='', max_attempts=None):
+    message = OutboundMessage.objects.create(
+        channel='sms',
+        provider='twilio',
+        recipient=recipient,
+        body=body,
+        purpose=purpose,
+        max_attempts=max_attempts or settings.OUTBOX_MAX_ATTEMPTS,
+    )
+    _dispatch_after_commit(message.pk)
+    return message
+
+
+class RateLimiter:
+    """Token bucket shared by every thread in the process. A rate of 0 means unlimited."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def rate_limiter(provider):
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = RateLimiter(settings.OUTBOX_RATE_LIMITS.get(provider, 0))
+        return _limiters[provider]
+
+
+def retry_delay(attempts):
+    """Seconds to wait after the `attempts`-th failure: exponential with a little jitter."""
+    delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+    return delay + random.uniform(0, delay / 10)
+
+
+def _send_email(message):
+    email = EmailMultiAlternatives(
+        message.subject,
+        message.body,
+        settings.DEFAULT_FROM_EMAIL,
+        [message.recipient],
+        connection=get_connection(fail_silently=False, timeout=getattr(settings, 'EMAIL_TIMEOUT', 10)),
+    )
+    if message.html_body:
+        email.attach_alternative(message.html_body, 'text/html')
+    if not email.send():
+        raise RuntimeError("Email backend reported 0 messages sent")
+
+
+def _send_sms(message):
+    if not getattr(settings, 'TWILIO_ACCOUNT_SID', ''):
+        raise RuntimeError("Twilio not configured")
+    from twilio.rest import Client
+
+    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    sms = client.messages.create(body=message.body, from_=settings.TWILIO_PHONE_NUMBER, to=message.recipient)
+    logger.info(f"SMS sent to {message.recipient}. Message SID: {sms.sid}")
+
+
+SENDERS = {
+    'email': _send_email,
+    'sms': _send_sms,
+}
+
+
+def _redacted(message):
+    """Extra fields for the final update of a message that will not be sent again."""
+    if message.purpose in SECRET_PURPOSES:
+        return {'body': REDACTED_BODY, 'html_body': ''}
+    return {}
+
+
+def _record_success(message):
+    OutboundMessage.objects.filter(pk=message.pk).update(
+        status='sent', sent_at=timezone.now(), locked_at=None, last_error='', **_redacted(message)
+    )
+    return 'sent'
+
+
+def _record_failure(message, error, permanent=False):
+    now = timezone.now()
+    if permanent or message.attempts >= message.max_attempts:
+        logger.error(f"Outbox message {message.pk} to {message.recipient} dead-lettered: {error}")
+        OutboundMessage.objects.filter(pk=message.pk).update(
+            status='dead', locked_at=None, last_error=str(error), **_redacted(message)
+        )
+        return 'dead'
+    delay = retry_delay(message.attempts)
+    logger.warning(
+        f"Outbox message {message.pk} to {message.recipient} failed "
+        f"(attempt {message.attempts}/{message.max_attempts}), retrying in {delay:.0f}s: {error}"
+    )
+    OutboundMessage.objects.filter(pk=message.pk).update(
+        status='pending', locked_at=None, last_error=str(error),
+        next_attempt_at=now + timedelta(seconds=delay)
+    )
+    return 'retry'
+
+
+def _defer(message, error):
+    # The executor refused the call (provider circuit open, or overloaded):
+    # nothing was attempted, so the attempt is handed back
+    OutboundMessage.objects.filter(pk=message.pk).update(
+        status='pending', attempts=message.attempts - 1, locked_at=None, last_error=str(error),
+        next_attempt_at=timezone.now() + timedelta(seconds=settings.OUTBOUND_BREAKER_COOLDOWN)
+    )
+    return 'retry'
+
+
+def send_message(message):
+    """Send one claimed message and record the outcome ('sent', 'retry' or 'dead')."""
+    rate_limiter(message.provider).acquire()
+    try:
+        run_outbound(message.provider, SENDERS[message.channel], message)
+    except OutboundError as e:
+        return _defer(message, e)
+    except PERMANENT_ERRORS as e:
+        return _record_failure(message, e, permanent=True)
+    except Exception as e:
+        return _record_failure(message, e)
+    return _record_success(message)
+
+
+def _claim(pk, status, attempts, now):
+    # Conditional update: only one worker sees the row unchanged
+    return OutboundMessage.objects.filter(pk=pk, status=status, attempts=attempts).update(
+        status='sending', attempts=attempts + 1, locked_at=now
+    )
+
+
+def claim_due(limit=100):
+    """
+    Atomically claim messages that are due, or stuck in 'sending' on a dead
+    worker. Safe to call from several workers at once.
+    """
+    now = timezone.now()
+    # Stuck messages that already used their last attempt are not retried again
+    stuck = OutboundMessage.objects.filter(
+        status='sending', locked_at__lt=now - STALE_AFTER, attempts__gte=F('max_attempts')
+    )
+    dead = {'status': 'dead', 'locked_at': None, 'last_error': 'Worker stopped during the final attempt'}
+    stuck.filter(purpose__in=SECRET_PURPOSES).update(body=REDACTED_BODY, html_body='', **dead)
+    stuck.update(**dead)
+
+    candidates = OutboundMessage.objects.filter(
+        Q(status='pending', next_attempt_at__lte=now) |
+        Q(status='sending', locked_at__lt=now - STALE_AFTER)
+    ).order_by('next_attempt_at').values_list('pk', 'status', 'attempts')[:limit]
+
+    claimed = [pk for pk, status, attempts in candidates if _claim(pk, status, attempts, now)]
+    return list(OutboundMessage.objects.filter(pk__in=claimed).order_by('next_attempt_at'))
+
+
+def _send_in_thread(message):
+    try:
+        return send_message(message)
+    finally:
+        # Pool threads each hold their own database connection
+        db_connection.close()
+
+
+def process_due(limit=100, workers=None):
+    """Claim up to `limit` due messages and send them on a bounded pool. Returns outcome counts."""
+    messages = claim_due(limit)
+    counts = {'sent': 0, 'retry': 0, 'dead': 0}
+    if not messages:
+        return counts
+    with ThreadPoolExecutor(max_workers=workers or settings.OUTBOX_WORKERS, thread_name_prefix='outbox') as pool:
+        for outcome in pool.map(_send_in_thread, messages):
+            counts[outcome] += 1
+    return counts
+
+
+def requeue_dead(queryset=None):
+    """
+    Give dead-lettered messages a fresh set of attempts. Returns the number
+    requeued. OTP messages are skipped: their body is redacted and the code
+    has expired anyway.
+    """
+    queryset = OutboundMessage.objects.all() if queryset is None else queryset
+    return queryset.filter(status='dead').exclude(purpose__in=SECRET_PURPOSES).update(
+        status='pending', attempts=0, next_attempt_at=timezone.now(), last_error=''
+    )
+
+
+_inline_pool = None
+_inline_pool_lock = threading.Lock()
+
+
+def _get_inline_pool():
+    global _inline_pool
+    with _inline_pool_lock:
+        if _inline_pool is None:
+            _inline_pool = ThreadPoolExecutor(
+                max_workers=settings.OUTBOX_INLINE_WORKERS, thread_name_prefix='outbox-inline'
+            )
+        return _inline_pool
+
+
+def _dispatch_inline(pk):
+    now = timezone.now()
+    if not _claim(pk, 'pending', 0, now):
+        return  # already taken by the worker
+    try:
+        send_message(OutboundMessage.objects.get(pk=pk))
+    except Exception as e:
+        logger.error(f"Inline dispatch of outbox message {pk} failed: {e}")
+    finally:
+        db_connection.close()
+
+
+def _dispatch_after_commit(pk):
+    if settings.OUTBOX_INLINE_WORKERS:
+        transaction.on_commit(lambda: _get_inline_pool().submit(_dispatch_inline, pk))
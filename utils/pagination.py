@@ -0,0 +1,74 @@
+"""
+Keyset (cursor) pagination.
+Pages are selected with a WHERE clause on the last row's ordering values
+instead of OFFSET, so page N costs the same as page 1 and rows inserted
+while a client is paging do not shift or duplicate results.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import json
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded."""
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return urlsafe_b64encode(raw.encode()).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, length):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return default
+
+
+def _after(fields, values, descending):
+    """Q for rows strictly after `values` in (fields...) order."""
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for position, field in enumerate(fields):
+        clause = Q(**{f'{field}__{lookup}': values[position]})
+        for previous, previous_value in zip(fields[:position], values[:position]):
+            clause &= Q(**{previous: previous_value})
+        condition |= clause
+    return condition
+
+
+def keyset_paginate(queryset, fields, cursor=None, page_size=DEFAULT_PAGE_SIZE, descending=True):
+    """
+    Return (rows, next_cursor) for one page of `queryset` ordered by `fields`.
+    The last field must be unique (normally 'id') so the order is total.
+    """
+    fields = list(fields)
+    if cursor:
+        queryset = queryset.filter(_after(fields, decode_cursor(cursor, len(fields)), descending))
+    ordering = [f'-{field}' if descending else field for field in fields]
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([
+            last[field] if isinstance(last, dict) else getattr(last, field) for field in fields
+        ])
+    return rows, next_cursor
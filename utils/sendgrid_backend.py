@@ -1,141 +1,254 @@
 """
 SendGrid HTTP API Email Backend for Django
 Uses SendGrid's HTTP API instead of SMTP - works reliably on Render free tier
+
+Messages that share sender, subject and content (announcements, reports,
+any fan-out rendered once) are grouped into one /v3/mail/send call with up
+to 1000 personalizations, so a few thousand recipients take a handful of
+requests. All calls go through one pooled requests.Session that lives as
+long as the backend connection is open. Point SENDGRID_API_BASE_URL at a
+local stub server to exercise it without an account.
 """
 
 from django.core.mail.backends.base import BaseEmailBackend
 from django.conf import settings
+from email.utils import parseaddr
+import base64
 import logging
 import os
+import re
 
 logger = logging.getLogger(__name__)
 
 try:
-    from sendgrid import SendGridAPIClient
-    from sendgrid.helpers.mail import Mail
-    SENDGRID_AVAILABLE = True
+    import requests
+    REQUESTS_AVAILABLE = True
 except ImportError:
-    SENDGRID_AVAILABLE = False
-    logger.warning("sendgrid package not installed. Install with: pip install sendgrid")
+    REQUESTS_AVAILABLE = False
+    logger.warning("requests package not installed. Install with: pip install requests")
+
+# SendGrid's per-request limit on personalizations and on total recipients
+MAX_PERSONALIZATIONS = 1000
+MAX_RECIPIENTS = 1000
+HTML_PATTERN = re.compile(r'<(html|body)[\s>]', re.IGNORECASE)
+PERSONALIZATION_FIELD = re.compile(r'^personalizations\.(\d+)\.')
+
+
+class SendGridError(Exception):
+    pass
 
 
 class SendGridBackend(BaseEmailBackend):
     """
     SendGrid HTTP API email backend.
     Uses SendGrid's REST API instead of SMTP - much more reliable on platforms like Render.
+
+    After send_messages, failed_recipients maps each address SendGrid
+    rejected to the reason it gave.
     """
-    
-    def __init__(self, fail_silently=False, **kwargs):
+
+    def __init__(self, fail_silently=False, api_key=None, api_base_url=None, timeout=None, **kwargs):
         super().__init__(fail_silently=fail_silently)
-        
-        if not SENDGRID_AVAILABLE:
-            raise ImportError("sendgrid package is required. Install with: pip install sendgrid")
-        
+
+        if not REQUESTS_AVAILABLE:
+            raise ImportError("requests package is required. Install with: pip install requests")
+
         # Get API key from settings or environment
-        self.api_key = getattr(settings, 'SENDGRID_API_KEY', None) or os.environ.get('SENDGRID_API_KEY')
-        
+        self.api_key = api_key or getattr(settings, 'SENDGRID_API_KEY', None) or os.environ.get('SENDGRID_API_KEY')
+
         if not self.api_key:
             if not fail_silently:
                 raise ValueError("SENDGRID_API_KEY not found in settings or environment variables")
             logger.error("SENDGRID_API_KEY not configured")
-            self.api_key = None
-        
-        # Initialize SendGrid client
-        if self.api_key:
-            try:
-                self.sg = SendGridAPIClient(self.api_key)
-                logger.info("✅ SendGrid API client initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize SendGrid client: {e}")
-                self.sg = None
-        else:
-            self.sg = None
-    
+
+        base_url = api_base_url or getattr(settings, 'SENDGRID_API_BASE_URL', 'https://api.sendgrid.com')
+        self.send_url = f"{base_url.rstrip('/')}/v3/mail/send"
+        self.timeout = timeout or getattr(settings, 'EMAIL_TIMEOUT', 10)
+        self.session = None
+        self.failed_recipients = {}
+
+    def open(self):
+        """Start the pooled HTTP session. Returns True if a new one was created."""
+        if self.session is not None:
+            return False
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+        })
+        return True
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
     def send_messages(self, email_messages):
-        """Send one or more EmailMessage objects using SendGrid API."""
-        if not self.sg:
+        """Send EmailMessage objects, batching those with identical content. Returns the number sent."""
+        self.failed_recipients = {}
+        if not email_messages:
+            return 0
+        if not self.api_key:
             if not self.fail_silently:
-                raise ValueError("SendGrid client not initialized")
+                raise ValueError("SendGrid API key not configured")
             return 0
-        
+
+        new_session = self.open()
         num_sent = 0
-        for message in email_messages:
-            try:
-                # Get from email
-                from_email = message.from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com')
-                
-                # Extract HTML and plain text content from Django EmailMessage
-                html_content = None
-                plain_text_content = message.body
-                
-                # Check if message has HTML alternatives
-                if hasattr(message, 'alternatives') and message.alternatives:
-                    for content, mimetype in message.alternatives:
-                        if mimetype == 'text/html':
-                            html_content = content
-                            break
-                    # If no HTML found in alternatives, check if body is HTML
-                    if not html_content:
-                        # Try to detect if body is HTML
-                        if '<html' in message.body.lower() or '<body' in message.body.lower():
-                            html_content = message.body
-                        else:
-                            # Use body as plain text if no HTML detected
-                            plain_text_content = message.body
-                else:
-                    # Check if body is HTML
-                    if '<html' in message.body.lower() or '<body' in message.body.lower():
-                        html_content = message.body
-                        plain_text_content = None  # Will extract text from HTML if needed
-                    else:
-                        plain_text_content = message.body
-                
-                # Log email details for debugging
-                logger.info(f"📧 Sending email via SendGrid API:")
-                logger.info(f"   From: {from_email}")
-                logger.info(f"   To: {message.to}")
-                logger.info(f"   Subject: {message.subject}")
-                logger.info(f"   Has HTML: {html_content is not None}")
-                
-                # Build SendGrid Mail object
-                mail = Mail(
-                    from_email=from_email,
-                    to_emails=message.to,
-                    subject=message.subject,
-                    html_content=html_content or plain_text_content,
-                    plain_text_content=plain_text_content if plain_text_content else "Please enable HTML to view this email."
-                )
-                
-                # Add CC and BCC if present
-                if message.cc:
-                    mail.add_cc(message.cc)
-                if message.bcc:
-                    mail.add_bcc(message.bcc)
-                
-                # Add reply-to if present
-                if message.reply_to:
-                    mail.reply_to = message.reply_to[0] if isinstance(message.reply_to, list) else message.reply_to
-                
-                # Send email via SendGrid API
-                response = self.sg.send(mail)
-                
-                # Check response status
-                if response.status_code in [200, 201, 202]:
-                    logger.info(f"✅ Email sent successfully via SendGrid API to {message.to}")
-                    logger.info(f"   SendGrid response: {response.status_code} - {response.body}")
-                    num_sent += 1
-                else:
-                    error_msg = f"SendGrid API returned status {response.status_code}: {response.body}"
-                    logger.error(f"❌ Failed to send email: {error_msg}")
-                    logger.error(f"   From: {from_email}, To: {message.to}")
-                    if not self.fail_silently:
-                        raise Exception(error_msg)
-                        
-            except Exception as e:
-                logger.error(f"❌ Error sending email via SendGrid API: {str(e)}")
-                if not self.fail_silently:
-                    raise
-                # Continue to next message
-        
+        try:
+            for payload, messages in self._group(email_messages):
+                for batch in self._batches(messages):
+                    try:
+                        num_sent += self._send_batch(payload, batch)
+                    except Exception as e:
+                        logger.error(f"❌ Error sending email via SendGrid API: {str(e)}")
+                        if not self.fail_silently:
+                            raise
+        finally:
+            if new_session:
+                self.close()
+
+        if self.failed_recipients:
+            logger.warning(f"SendGrid rejected {len(self.failed_recipients)} recipients")
+        logger.info(f"SendGrid: {num_sent}/{len(email_messages)} emails accepted")
         return num_sent
 
+    def _group(self, email_messages):
+        """
+        [(payload without personalizations, [messages])] for messages that can
+        share one request. Messages with attachments, headers or more than
+        one reply-to address go on their own.
+        """
+        groups = {}
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            from_email = message.from_email or getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com')
+            html = next((content for content, mimetype in getattr(message, 'alternatives', [])
+                         if mimetype == 'text/html'), None)
+            if message.attachments or message.extra_headers or len(message.reply_to) > 1:
+                key = id(message)
+            else:
+                key = (from_email, message.subject, message.body, html, tuple(message.reply_to))
+            if key in groups:
+                groups[key][1].append(message)
+            else:
+                groups[key] = (self._payload(message, from_email, html), [message])
+        return list(groups.values())
+
+    def _payload(self, message, from_email, html):
+        # HTML detection runs once per group, not once per recipient
+        if html is None and HTML_PATTERN.search(message.body):
+            content = [{'type': 'text/html', 'value': message.body}]
+        else:
+            content = [{'type': 'text/plain', 'value': message.body or ' '}]
+            if html is not None:
+                content.append({'type': 'text/html', 'value': html})
+
+        name, address = parseaddr(from_email)
+        sender = {'email': address or from_email}
+        if name:
+            sender['name'] = name
+        payload = {
+            'from': sender,
+            'subject': message.subject,
+            'content': content,
+        }
+        if message.reply_to:
+            payload['reply_to'] = {'email': message.reply_to[0]}
+        if message.extra_headers:
+            payload['headers'] = {name: str(value) for name, value in message.extra_headers.items()}
+        if message.attachments:
+            payload['attachments'] = [self._attachment(attachment) for attachment in message.attachments]
+        return payload
+
+    @staticmethod
+    def _attachment(attachment):
+        if not isinstance(attachment, tuple):
+            # MIMEBase instance
+            filename = attachment.get_filename() or 'attachment'
+            content = attachment.get_payload(decode=True) or b''
+            mimetype = attachment.get_content_type()
+        else:
+            filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        return {
+            'filename': filename,
+            'type': mimetype or 'application/octet-stream',
+            'content': base64.b64encode(content).decode('ascii'),
+        }
+
+    @staticmethod
+    def _batches(messages):
+        """Split a group so no request exceeds SendGrid's personalization or recipient limits."""
+        batch, recipients = [], 0
+        for message in messages:
+            count = len(message.recipients())
+            if batch and (len(batch) == MAX_PERSONALIZATIONS or recipients + count > MAX_RECIPIENTS):
+                yield batch
+                batch, recipients = [], 0
+            batch.append(message)
+            recipients += count
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _personalization(message):
+        personalization = {'to': [{'email': address} for address in message.to]}
+        if message.cc:
+            personalization['cc'] = [{'email': address} for address in message.cc]
+        if message.bcc:
+            personalization['bcc'] = [{'email': address} for address in message.bcc]
+        if not message.to:
+            # SendGrid requires a "to"; promote the first cc/bcc address
+            first = (personalization.get('cc') or personalization['bcc']).pop(0)
+            personalization['to'] = [first]
+            for field in ('cc', 'bcc'):
+                if field in personalization and not personalization[field]:
+                    del personalization[field]
+        return personalization
+
+    def _send_batch(self, payload, messages):
+        """
+        Post one request for `messages`. If SendGrid rejects only some
+        personalizations, record those recipients and resend the rest once.
+        """
+        response = self._post(payload, messages)
+        if response.status_code in (200, 201, 202):
+            return len(messages)
+
+        rejected = self._rejected_personalizations(response)
+        if response.status_code != 400 or not rejected:
+            raise SendGridError(f"SendGrid API returned status {response.status_code}: {response.text[:500]}")
+
+        for index, reason in rejected.items():
+            for address in messages[index].recipients():
+                self.failed_recipients[address] = reason
+        remaining = [message for index, message in enumerate(messages) if index not in rejected]
+        if not remaining:
+            return 0
+        response = self._post(payload, remaining)
+        if response.status_code not in (200, 201, 202):
+            raise SendGridError(f"SendGrid API returned status {response.status_code}: {response.text[:500]}")
+        return len(remaining)
+
+    def _post(self, payload, messages):
+        body = dict(payload, personalizations=[self._personalization(message) for message in messages])
+        logger.debug(f"SendGrid: posting {len(messages)} personalizations for '{payload['subject']}'")
+        return self.session.post(self.send_url, json=body, timeout=self.timeout)
+
+    @staticmethod
+    def _rejected_personalizations(response):
+        """{personalization index: reason} from a 400 response, or {} if any error is not per-recipient."""
+        try:
+            errors = response.json().get('errors') or []
+        except ValueError:
+            return {}
+        rejected = {}
+        for error in errors:
+            match = PERSONALIZATION_FIELD.match(error.get('field') or '')
+            if not match:
+                return {}
+            rejected[int(match.group(1))] = error.get('message', 'Rejected by SendGrid')
+        return rejected
@@ -0,0 +1,274 @@
+"""
+Bulk student onboarding from CSV or XLSX.
+Rows are streamed in batches. Each batch is validated with the same rules
+as self-registration, checked against the database with a few set-based
+queries and inserted with bulk_create (User, StudentProfile), then the new
+students are enrolled in their section's subjects (utils/enrolment.py).
+No OTPs or emails are sent.
+
+Passwords in the file are hashed on a process pool, since PBKDF2 is the
+dominant cost. Rows without a password get an unusable one; those students
+set theirs through "Forgot password", which only needs the email address.
+
+Errors are reported per row and never abort the import: a bad row is
+skipped and the rest of its batch is still created.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import io
+import os
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from accounts.models import StudentProfile, User
+from utils.enrolment import enrol_students
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+DEFAULT_BATCH_SIZE = 500
+
+# Accepted spellings of each column, after lower-casing and trimming
+COLUMN_ALIASES = {
+    'roll_number': {'roll_number', 'roll number', 'roll no', 'roll', 'rollno'},
+    'first_name': {'first_name', 'first name', 'firstname'},
+    'last_name': {'last_name', 'last name', 'lastname', 'surname'},
+    'email': {'email', 'email address', 'e-mail'},
+    'course': {'course', 'program', 'programme'},
+    'year': {'year'},
+    'section': {'section', 'sec'},
+    'phone_number': {'phone_number', 'phone number', 'phone', 'mobile'},
+    'password': {'password'},
+}
+REQUIRED_COLUMNS = ['roll_number', 'first_name', 'last_name', 'email', 'course', 'year', 'section']
+COURSES = {code for code, _ in StudentProfile.COURSE_CHOICES}
+
+ROLL_NUMBER_RE = re.compile(r'^[A-Z0-9]+$')
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_RE = re.compile(r'^\+?[\d\s\-\(\)]{10,15}$')
+SECTION_RE = re.compile(r'^[A-Z]{1,5}$')  # a letter plus any specialisation, e.g. "AAIML"
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported (format, missing columns)."""
+
+
+def _map_header(header):
+    columns = {}
+    for index, name in enumerate(header):
+        label = str(name or '').strip().lower().replace('_', ' ')
+        for column, aliases in COLUMN_ALIASES.items():
+            if label in {alias.replace('_', ' ') for alias in aliases}:
+                columns.setdefault(column, index)
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ImportFileError(f"Missing column(s): {', '.join(missing)}")
+    return columns
+
+
+def _records(rows):
+    """Turn an iterator of header + value rows into (row number, dict) pairs."""
+    try:
+        columns = _map_header(next(rows))
+    except StopIteration:
+        raise ImportFileError("The file is empty")
+    for number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+        record = {}
+        for column, index in columns.items():
+            value = values[index] if index < len(values) else None
+            # Spreadsheets hand back numbers for ID-like cells
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            record[column] = '' if value is None else str(value).strip()
+        yield number, record
+
+
+def read_rows(file, filename):
+    """Stream (row number, record) pairs from an uploaded or opened CSV/XLSX file."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        if not OPENPYXL_AVAILABLE:
+            raise ImportFileError("XLSX import needs openpyxl; upload a CSV file instead")
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from _records(workbook.worksheets[0].iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    elif filename.lower().endswith('.csv'):
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        yield from _records(csv.reader(text))
+    else:
+        raise ImportFileError("Unsupported file type; use .csv or .xlsx")
+
+
+def validate_record(record):
+    """Normalise a record in place and return the list of problems with it."""
+    errors = []
+    record['roll_number'] = record['roll_number'].upper()
+    record['section'] = record['section'].upper()
+    record['email'] = record['email'].lower()
+
+    missing = [column for column in REQUIRED_COLUMNS if not record.get(column)]
+    if missing:
+        errors.append(f"Missing value(s): {', '.join(missing)}")
+    if record['course'] and record['course'] not in COURSES:
+        errors.append(f"Unknown course '{record['course']}'")
+    try:
+        record['year'] = int(record['year'])
+        if record['year'] not in (1, 2, 3, 4):
+            errors.append('Invalid year. Must be 1-4.')
+    except ValueError:
+        errors.append('Invalid year. Must be 1-4.')
+    if record['section'] and not SECTION_RE.match(record['section']):
+        errors.append('Section must be 1-5 letters (A, B, AAIML, etc.)')
+    if record['roll_number'] and (not ROLL_NUMBER_RE.match(record['roll_number']) or len(record['roll_number']) > 20):
+        errors.append('Roll number should contain only uppercase letters and numbers (max 20).')
+    if record['email'] and not EMAIL_RE.match(record['email']):
+        errors.append('Invalid email format.')
+    if record.get('phone_number') and not PHONE_RE.match(record['phone_number']):
+        errors.append('Invalid phone number format.')
+    if record.get('password') and len(record['password']) < 6:
+        errors.append('Password must be at least 6 characters long.')
+    return errors
+
+
+def _existing(batch):
+    """Roll numbers and (lower-cased) emails in `batch` that are already taken, in three queries."""
+    rolls = [record['roll_number'] for _, record in batch]
+    emails = [record['email'] for _, record in batch]
+    taken_rolls = set(StudentProfile.objects.filter(roll_number__in=rolls).values_list('roll_number', flat=True))
+    taken_rolls.update(User.objects.filter(username__in=rolls).values_list('username', flat=True))
+    # Older accounts keep the email as typed, in any case
+    taken_emails = set(User.objects.annotate(email_lower=Lower('email')).filter(
+        email_lower__in=emails
+    ).values_list('email_lower', flat=True))
+    return taken_rolls, taken_emails
+
+
+def _init_worker():
+    # Needed where the pool spawns rather than forks
+    import django
+    django.setup()
+
+
+def _hash_passwords(passwords, pool):
+    if pool is None:
+        return [make_password(password) for password in passwords]
+    return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // 32)))
+
+
+def _create_batch(batch, passwords, enrol):
+    """Insert one batch; `passwords` are the rows' password hashes, in order."""
+    users = []
+    for (_, record), password in zip(batch, passwords):
+        users.append(User(
+            username=record['roll_number'],
+            email=record['email'],
+            first_name=record['first_name'],
+            last_name=record['last_name'],
+            phone_number=record.get('phone_number') or '',
+            user_type='student',
+            password=password,
+        ))
+
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        # Not every backend returns primary keys from bulk_create
+        user_ids = dict(User.objects.filter(username__in=[user.username for user in users]).values_list('username', 'id'))
+        profiles = StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user_id=user_ids[record['roll_number']],
+                roll_number=record['roll_number'],
+                course=record['course'],
+                year=record['year'],
+                section=record['section'],
+            )
+            for _, record in batch
+        ])
+        enrolled = enrol_students(profiles) if enrol else 0
+    return len(profiles), enrolled
+
+
+def import_students(rows, batch_size=DEFAULT_BATCH_SIZE, workers=None, enrol=True, dry_run=False):
+    """
+    Import (row number, record) pairs from read_rows(). Returns a dict with
+    'created', 'enrolled', 'skipped' and 'errors' (a list of
+    {'row', 'roll_number', 'errors'}).
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    result = {'created': 0, 'enrolled': 0, 'skipped': 0, 'errors': []}
+    seen_rolls, seen_emails = set(), set()
+
+    def reject(number, record, errors):
+        result['skipped'] += 1
+        result['errors'].append({'row': number, 'roll_number': record.get('roll_number', ''), 'errors': errors})
+
+    def flush(batch):
+        taken_rolls, taken_emails = _existing(batch)
+        accepted = []
+        for number, record in batch:
+            errors = []
+            if record['roll_number'] in taken_rolls:
+                errors.append('Roll number already exists.')
+            if record['email'] in taken_emails:
+                errors.append('Email already registered.')
+            if errors:
+                reject(number, record, errors)
+            else:
+                accepted.append((number, record))
+        if accepted and not dry_run:
+            to_hash = [record['password'] for _, record in accepted if record.get('password')]
+            hashes = iter(_hash_passwords(to_hash, pool) if to_hash else [])
+            passwords = [next(hashes) if record.get('password') else make_password(None) for _, record in accepted]
+            try:
+                created, enrolled = _create_batch(accepted, passwords, enrol)
+            except IntegrityError:
+                # Someone registered one of these students after _existing()
+                # checked; retry row by row so only that row is rejected
+                created = enrolled = 0
+                for row, password in zip(accepted, passwords):
+                    try:
+                        row_created, row_enrolled = _create_batch([row], [password], enrol)
+                    except IntegrityError:
+                        reject(*row, ['Roll number or email was registered during the import.'])
+                        continue
+                    created += row_created
+                    enrolled += row_enrolled
+            result['created'] += created
+            result['enrolled'] += enrolled
+        elif accepted:
+            result['created'] += len(accepted)
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 and not dry_run else None
+    try:
+        batch = []
+        for number, record in rows:
+            errors = validate_record(record)
+            if record['roll_number'] in seen_rolls:
+                errors.append('Duplicate roll number in the file.')
+            if record['email'] in seen_emails:
+                errors.append('Duplicate email in the file.')
+            seen_rolls.add(record['roll_number'])
+            seen_emails.add(record['email'])
+            if errors:
+                reject(number, record, errors)
+                continue
+            batch.append((number, record))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    result['errors'].sort(key=lambda error: error['row'])
+    return result
@@ -0,0 +1,49 @@
+"""
+Fixed-window rate limiting on the shared cache.
+Counters live in settings.CACHES, so limits hold across every worker.
+Increments are atomic on Redis; the file-based fallback may undercount
+slightly under heavy concurrency, which is acceptable for throttling.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _key(name):
+    return f'throttle:{name}'
+
+
+def hit(name, limit, window):
+    """Count one event for `name`. Returns False once more than `limit` events fell in the current window."""
+    key = _key(name)
+    if cache.add(key, 1, timeout=window):
+        return limit >= 1
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        cache.set(key, 1, timeout=window)
+        count = 1
+    return count <= limit
+
+
+def is_limited(name, limit):
+    """True if `name` has already used up `limit` events in its window (does not count an event)."""
+    return cache.get(_key(name), 0) >= limit
+
+
+def reset(name):
+    cache.delete(_key(name))
+
+
+def client_ip(request):
+    """
+    Client address: the X-Forwarded-For hop added by the outermost of our
+    TRUSTED_PROXY_COUNT proxies. Hops left of it come from the client and
+    are ignored; without enough hops, REMOTE_ADDR.
+    """
+    trusted = settings.TRUSTED_PROXY_COUNT
+    hops = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    if trusted and len(hops) >= trusted:
+        return hops[-trusted]
+    return request.META.get('REMOTE_ADDR') or None
@@ -0,0 +1,132 @@
+"""
+Cached weekly timetable read model.
+A section's (or teacher's) day x period grid is built once from the
+TimetableEntry joins and shared by every student in the section. Entries
+are serialised to plain dicts with the same shape as the model attributes
+the templates use (entry.subject.name, entry.time_slot.start_time, ...).
+
+Invalidation is by version counter (see utils/cache.py): TimetableEntry
+save/delete signals bump the section and teacher scopes, and changes to
+subjects, teachers, rooms or time slots bump REFERENCE_SCOPE, which is
+part of every key. Bulk updates that bypass signals must call
+invalidate_timetables() themselves.
+"""
+
+from timetable.models import TimetableEntry
+from utils.academic_calendar import get_current_academic_year, get_current_semester
+from utils.cache import bump_versions, get_or_build, section_namespace
+
+TIMETABLE_CACHE_TIMEOUT = 24 * 60 * 60
+REFERENCE_SCOPE = 'timetable:reference'
+ALL_TIMETABLES_SCOPE = 'timetable:all'  # any entry anywhere changed (admin grid views)
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+
+def section_timetable_scope(course, year, section):
+    return f'timetable:section:{course}:{year}:{section}'
+
+
+def teacher_timetable_scope(teacher_id):
+    return f'timetable:teacher:{teacher_id}'
+
+
+def _term():
+    # Part of the key so grids roll over with the term
+    return f'{get_current_academic_year()}:{get_current_semester()}'
+
+
+def serialize_entry(entry):
+    return {
+        'id': entry.id,
+        'course': entry.course,
+        'year': entry.year,
+        'section': entry.section,
+        'day_of_week': entry.day_of_week,
+        'day': entry.get_day_of_week_display(),
+        'academic_year': entry.academic_year,
+        'semester': entry.semester,
+        'subject': {
+            'id': entry.subject_id,
+            'code': entry.subject.code,
+            'name': entry.subject.name,
+            'credits': entry.subject.credits,
+        },
+        'teacher': {
+            'id': entry.teacher_id,
+            'name': entry.teacher.name,
+            'employee_id': entry.teacher.employee_id,
+        },
+        'room': {
+            'id': entry.room_id,
+            'room_number': entry.room.room_number,
+            'room_name': entry.room.room_name,
+        },
+        'time_slot': {
+            'id': entry.time_slot_id,
+            'period_number': entry.time_slot.period_number,
+            'start_time': entry.time_slot.start_time,
+            'end_time': entry.time_slot.end_time,
+        },
+    }
+
+
+def _build(queryset, slot_field):
+    entries = [
+        serialize_entry(entry)
+        for entry in queryset.select_related('subject', 'teacher', 'time_slot', 'room')
+    ]
+    grid = {day: {} for day in DAYS}
+    periods = set()
+    for entry in entries:
+        if entry['day_of_week'] < len(DAYS):
+            grid[DAYS[entry['day_of_week']]][entry['time_slot'][slot_field]] = entry
+        periods.add(entry['time_slot']['period_number'])
+    return {'entries': entries, 'grid': grid, 'periods': sorted(periods)}
+
+
+def _cached(name, scopes, builder):
+    return get_or_build(f'{name}:{_term()}', scopes + [REFERENCE_SCOPE], builder, TIMETABLE_CACHE_TIMEOUT)
+
+
+def get_section_timetable(course, year, section):
+    """
+    {'entries', 'grid', 'periods'} for a class section. Entries are ordered
+    by day and period; grid maps day name -> period number -> entry.
+    """
+    scope = section_timetable_scope(course, year, section)
+    scopes = [scope, section_namespace(course, year, section)]
+    return _cached(f'timetable_grid:{scope}', scopes, lambda: _build(
+        TimetableEntry.objects.filter(
+            course=course, year=year, section=section, is_active=True
+        ).order_by('day_of_week', 'time_slot__period_number'),
+        'period_number'
+    ))
+
+
+def get_teacher_timetable(teacher_id):
+    """
+    {'entries', 'grid', 'periods'} for a teacher. Entries are ordered by day
+    and start time; grid maps day name -> time slot id -> entry.
+    """
+    scope = teacher_timetable_scope(teacher_id)
+    return _cached(f'timetable_grid:{scope}', [scope], lambda: _build(
+        TimetableEntry.objects.filter(
+            teacher_id=teacher_id, is_active=True
+        ).order_by('day_of_week', 'time_slot__start_time'),
+        'id'
+    ))
+
+
+def entries_on(timetable, weekday):
+    return [entry for entry in timetable['entries'] if entry['day_of_week'] == weekday]
+
+
+def invalidate_timetables(sections=(), teacher_ids=(), reference=False):
+    """Drop cached grids for (course, year, section) tuples and teacher ids after commit."""
+    scopes = [section_timetable_scope(*section) for section in sections]
+    scopes += [teacher_timetable_scope(teacher_id) for teacher_id in teacher_ids]
+    if scopes:
+        scopes.append(ALL_TIMETABLES_SCOPE)
+    if reference:
+        scopes.append(REFERENCE_SCOPE)
+    bump_versions(scopes)
@@ -0,0 +1,494 @@
+"""
+Import of the master timetable workbook (static/TT4.1.xlsx layout).
+Every sheet is one class: a "TIME TABLE: B.Tech CSE VII A (2025-26 ODD
+SEMESTER)" title, a "ROOM NO:" line, a "DAY \\ TIME" header of time ranges,
+then two rows per day (subject codes, then faculty initials) and a legend
+mapping codes to subject names and initials to faculty names. Lab cells
+name their room, as in "PCS-514 (CN LAB G1+G2/L8)"; a lesson merged
+across columns spans several periods. Header columns shorter than
+40 minutes are breaks.
+
+Sheets are read with openpyxl in read-only (streaming) mode. Subjects,
+teachers, rooms and time slots are resolved through maps built with one
+query each, and conflicts are checked against an in-memory occupancy
+index of the term instead of three queries per entry. The result is a
+diff against the classes' current entries; apply it with apply_plan(),
+which writes everything in one transaction:
+
+* added: new TimetableEntry rows (bulk_create);
+* changed: same class, day and period with a different subject, teacher
+  or room, updated in place. Entries with attendance history (live or
+  archived attendance, term summaries, bitmaps) are reported instead, so
+  their records never count toward another subject or teacher;
+* removed: entries of an imported class that the workbook no longer has,
+  deleted, or deactivated if they have attendance history (plan['kept']),
+  which deleting would cascade away.
+
+Cells that cannot be resolved or that conflict are reported and skipped.
+Class sections are the section letter plus any specialisation ("A (AIML)"
+becomes "AAIML") so that parallel groups stay distinct; registration and
+the student importer accept such sections, and the registration form
+offers every section that has an active timetable.
+"""
+
+from datetime import time
+import re
+from xml.etree.ElementTree import iterparse
+
+from django.db import transaction
+from django.utils import timezone
+
+from timetable.models import (
+    ArchivedAttendance, Attendance, AttendanceBitmap, AttendanceSyncKey, AttendanceTermSummary, Course, Room,
+    Subject, Teacher, TimeSlot, TimetableEntry,
+)
+from utils.academic_calendar import academic_year_aliases
+from utils.change_feed import publish, section_scope
+from utils.timetable_cache import invalidate_timetables
+
+try:
+    import openpyxl
+    from openpyxl.utils.cell import get_column_letter, range_boundaries
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+DAYS = {'MONDAY': 0, 'TUESDAY': 1, 'WEDNESDAY': 2, 'THURSDAY': 3, 'FRIDAY': 4, 'SATURDAY': 5}
+ROMAN = {'I': 1, 'II': 2, 'III': 3, 'IV': 4, 'V': 5, 'VI': 6, 'VII': 7, 'VIII': 8}
+MIN_PERIOD_MINUTES = 40
+TEACHER_EMAIL_DOMAIN = 'teachers.invalid'  # placeholder for teachers created from initials
+
+TITLE_RE = re.compile(
+    r'TIME TABLE:\s*(?P<group>.+?)\s*\((?P<academic_year>\d{4}-\d{2,4})\s+(?P<term>ODD|EVEN)\s+SEMESTER\)',
+    re.IGNORECASE,
+)
+LAB_ROOM_RE = re.compile(r'/\s*([A-Z]{1,3}-?\d{1,4})\b', re.IGNORECASE)
+HONORIFIC_RE = re.compile(r'^(mr|ms|mrs|dr|prof)\.?\s+', re.IGNORECASE)
+
+
+class TimetableImportError(Exception):
+    """The workbook as a whole cannot be imported."""
+
+
+def _norm_code(value):
+    return re.sub(r'[\s\-]', '', str(value)).upper()
+
+
+def _norm_name(value):
+    name = HONORIFIC_RE.sub('', str(value).strip())
+    return ' '.join(re.sub(r'\(.*?\)', '', name).split()).lower()
+
+
+def _parse_time(text):
+    hours, minutes = (int(part) for part in text.strip().split(':'))
+    # Afternoon times are written on a 12-hour clock ("1:20")
+    return time(hours + 12 if hours < 8 else hours, minutes)
+
+
+def _parse_range(text):
+    try:
+        start, end = str(text).split('-')
+        return _parse_time(start), _parse_time(end)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _minutes(slot_range):
+    start, end = slot_range
+    return (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+
+
+def _parse_group(group):
+    """('B.Tech', 'CSE', semester, section) from "B.Tech CSE V B(AIML)"."""
+    tokens = group.replace('(', ' (').split()
+    course = tokens[0].rstrip('.')
+    for index, token in enumerate(tokens):
+        if token.upper() in ROMAN:
+            department = ' '.join(tokens[1:index])
+            rest = ''.join(tokens[index + 1:])
+            section = re.sub(r'[^A-Z]', '', rest.upper())[:5] or 'A'
+            return course, department, ROMAN[token.upper()], section
+    raise ValueError(f"No semester in '{group}'")
+
+
+def _merged_spans(workbook, worksheet):
+    """
+    {(row, column): columns spanned} for merges within one row. Read-only
+    worksheets do not expose merges, so they are read from the sheet XML.
+    """
+    spans = {}
+    path = getattr(worksheet, '_worksheet_path', None)
+    archive = getattr(workbook, '_archive', None)
+    if not path or archive is None:
+        return spans
+    with archive.open(path) as xml:
+        for _, element in iterparse(xml):
+            if element.tag.endswith('}mergeCell'):
+                min_col, min_row, max_col, max_row = range_boundaries(element.get('ref'))
+                if min_row == max_row and max_col > min_col:
+                    spans[(min_row, min_col)] = max_col - min_col + 1
+            element.clear()
+    return spans
+
+
+def read_sheet(rows, spans):
+    """Parse one sheet's rows (tuples of values) into a plain dict."""
+    sheet = {'title': None, 'room': '', 'columns': {}, 'cells': {}, 'teachers': {}, 'subjects': {}, 'faculty': {}}
+    day_rows = {}
+    legend = None
+    for row_number, values in enumerate(rows, start=1):
+        texts = {col: str(value).strip() for col, value in enumerate(values, start=1) if value not in (None, '')}
+        if not texts:
+            continue
+        first_col = min(texts)
+        first = texts[first_col]
+
+        if first.upper().startswith('TIME TABLE:'):
+            sheet['title'] = first
+        elif first.upper().startswith('ROOM NO'):
+            sheet['room'] = first.split(':', 1)[-1].strip()
+        elif first.upper().startswith('DAY'):
+            for col, text in texts.items():
+                slot_range = _parse_range(text) if col != first_col else None
+                if slot_range:
+                    sheet['columns'][col] = slot_range
+        elif first.upper() in DAYS:
+            day_rows[row_number] = DAYS[first.upper()]
+            for col, text in texts.items():
+                if col in sheet['columns']:
+                    sheet['cells'][(DAYS[first.upper()], col)] = (text, spans.get((row_number, col), 1), row_number)
+        elif row_number - 1 in day_rows:
+            day = day_rows[row_number - 1]
+            for col, text in texts.items():
+                if col in sheet['columns']:
+                    sheet['teachers'][(day, col)] = text
+        elif first == 'Subject' and 'Code' in texts.values():
+            legend = {text: col for col, text in texts.items()}
+            legend = {'name': first_col, 'code': legend['Code'], 'faculty': min(
+                col for col in texts if col > legend['Code']
+            )}
+        elif legend:
+            code = texts.get(legend['code'])
+            faculty = texts.get(legend['faculty'], '')
+            initials = [text for col, text in sorted(texts.items()) if col > legend['faculty']]
+            if code and _norm_code(code) not in sheet['subjects']:
+                sheet['subjects'][_norm_code(code)] = (code, texts.get(legend['name'], code))
+            if faculty and initials:
+                for short, full in zip(initials[-1].split('+'), faculty.split('+')):
+                    sheet['faculty'].setdefault(short.strip().upper(), full.strip())
+    return sheet
+
+
+class Resolver:
+    """Name -> model instance maps, one query per model. Optionally builds missing rows (unsaved)."""
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.created = []
+        self.courses = {course.name: course for course in Course.objects.all()}
+        self.subjects = {_norm_code(subject.code): subject for subject in Subject.objects.select_related('course')}
+        self.teachers = {}
+        for teacher in Teacher.objects.filter(is_active=True):
+            self.teachers.setdefault(_norm_code(teacher.employee_id), teacher)
+            self.teachers.setdefault(_norm_name(teacher.name), teacher)
+        self.rooms = {_norm_code(room.room_number): room for room in Room.objects.filter(is_active=True)}
+        self.slots = {(slot.start_time, slot.end_time): slot for slot in TimeSlot.objects.filter(is_active=True)}
+        self.periods = {slot.period_number for slot in TimeSlot.objects.all()}
+
+    def _new(self, instance):
+        self.created.append(instance)
+        return instance
+
+    def course(self, name):
+        if name not in self.courses and self.create_missing:
+            self.courses[name] = self._new(Course(name=name, full_name=name))
+        return self.courses.get(name)
+
+    def subject(self, code_text, legend, course_name, year, semester):
+        key = _norm_code(code_text)
+        if key not in self.subjects and self.create_missing and key in legend:
+            course = self.course(course_name)
+            code, name = legend[key]
+            self.subjects[key] = self._new(Subject(
+                code=code[:10], name=name[:100], course=course, year=year, semester=semester
+            ))
+        return self.subjects.get(key)
+
+    def teacher(self, initials, faculty, department):
+        initials = initials.split('+')[0].strip().upper()
+        full_name = faculty.get(initials, '')
+        teacher = self.teachers.get(_norm_code(initials)) or (full_name and self.teachers.get(_norm_name(full_name)))
+        if not teacher and self.create_missing and initials:
+            employee_id = _norm_code(initials)[:20]
+            teacher = self._new(Teacher(
+                employee_id=employee_id,
+                name=(HONORIFIC_RE.sub('', full_name).strip() or initials)[:100],
+                email=f'{employee_id.lower()}@{TEACHER_EMAIL_DOMAIN}',
+                department=department or 'General',
+            ))
+            self.teachers[employee_id] = teacher
+        return teacher or None
+
+    def room(self, number, is_lab=False):
+        key = _norm_code(number)
+        if key and key not in self.rooms and self.create_missing:
+            self.rooms[key] = self._new(Room(
+                room_number=number.replace(' ', '')[:20], capacity=60, room_type='lab' if is_lab else 'classroom'
+            ))
+        return self.rooms.get(key)
+
+    def slot(self, slot_range, period_number):
+        if slot_range not in self.slots and self.create_missing and period_number not in self.periods:
+            self.periods.add(period_number)
+            self.slots[slot_range] = self._new(TimeSlot(
+                period_number=period_number, start_time=slot_range[0], end_time=slot_range[1]
+            ))
+        return self.slots.get(slot_range)
+
+
+def _ref(instance):
+    # Unsaved (to be created) instances are told apart by identity
+    return instance.pk or id(instance)
+
+
+def _term_key(academic_year):
+    return int(str(academic_year).split('-')[0])
+
+
+def _plan_sheet(name, sheet, resolver, errors, legend):
+    """Resolve one parsed sheet into planned entries (dicts). `legend` is the workbook-wide fallback."""
+    if not sheet['title'] or not TITLE_RE.search(sheet['title']):
+        errors.append({'sheet': name, 'cell': '', 'message': 'No "TIME TABLE: ... (YYYY-YY ODD/EVEN SEMESTER)" title'})
+        return None, []
+    match = TITLE_RE.search(sheet['title'])
+    try:
+        course, department, semester, section = _parse_group(match.group('group'))
+    except ValueError as e:
+        errors.append({'sheet': name, 'cell': '', 'message': str(e)})
+        return None, []
+    year = (semester + 1) // 2
+    klass = {'course': course, 'year': year, 'section': section,
+             'academic_year': match.group('academic_year'), 'semester': semester}
+
+    teaching = [col for col in sorted(sheet['columns']) if _minutes(sheet['columns'][col]) >= MIN_PERIOD_MINUTES]
+    period_of = {col: number for number, col in enumerate(teaching, start=1)}
+    entries = []
+    for (day, col), (text, span, row) in sorted(sheet['cells'].items()):
+        if col not in period_of:
+            continue
+        cell = f'{name}!{get_column_letter(col)}{row}'
+        initials = sheet['teachers'].get((day, col), '')
+        code_text = text.split('(')[0].strip()
+        subject = resolver.subject(code_text, {**legend['subjects'], **sheet['subjects']}, course, year, semester)
+        if not subject:
+            if initials:
+                errors.append({'sheet': name, 'cell': cell, 'message': f"Unknown subject '{code_text}'"})
+            continue  # library, seminar and other non-teaching cells
+        teacher = resolver.teacher(initials, {**legend['faculty'], **sheet['faculty']}, department)
+        lab_room = LAB_ROOM_RE.search(text)
+        room = resolver.room(lab_room.group(1), is_lab=True) if lab_room else resolver.room(sheet['room'])
+        if not teacher:
+            errors.append({'sheet': name, 'cell': cell, 'message': f"Unknown teacher '{initials}' for {code_text}"})
+            continue
+        if not room:
+            errors.append({'sheet': name, 'cell': cell, 'message': f"No known room for {code_text}"})
+            continue
+        for offset in range(span):
+            target = col + offset
+            if target not in period_of:
+                continue
+            slot = resolver.slot(sheet['columns'][target], period_of[target])
+            if not slot:
+                errors.append({'sheet': name, 'cell': cell, 'message': 'No time slot for '
+                               f'{sheet["columns"][target][0]:%H:%M}-{sheet["columns"][target][1]:%H:%M}'})
+                continue
+            entries.append({**klass, 'sheet': name, 'cell': cell, 'day_of_week': day,
+                            'time_slot': slot, 'subject': subject, 'teacher': teacher, 'room': room})
+    return klass, entries
+
+
+def _occupancy_keys(term, semester, day, slot, teacher, room, course, year, section):
+    prefix = (term, semester, day, slot)
+    return [('teacher',) + prefix + (teacher,), ('room',) + prefix + (room,),
+            ('class',) + prefix + (course, year, section)]
+
+
+def _entries_with_history(entry_ids):
+    """Ids among `entry_ids` that live or archived attendance data points at (deleting them would cascade)."""
+    history = set()
+    for model in (Attendance, ArchivedAttendance, AttendanceTermSummary, AttendanceBitmap, AttendanceSyncKey):
+        history.update(model.objects.filter(timetable_entry_id__in=entry_ids).values_list(
+            'timetable_entry_id', flat=True
+        ).distinct())
+    return history
+
+
+def build_plan(path, sheets=None, create_missing=False):
+    """Read the workbook and diff it against the database. Nothing is written."""
+    if not OPENPYXL_AVAILABLE:
+        raise TimetableImportError("Timetable import needs openpyxl (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    resolver = Resolver(create_missing)
+    errors, classes, planned = [], [], []
+    try:
+        names = sheets or workbook.sheetnames
+        missing = set(names) - set(workbook.sheetnames)
+        if missing:
+            raise TimetableImportError(f"No such sheet(s): {', '.join(sorted(missing))}")
+        parsed = {}
+        for name in names:
+            worksheet = workbook[name]
+            parsed[name] = read_sheet(worksheet.iter_rows(min_row=1, values_only=True), _merged_spans(workbook, worksheet))
+    finally:
+        workbook.close()
+
+    # A code or initials missing from one sheet's legend is often in another's
+    legend = {'subjects': {}, 'faculty': {}}
+    for sheet in parsed.values():
+        for key in legend:
+            for short, value in sheet[key].items():
+                legend[key].setdefault(short, value)
+    for name, sheet in parsed.items():
+        klass, entries = _plan_sheet(name, sheet, resolver, errors, legend)
+        if klass:
+            classes.append(klass)
+            planned.extend(entries)
+
+    # Existing entries of every term in the workbook, one query
+    aliases = set().union(*(academic_year_aliases(k['academic_year']) for k in classes)) if classes else set()
+    existing = list(TimetableEntry.objects.filter(
+        academic_year__in=aliases, semester__in={k['semester'] for k in classes}
+    ))
+    imported = {(_term_key(k['academic_year']), k['semester'], k['course'], k['year'], k['section']) for k in classes}
+
+    def class_of(entry):
+        return (_term_key(entry.academic_year), entry.semester, entry.course, entry.year, entry.section)
+
+    occupancy = {}
+    current = {}
+    for entry in existing:
+        if class_of(entry) in imported:
+            current[class_of(entry) + (entry.day_of_week, entry.time_slot_id)] = entry
+        else:
+            # Unique constraints ignore is_active, so inactive rows occupy slots too
+            for key in _occupancy_keys(_term_key(entry.academic_year), entry.semester, entry.day_of_week,
+                                       entry.time_slot_id, entry.teacher_id, entry.room_id,
+                                       entry.course, entry.year, entry.section):
+                occupancy[key] = f'existing entry {entry.pk}'
+
+    plan = {'added': [], 'changed': [], 'unchanged': [], 'removed': [], 'errors': errors,
+            'created': resolver.created, 'classes': classes}
+    seen = set()
+    claimed = {}
+    for item in planned:
+        term = _term_key(item['academic_year'])
+        keys = _occupancy_keys(term, item['semester'], item['day_of_week'], _ref(item['time_slot']),
+                               _ref(item['teacher']), _ref(item['room']), item['course'], item['year'], item['section'])
+        clash = next((key for key in keys if key in occupancy), None)
+        if clash:
+            errors.append({'sheet': item['sheet'], 'cell': item['cell'],
+                           'message': f"{clash[0].capitalize()} conflict with {occupancy[clash]}"})
+            continue
+        for key in keys:
+            occupancy[key] = item['cell']
+            claimed[key] = item
+        class_key = (term, item['semester'], item['course'], item['year'], item['section'],
+                     item['day_of_week'], _ref(item['time_slot']))
+        seen.add(class_key)
+        entry = current.get(class_key)
+        if entry is None:
+            plan['added'].append(item)
+        elif (entry.is_active and entry.subject_id == _ref(item['subject'])
+              and entry.teacher_id == _ref(item['teacher']) and entry.room_id == _ref(item['room'])):
+            plan['unchanged'].append(item)
+        else:
+            plan['changed'].append(dict(item, entry=entry))
+    plan['removed'] = [entry for key, entry in current.items() if key not in seen and entry.is_active]
+
+    # Removed entries with attendance history are only deactivated, and
+    # changed ones are left alone for the admin to sort out, since their
+    # records would otherwise count toward the new subject and teacher.
+    # Either way they keep their teacher and room slots, so nothing new may
+    # take those
+    history = _entries_with_history(
+        [entry.pk for entry in plan['removed']] + [item['entry'].pk for item in plan['changed']]
+    )
+    kept = {entry.pk for entry in plan['removed'] if entry.pk in history}
+    frozen = [item for item in plan['changed'] if item['entry'].pk in history and (
+        item['entry'].subject_id, item['entry'].teacher_id, item['entry'].room_id
+    ) != (_ref(item['subject']), _ref(item['teacher']), _ref(item['room']))]
+    for item in frozen:
+        plan['changed'].remove(item)
+        errors.append({'sheet': item['sheet'], 'cell': item['cell'], 'message':
+                       f"Entry {item['entry'].pk} already has attendance; change its subject, "
+                       "teacher or room by hand"})
+    # Inactive entries the workbook no longer has stay too, and unique
+    # constraints ignore is_active
+    blocking = [(entry, 'kept for its attendance') for entry in plan['removed'] if entry.pk in kept]
+    blocking += [(item['entry'], 'kept for its attendance') for item in frozen]
+    blocking += [(entry, 'inactive') for key, entry in current.items() if key not in seen and not entry.is_active]
+    for entry, reason in blocking:
+        for key in _occupancy_keys(_term_key(entry.academic_year), entry.semester, entry.day_of_week,
+                                   entry.time_slot_id, entry.teacher_id, entry.room_id,
+                                   entry.course, entry.year, entry.section)[:2]:
+            item = claimed.pop(key, None)
+            for action in ('added', 'changed'):
+                if item in plan[action]:
+                    plan[action].remove(item)
+                    errors.append({'sheet': item['sheet'], 'cell': item['cell'], 'message':
+                                   f'{key[0].capitalize()} conflict with entry {entry.pk}, {reason}'})
+    plan['kept'] = kept
+    return plan
+
+
+def apply_plan(plan):
+    """Write a plan from build_plan() in one transaction. Returns {action: count}."""
+    removed_ids = [entry.pk for entry in plan['removed']]
+    with transaction.atomic():
+        # Courses before subjects, which point at them
+        for instance in sorted(plan['created'], key=lambda obj: not isinstance(obj, Course)):
+            instance.save()
+
+        # Previous teachers lose the lesson from their grids
+        teacher_ids = {item['entry'].teacher_id for item in plan['changed']}
+        teacher_ids.update(entry.teacher_id for entry in plan['removed'])
+        now = timezone.now()
+
+        # Unique constraints are checked row by row, so slots are freed
+        # before anything takes them: removed rows go first, changed rows
+        # are parked on a day of their own (-pk) and then moved back with
+        # their new subject, teacher and room, and added rows come last
+        TimetableEntry.objects.filter(pk__in=plan['kept']).update(is_active=False, updated_at=now)
+        TimetableEntry.objects.filter(pk__in=set(removed_ids) - plan['kept']).delete()
+
+        changed = []
+        for item in plan['changed']:
+            entry = item['entry']
+            entry.day_of_week = -entry.pk
+            changed.append(entry)
+        TimetableEntry.objects.bulk_update(changed, ['day_of_week'], batch_size=500)
+        for item, entry in zip(plan['changed'], changed):
+            entry.day_of_week = item['day_of_week']
+            entry.subject, entry.teacher, entry.room = item['subject'], item['teacher'], item['room']
+            entry.is_active, entry.updated_at = True, now
+        TimetableEntry.objects.bulk_update(
+            changed, ['day_of_week', 'subject', 'teacher', 'room', 'is_active', 'updated_at'], batch_size=500
+        )
+
+        TimetableEntry.objects.bulk_create([
+            TimetableEntry(
+                subject=item['subject'], teacher=item['teacher'], room=item['room'], time_slot=item['time_slot'],
+                course=item['course'], year=item['year'], section=item['section'], day_of_week=item['day_of_week'],
+                academic_year=item['academic_year'], semester=item['semester'],
+            )
+            for item in plan['added']
+        ], batch_size=500)
+
+        # Bulk writes bypass the TimetableEntry signals
+        sections = {(k['course'], k['year'], k['section']) for k in plan['classes']}
+        teacher_ids.update(item['teacher'].pk for item in plan['added'] + plan['changed'])
+        invalidate_timetables(sections=sections, teacher_ids=teacher_ids, reference=bool(plan['created']))
+        publish('timetable', [section_scope(*section) for section in sorted(sections)] + [
+            f'teacher:{teacher_id}' for teacher_id in sorted(teacher_ids)
+        ], {'imported': True})
+    return {action: len(plan[action]) for action in ('added', 'changed', 'unchanged', 'removed')}